@@ -10,15 +10,24 @@
 #include <vnl/vnl_vector_fixed.h>
 #include <vnl/vnl_cross.h>
 
+// STL includes
+#include <cstdio>
+#include <list>
+#include <map>
+#include <tuple>
+
 // VTK includes
 #include <vtkCellArray.h>
 #include <vtkCellDataToPointData.h>
+#include <vtkNew.h>
 #include <vtkPolyData.h>
 #include <vtkPointData.h>
+#include <vtkSmartPointer.h>
 
-// MRML includes
-#include "vtkMRMLModelStorageNode.h"
-#include "vtkMRMLModelNode.h"
+// Models read from files or, in the process of Slicer, from model nodes,
+// and progress reported as in SkeletonTool
+#include "ModelIO.h"
+#include "ProgressReporter.h"
 
 
 using namespace std;
@@ -49,21 +58,21 @@ unsigned int count_nnz(vnl_sparse_matrix<T> &mat)
 } // end of anonymous namespace
 
 
-int main(int argc, char *argv[]) {
+// The exceptions are caught here, so that they do not reach Slicer when the
+// module runs as a shared object module
+int main(int argc, char *argv[]) try {
   PARSE_ARGS;
+  ProgressReporter progress(CLPProcessInformation);
   // This inflation code accepts non-mesh medial surfaces, i.e., medial surfaces with branches
 
   // read the poly data
-  vtkNew<vtkMRMLModelStorageNode> modelStorageNode;
-  vtkNew<vtkMRMLModelNode> modelNode;
-  modelStorageNode->SetFileName(inputSurface.c_str());
-  if (!modelStorageNode->ReadData(modelNode)) {
+  vtkSmartPointer<vtkPolyData> pd = ReadModel(inputSurface);
+  if (!pd) {
     std::cerr << "Failed to read input model file " << inputSurface << std::endl;
     return EXIT_FAILURE;
   }
 
   // Convert it into a triangle mesh
-  vtkPolyData *pd = modelNode->GetPolyData();
 
   // An edge is a pair of vertices, always stored in sorted order
   typedef std::pair<unsigned int, unsigned int> Edge;
@@ -85,8 +94,15 @@ int main(int argc, char *argv[]) {
   std::vector<Vec3> tnorm;
 
   // Find all the edges in the mesh
+  progress.StartStage("Triangles", "Duplicating the triangles", 0.0, 0.1);
   for(unsigned int i = 0; i < pd->GetNumberOfCells(); i++)
   {
+    if(!progress.Update((double) i / pd->GetNumberOfCells()))
+    {
+      std::cerr << "Cancelled" << std::endl;
+      return EXIT_FAILURE;
+    }
+
     // Read the cell
     vtkCell *c = pd->GetCell(i);
     if(c->GetNumberOfPoints() != 3)
@@ -116,8 +132,15 @@ int main(int argc, char *argv[]) {
   }
 
   // Find edges across the duplicate triangles
+  progress.StartStage("Edges", "Finding the edges", 0.1, 0.2);
   for(unsigned int i = 0; i < tdup.size(); i++)
   {
+    if(!progress.Update((double) i / tdup.size()))
+    {
+      std::cerr << "Cancelled" << std::endl;
+      return EXIT_FAILURE;
+    }
+
     for(unsigned int k = 0; k < 3; k++)
     {
       size_t v1 = tdup[i].vertices[(k+1) % 3];
@@ -132,8 +155,16 @@ int main(int argc, char *argv[]) {
 
   // For each edge, find the triangles that are adjacent across the edge. Adjacent
   // triangles must traverse the edge in opposite order.
+  progress.StartStage("Neighbors", "Matching the triangles across the edges", 0.2, 0.5);
+  unsigned int i_edge = 0;
   for(auto &eit : etm)
   {
+    if(!progress.Update((double) (i_edge++) / etm.size()))
+    {
+      std::cerr << "Cancelled" << std::endl;
+      return EXIT_FAILURE;
+    }
+
     // Get the edge vector direction
     Vec3 e_X1(pd->GetPoint(eit.first.first));
     Vec3 e_X2(pd->GetPoint(eit.first.second));
@@ -200,8 +231,15 @@ int main(int argc, char *argv[]) {
 
   // Visit each edge in each triangle and match the vertices with the opposite edge
   // in the opposite triangle
+  progress.StartStage("Adjacency", "Building the vertex adjacency matrix", 0.5, 0.6);
   for(unsigned int i = 0; i < tdup.size(); i++)
   {
+    if(!progress.Update((double) i / tdup.size()))
+    {
+      std::cerr << "Cancelled" << std::endl;
+      return EXIT_FAILURE;
+    }
+
     for(unsigned int k = 0; k < 3; k++)
     {
       // Add identity element to matrix
@@ -223,17 +261,30 @@ int main(int argc, char *argv[]) {
   }
 
   // Find the connected components in the adjacency matrix. A lazy way to do this is to take powers of the
-  // matrix until it converges.
+  // matrix until it converges. The number of multiplications is not known in
+  // advance, so each one reports half of the remaining progress.
+  progress.StartStage("Components", "Finding the connected vertices", 0.6, 0.9);
   unsigned int nnz_last = count_nnz(tv_adj);
   printf("Adjacency matrix, nnz = %d\n", nnz_last);
   vnl_sparse_matrix<int> tv_adj_pow = tv_adj * tv_adj;
+  double remaining = 1.0;
   while(count_nnz(tv_adj_pow) > nnz_last)
   {
+    remaining *= 0.5;
+    if(!progress.Update(1.0 - remaining))
+    {
+      std::cerr << "Cancelled" << std::endl;
+      return EXIT_FAILURE;
+    }
+
     nnz_last = count_nnz(tv_adj_pow);
     tv_adj_pow = tv_adj_pow * tv_adj;
     printf("Adjacency multiplication, nnz = %d\n", nnz_last);
   }
 
+  // Build the inflated mesh
+  progress.StartStage("Inflation", "Inflating the medial model", 0.9, 1.0);
+
   // Go through and remap the disjoint vertices to new vertices
   std::vector<unsigned int> vnew(tdup.size() * 3, NOID);
   unsigned int vcurr = 0;
@@ -331,14 +382,17 @@ int main(int argc, char *argv[]) {
     arr->SetTuple1(i, m_mindex[i]);
   vmb->GetPointData()->AddArray(arr);
 
-  vtkNew<vtkMRMLModelNode> outputModelNode;
-  outputModelNode->SetAndObservePolyData(vmb);
-  vtkNew<vtkMRMLModelStorageNode> outputModelStorageNode;
-  outputModelStorageNode->SetFileName(outputSurface.c_str());
-  if (!outputModelStorageNode->WriteData(outputModelNode)) {
+  if (!WriteModel(outputSurface, vmb)) {
     std::cerr << "Failed to write output model file " << outputSurface << std::endl;
     return EXIT_FAILURE;
   }
+  progress.EndStage();
 
   return EXIT_SUCCESS;
+} catch (const std::exception &exc) {
+  std::cerr << "Failed to inflate the medial model: " << exc.what() << std::endl;
+  return EXIT_FAILURE;
+} catch (const char *message) {
+  std::cerr << "Failed to inflate the medial model: " << message << std::endl;
+  return EXIT_FAILURE;
 }
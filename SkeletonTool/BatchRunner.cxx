@@ -0,0 +1,348 @@
+#include "BatchRunner.h"
+
+#include <vtkTimerLog.h>
+
+#include <vtksys/Process.h>
+#include <vtksys/SystemTools.hxx>
+
+#include <algorithm>
+#include <cstdio>
+#include <cstdlib>
+#include <fstream>
+#include <iostream>
+#include <sstream>
+
+namespace {
+
+// Time between two polls of the running children, in milliseconds
+const unsigned int POLL_INTERVAL = 20;
+
+std::string Trim(const std::string &s)
+{
+  size_t first = s.find_first_not_of(" \t\r\n");
+  if (first == std::string::npos)
+    return std::string();
+  return s.substr(first, s.find_last_not_of(" \t\r\n") - first + 1);
+}
+
+// Split a line of a CSV file into fields. Fields may be quoted, with
+// doubled quotes standing for a quote
+std::vector<std::string> SplitCSVLine(const std::string &line)
+{
+  std::vector<std::string> fields(1);
+  bool isQuoted = false;
+  for (size_t i = 0; i < line.size(); i++) {
+    char c = line[i];
+    if (isQuoted) {
+      if (c == '"' && i + 1 < line.size() && line[i + 1] == '"') {
+        fields.back() += '"';
+        i++;
+      } else if (c == '"') {
+        isQuoted = false;
+      } else {
+        fields.back() += c;
+      }
+    } else if (c == '"') {
+      isQuoted = true;
+    } else if (c == ',') {
+      fields.push_back(std::string());
+    } else if (c != '\r') {
+      fields.back() += c;
+    }
+  }
+
+  for (size_t i = 0; i < fields.size(); i++)
+    fields[i] = Trim(fields[i]);
+  return fields;
+}
+
+std::string QuoteCSVField(const std::string &field)
+{
+  if (field.find_first_of(",\"\n") == std::string::npos)
+    return field;
+  std::string quoted = "\"";
+  for (size_t i = 0; i < field.size(); i++) {
+    if (field[i] == '"')
+      quoted += '"';
+    quoted += field[i];
+  }
+  return quoted + "\"";
+}
+
+// Value of a parameter in a return parameter file, or zero if it is missing
+double ReadReturnParameter(const std::string &filename, const std::string &name)
+{
+  std::ifstream fin(filename.c_str());
+  std::string line;
+  while (std::getline(fin, line)) {
+    size_t eq = line.find('=');
+    if (eq != std::string::npos && Trim(line.substr(0, eq)) == name)
+      return atof(line.c_str() + eq + 1);
+  }
+  return 0.0;
+}
+
+// A subject being processed by a child process
+struct RunningJob
+{
+  size_t Index;
+  vtksysProcess *Process;
+  double StartTime;
+  std::string Errors;
+  std::string ParameterFile;
+};
+
+} // end of anonymous namespace
+
+BatchRunner::BatchRunner(const std::string &executable)
+  : m_Executable(executable)
+{
+}
+
+bool BatchRunner::ReadManifest(const std::string &filename)
+{
+  std::ifstream fin(filename.c_str());
+  if (!fin.good()) {
+    m_ErrorMessage = "Failed to read manifest " + filename;
+    return false;
+  }
+
+  // Paths are relative to the directory of the manifest
+  std::string dir = vtksys::SystemTools::GetFilenamePath(vtksys::SystemTools::CollapseFullPath(filename));
+
+  std::vector<std::string> header;
+  int iInput = -1, iOutput = -1;
+  std::string line;
+  m_Jobs.clear();
+  for (int iLine = 1; std::getline(fin, line); iLine++) {
+    std::string trimmed = Trim(line);
+    if (trimmed.empty() || trimmed[0] == '#')
+      continue;
+
+    std::vector<std::string> fields = SplitCSVLine(line);
+    if (header.empty()) {
+      header = fields;
+      for (size_t i = 0; i < header.size(); i++) {
+        if (header[i] == "input")
+          iInput = static_cast<int>(i);
+        else if (header[i] == "output")
+          iOutput = static_cast<int>(i);
+      }
+      if (iInput < 0 || iOutput < 0) {
+        m_ErrorMessage = "The manifest " + filename + " has no input or output column";
+        return false;
+      }
+      continue;
+    }
+
+    if (fields.size() != header.size()) {
+      std::ostringstream oss;
+      oss << "Line " << iLine << " of the manifest " << filename << " has " << fields.size() << " fields instead of "
+          << header.size();
+      m_ErrorMessage = oss.str();
+      return false;
+    }
+
+    Job job;
+    job.Input = vtksys::SystemTools::CollapseFullPath(fields[iInput], dir);
+    job.Output = vtksys::SystemTools::CollapseFullPath(fields[iOutput], dir);
+    for (size_t i = 0; i < fields.size(); i++)
+      if (static_cast<int>(i) != iInput && static_cast<int>(i) != iOutput && !fields[i].empty())
+        job.Parameters.push_back(std::make_pair(header[i], fields[i]));
+    m_Jobs.push_back(job);
+  }
+
+  Result pending = { JOB_PENDING, 0, 0.0, 0.0, std::string() };
+  m_Results.assign(m_Jobs.size(), pending);
+  return true;
+}
+
+std::vector<std::string> BatchRunner::GetCommandLine(size_t iJob) const
+{
+  const Job &job = m_Jobs[iJob];
+
+  // The parameters of the subject replace the common ones with the same name
+  ParameterList parameters;
+  for (size_t i = 0; i < m_CommonParameters.size(); i++) {
+    bool isOverridden = false;
+    for (size_t j = 0; j < job.Parameters.size(); j++)
+      isOverridden |= job.Parameters[j].first == m_CommonParameters[i].first;
+    if (!isOverridden)
+      parameters.push_back(m_CommonParameters[i]);
+  }
+  parameters.insert(parameters.end(), job.Parameters.begin(), job.Parameters.end());
+
+  std::vector<std::string> args;
+  args.push_back(m_Executable);
+  for (size_t i = 0; i < parameters.size(); i++) {
+    const std::string &value = parameters[i].second;
+    if (value == "false")
+      continue;
+    args.push_back("--" + parameters[i].first);
+    if (value != "true")
+      args.push_back(value);
+  }
+  args.push_back(job.Input);
+  args.push_back(job.Output);
+  return args;
+}
+
+void BatchRunner::Run(int nWorkers, ProgressCallback callback, void *clientData)
+{
+  nWorkers = std::max(nWorkers, 1);
+
+  std::vector<RunningJob> running;
+  size_t iNext = 0, nDone = 0;
+  bool isCancelled = false;
+  while (iNext < m_Jobs.size() || !running.empty()) {
+    // Start subjects until all the workers are busy
+    while (!isCancelled && iNext < m_Jobs.size() && running.size() < static_cast<size_t>(nWorkers)) {
+      RunningJob rj;
+      rj.Index = iNext++;
+      rj.StartTime = vtkTimerLog::GetUniversalTime();
+
+      // The child reports its peak memory in a return parameter file
+      // written next to its output
+      rj.ParameterFile = m_Jobs[rj.Index].Output + ".batch.txt";
+      std::vector<std::string> args = GetCommandLine(rj.Index);
+      args.insert(args.begin() + 1, rj.ParameterFile);
+      args.insert(args.begin() + 1, "--returnparameterfile");
+
+      std::vector<const char *> argv;
+      for (size_t i = 0; i < args.size(); i++)
+        argv.push_back(args[i].c_str());
+      argv.push_back(NULL);
+
+      rj.Process = vtksysProcess_New();
+      vtksysProcess_SetCommand(rj.Process, argv.data());
+      vtksysProcess_SetOption(rj.Process, vtksysProcess_Option_HideWindow, 1);
+      vtksysProcess_Execute(rj.Process);
+      running.push_back(rj);
+    }
+
+    // Collect the output of the children, and the exit status of those
+    // that are done
+    bool isIdle = true;
+    for (size_t r = 0; r < running.size();) {
+      RunningJob &rj = running[r];
+      int pipe = vtksysProcess_Pipe_Timeout;
+      if (vtksysProcess_GetState(rj.Process) == vtksysProcess_State_Executing) {
+        char *data = NULL;
+        int length = 0;
+        double timeout = 0.0;
+        while ((pipe = vtksysProcess_WaitForData(rj.Process, &data, &length, &timeout))
+               == vtksysProcess_Pipe_STDOUT || pipe == vtksysProcess_Pipe_STDERR) {
+          if (pipe == vtksysProcess_Pipe_STDERR)
+            rj.Errors.append(data, length);
+          isIdle = false;
+          timeout = 0.0;
+        }
+        if (pipe == vtksysProcess_Pipe_Timeout) {
+          r++;
+          continue;
+        }
+        vtksysProcess_WaitForExit(rj.Process, NULL);
+      }
+
+      Result &result = m_Results[rj.Index];
+      result.Time = vtkTimerLog::GetUniversalTime() - rj.StartTime;
+      switch (vtksysProcess_GetState(rj.Process)) {
+        case vtksysProcess_State_Exited:
+          result.ExitCode = vtksysProcess_GetExitValue(rj.Process);
+          result.Status = result.ExitCode == 0 ? JOB_SUCCEEDED : JOB_FAILED;
+          break;
+        case vtksysProcess_State_Exception:
+          result.Status = JOB_CRASHED;
+          result.ExitCode = vtksysProcess_GetExitException(rj.Process);
+          rj.Errors += std::string("\n") + vtksysProcess_GetExceptionString(rj.Process);
+          break;
+        case vtksysProcess_State_Killed:
+          result.Status = JOB_CANCELLED;
+          break;
+        default:
+          result.Status = JOB_FAILED;
+          rj.Errors += std::string("\n") + vtksysProcess_GetErrorString(rj.Process);
+          break;
+      }
+
+      // Keep the last line of the standard error as the status message
+      std::string errors = Trim(rj.Errors);
+      result.Message = errors.substr(errors.find_last_of('\n') == std::string::npos ? 0 : errors.find_last_of('\n') + 1);
+      result.PeakMemory = ReadReturnParameter(rj.ParameterFile, "peakMemory");
+      vtksys::SystemTools::RemoveFile(rj.ParameterFile);
+
+      vtksysProcess_Delete(rj.Process);
+      running.erase(running.begin() + r);
+      nDone++;
+      isIdle = false;
+    }
+
+    // On cancellation, kill the children and skip the remaining subjects
+    if (!isCancelled && callback && !(*callback)(nDone, m_Jobs.size(), clientData)) {
+      isCancelled = true;
+      for (size_t r = 0; r < running.size(); r++)
+        vtksysProcess_Kill(running[r].Process);
+      for (size_t i = iNext; i < m_Jobs.size(); i++)
+        m_Results[i].Status = JOB_CANCELLED;
+      iNext = m_Jobs.size();
+    }
+
+    if (isIdle)
+      vtksys::SystemTools::Delay(POLL_INTERVAL);
+  }
+}
+
+size_t BatchRunner::GetNumberOfSucceededJobs() const
+{
+  size_t n = 0;
+  for (size_t i = 0; i < m_Results.size(); i++)
+    if (m_Results[i].Status == JOB_SUCCEEDED)
+      n++;
+  return n;
+}
+
+const char *BatchRunner::GetStatusName(JobStatus status)
+{
+  switch (status) {
+    case JOB_PENDING: return "pending";
+    case JOB_SUCCEEDED: return "ok";
+    case JOB_FAILED: return "failed";
+    case JOB_CRASHED: return "crashed";
+    case JOB_CANCELLED: return "cancelled";
+  }
+  return "unknown";
+}
+
+void BatchRunner::PrintSummary(std::ostream &os) const
+{
+  char line[256];
+  snprintf(line, sizeof(line), "%-40s %-10s %10s %12s", "Input", "Status", "Time (s)", "Peak (MB)");
+  os << line << std::endl;
+  for (size_t i = 0; i < m_Jobs.size(); i++) {
+    const Result &result = m_Results[i];
+    std::string name = vtksys::SystemTools::GetFilenameName(m_Jobs[i].Input);
+    snprintf(line, sizeof(line), "%-40s %-10s %10.3f %12.1f", name.c_str(), GetStatusName(result.Status),
+             result.Time, result.PeakMemory);
+    os << line;
+    if (!result.Message.empty() && result.Status != JOB_SUCCEEDED)
+      os << "  " << result.Message;
+    os << std::endl;
+  }
+  os << GetNumberOfSucceededJobs() << " of " << m_Jobs.size() << " subjects succeeded" << std::endl;
+}
+
+bool BatchRunner::WriteSummary(const std::string &filename) const
+{
+  std::ofstream fout(filename.c_str());
+  if (!fout.good())
+    return false;
+
+  fout << "input,output,status,exitCode,time,peakMemory,message" << std::endl;
+  for (size_t i = 0; i < m_Jobs.size(); i++) {
+    const Result &result = m_Results[i];
+    fout << QuoteCSVField(m_Jobs[i].Input) << "," << QuoteCSVField(m_Jobs[i].Output) << ","
+         << GetStatusName(result.Status) << "," << result.ExitCode << "," << result.Time << ","
+         << result.PeakMemory << "," << QuoteCSVField(result.Message) << std::endl;
+  }
+  return fout.good();
+}
@@ -0,0 +1,96 @@
+#ifndef __BatchRunner_h_
+#define __BatchRunner_h_
+
+#include <iosfwd>
+#include <string>
+#include <utility>
+#include <vector>
+#include <cstddef>
+
+/**
+ * Runs the tool over the subjects of a cohort. The subjects are listed in a
+ * CSV manifest with a header row: the "input" and "output" columns hold the
+ * paths of the input and output models, relative to the manifest, and every
+ * other column holds a parameter of the tool, named by its long flag. Empty
+ * cells keep the value given on the command line, and "true" or "false"
+ * turn a boolean flag on or off.
+ *
+ * Each subject is processed by a child process running the tool executable,
+ * with at most a given number of children at a time, so that a mesh that
+ * makes the tool fail or crash does not stop the rest of the cohort. The
+ * standard output of the children is discarded, and the last line of their
+ * standard error is kept as the status message.
+ */
+class BatchRunner
+{
+public:
+  typedef std::vector<std::pair<std::string, std::string> > ParameterList;
+
+  struct Job
+  {
+    std::string Input, Output;
+    ParameterList Parameters;
+  };
+
+  enum JobStatus
+  {
+    JOB_PENDING = 0,
+    JOB_SUCCEEDED,
+    JOB_FAILED,
+    JOB_CRASHED,
+    JOB_CANCELLED
+  };
+
+  struct Result
+  {
+    JobStatus Status;
+    int ExitCode;
+    double Time;
+    double PeakMemory;
+    std::string Message;
+  };
+
+  /**
+   * Called after each subject, with the number of subjects done so far.
+   * Returning false cancels the run: the children are killed and the
+   * remaining subjects are not started.
+   */
+  typedef bool (*ProgressCallback)(size_t nDone, size_t nJobs, void *clientData);
+
+  BatchRunner(const std::string &executable);
+
+  /** Parameters passed to every subject, unless the manifest overrides them */
+  void SetCommonParameters(const ParameterList &parameters) { m_CommonParameters = parameters; }
+
+  /** Read the manifest, returns false and sets the error message on failure */
+  bool ReadManifest(const std::string &filename);
+
+  /** Run the subjects with at most nWorkers children at a time */
+  void Run(int nWorkers, ProgressCallback callback = NULL, void *clientData = NULL);
+
+  const std::vector<Job> &GetJobs() const { return m_Jobs; }
+  const std::vector<Result> &GetResults() const { return m_Results; }
+  const std::string &GetErrorMessage() const { return m_ErrorMessage; }
+
+  /** Number of subjects that ran to completion */
+  size_t GetNumberOfSucceededJobs() const;
+
+  /** Print the status of the subjects as a table */
+  void PrintSummary(std::ostream &os) const;
+
+  /** Write the status of the subjects to a CSV file, returns false on failure */
+  bool WriteSummary(const std::string &filename) const;
+
+  static const char *GetStatusName(JobStatus status);
+
+private:
+  std::vector<std::string> GetCommandLine(size_t iJob) const;
+
+  std::string m_Executable;
+  ParameterList m_CommonParameters;
+  std::vector<Job> m_Jobs;
+  std::vector<Result> m_Results;
+  std::string m_ErrorMessage;
+};
+
+#endif
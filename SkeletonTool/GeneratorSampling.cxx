@@ -0,0 +1,212 @@
+#include "GeneratorSampling.h"
+
+#include <vtkPolyData.h>
+#include <vtkMath.h>
+
+#include <algorithm>
+#include <cmath>
+#include <random>
+#include <unordered_map>
+#include <stdint.h>
+
+namespace {
+
+// Number of bits per axis of the hash grid cell keys
+const int CELL_KEY_BITS = 21;
+
+// Number of bisection steps when searching for the spacing
+const int MAX_SEARCH_STEPS = 40;
+
+// A grid of cubic cells over the bounding box of a surface, addressed by a
+// 64-bit key
+class HashGrid
+{
+public:
+  HashGrid(vtkPolyData *surface, double spacing)
+  {
+    double bounds[6];
+    surface->GetBounds(bounds);
+    double xMaxExtent = std::max(bounds[1] - bounds[0], std::max(bounds[3] - bounds[2], bounds[5] - bounds[4]));
+
+    // Very small cells would overflow the keys
+    m_Spacing = std::max(spacing, xMaxExtent / ((1 << CELL_KEY_BITS) - 2));
+    if (m_Spacing <= 0.0)
+      m_Spacing = 1.0;
+    for (int d = 0; d < 3; d++)
+      m_Origin[d] = bounds[2 * d];
+  }
+
+  void GetCell(const double x[3], int64_t ijk[3]) const
+  {
+    for (int d = 0; d < 3; d++)
+      ijk[d] = static_cast<int64_t>(floor((x[d] - m_Origin[d]) / m_Spacing));
+  }
+
+  static uint64_t GetKey(int64_t i, int64_t j, int64_t k)
+  {
+    const uint64_t mask = (1ULL << CELL_KEY_BITS) - 1;
+    return ((i & mask) << (2 * CELL_KEY_BITS)) | ((j & mask) << CELL_KEY_BITS) | (k & mask);
+  }
+
+private:
+  double m_Spacing, m_Origin[3];
+};
+
+void SampleVoxelGrid(vtkPolyData *surface, double spacing, std::vector<vtkIdType> &ids)
+{
+  HashGrid grid(surface, spacing);
+  vtkIdType n = surface->GetNumberOfPoints();
+
+  // Centroid of the vertices of each occupied cell
+  std::unordered_map<uint64_t, size_t> cellIndex;
+  std::vector<uint64_t> vertexCell(n);
+  std::vector<double> centroid;
+  std::vector<size_t> count;
+  for (vtkIdType i = 0; i < n; i++) {
+    double x[3];
+    int64_t ijk[3];
+    surface->GetPoint(i, x);
+    grid.GetCell(x, ijk);
+    vertexCell[i] = HashGrid::GetKey(ijk[0], ijk[1], ijk[2]);
+    std::pair<std::unordered_map<uint64_t, size_t>::iterator, bool> it =
+        cellIndex.insert(std::make_pair(vertexCell[i], count.size()));
+    if (it.second) {
+      centroid.resize(centroid.size() + 3, 0.0);
+      count.push_back(0);
+    }
+    size_t c = it.first->second;
+    for (int d = 0; d < 3; d++)
+      centroid[3 * c + d] += x[d];
+    count[c]++;
+  }
+  for (size_t c = 0; c < count.size(); c++)
+    for (int d = 0; d < 3; d++)
+      centroid[3 * c + d] /= count[c];
+
+  // The vertex closest to the centroid of each cell, the first one on ties
+  std::vector<vtkIdType> best(count.size(), -1);
+  std::vector<double> bestDist(count.size(), 0.0);
+  for (vtkIdType i = 0; i < n; i++) {
+    double x[3];
+    surface->GetPoint(i, x);
+    size_t c = cellIndex[vertexCell[i]];
+    double dist = vtkMath::Distance2BetweenPoints(x, &centroid[3 * c]);
+    if (best[c] < 0 || dist < bestDist[c]) {
+      best[c] = i;
+      bestDist[c] = dist;
+    }
+  }
+
+  ids.assign(best.begin(), best.end());
+  std::sort(ids.begin(), ids.end());
+}
+
+void SamplePoissonDisk(vtkPolyData *surface, double spacing, std::vector<vtkIdType> &ids)
+{
+  HashGrid grid(surface, spacing);
+  vtkIdType n = surface->GetNumberOfPoints();
+
+  // Visit the vertices in a fixed pseudo-random order, so that the samples
+  // are the same from run to run and on every platform
+  std::vector<vtkIdType> order(n);
+  for (vtkIdType i = 0; i < n; i++)
+    order[i] = i;
+  std::mt19937 rng(0);
+  for (vtkIdType i = n - 1; i > 0; i--)
+    std::swap(order[i], order[rng() % (i + 1)]);
+
+  // Keep the vertices that are far enough from those already kept, which are
+  // looked up in the cells around the vertex
+  std::unordered_map<uint64_t, std::vector<vtkIdType> > kept;
+  double spacing2 = spacing * spacing;
+  ids.clear();
+  for (vtkIdType r = 0; r < n; r++) {
+    vtkIdType i = order[r];
+    double x[3];
+    int64_t ijk[3];
+    surface->GetPoint(i, x);
+    grid.GetCell(x, ijk);
+
+    bool isFar = true;
+    for (int64_t a = -1; a <= 1 && isFar; a++)
+      for (int64_t b = -1; b <= 1 && isFar; b++)
+        for (int64_t c = -1; c <= 1 && isFar; c++) {
+          std::unordered_map<uint64_t, std::vector<vtkIdType> >::const_iterator it =
+              kept.find(HashGrid::GetKey(ijk[0] + a, ijk[1] + b, ijk[2] + c));
+          if (it == kept.end())
+            continue;
+          for (size_t q = 0; q < it->second.size() && isFar; q++) {
+            double y[3];
+            surface->GetPoint(it->second[q], y);
+            isFar = vtkMath::Distance2BetweenPoints(x, y) >= spacing2;
+          }
+        }
+
+    if (isFar) {
+      kept[HashGrid::GetKey(ijk[0], ijk[1], ijk[2])].push_back(i);
+      ids.push_back(i);
+    }
+  }
+
+  std::sort(ids.begin(), ids.end());
+}
+
+} // end of anonymous namespace
+
+GeneratorSamplingMethod GetGeneratorSamplingMethod(const std::string &name)
+{
+  if (name == "VoxelGrid")
+    return SAMPLING_VOXEL_GRID;
+  if (name == "PoissonDisk")
+    return SAMPLING_POISSON_DISK;
+  return SAMPLING_NONE;
+}
+
+void SampleGenerators(vtkPolyData *surface, GeneratorSamplingMethod method, double spacing,
+                      std::vector<vtkIdType> &ids)
+{
+  if (method == SAMPLING_VOXEL_GRID && spacing > 0.0) {
+    SampleVoxelGrid(surface, spacing, ids);
+  } else if (method == SAMPLING_POISSON_DISK && spacing > 0.0) {
+    SamplePoissonDisk(surface, spacing, ids);
+  } else {
+    ids.resize(surface->GetNumberOfPoints());
+    for (vtkIdType i = 0; i < surface->GetNumberOfPoints(); i++)
+      ids[i] = i;
+  }
+}
+
+double SampleGeneratorCount(vtkPolyData *surface, GeneratorSamplingMethod method, size_t nTarget,
+                            std::vector<vtkIdType> &ids)
+{
+  size_t n = surface->GetNumberOfPoints();
+  if (method == SAMPLING_NONE || nTarget == 0 || nTarget >= n) {
+    SampleGenerators(surface, SAMPLING_NONE, 0.0, ids);
+    return 0.0;
+  }
+
+  // The number of samples decreases with the spacing, from all the vertices
+  // for a tiny spacing to a handful for the diagonal of the bounding box.
+  // Bisect on the logarithm of the spacing, keeping the best sample
+  double lo = surface->GetLength() * 1e-6, hi = surface->GetLength();
+  double best = hi;
+  std::vector<vtkIdType> sample;
+  SampleGenerators(surface, method, hi, ids);
+  for (int step = 0; step < MAX_SEARCH_STEPS && ids.size() != nTarget; step++) {
+    double mid = sqrt(lo * hi);
+    SampleGenerators(surface, method, mid, sample);
+    if (sample.size() > nTarget)
+      lo = mid;
+    else
+      hi = mid;
+
+    size_t err = sample.size() > nTarget ? sample.size() - nTarget : nTarget - sample.size();
+    size_t errBest = ids.size() > nTarget ? ids.size() - nTarget : nTarget - ids.size();
+    if (err < errBest) {
+      ids.swap(sample);
+      best = mid;
+    }
+  }
+
+  return best;
+}
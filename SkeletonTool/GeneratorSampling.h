@@ -0,0 +1,49 @@
+#ifndef __GeneratorSampling_h_
+#define __GeneratorSampling_h_
+
+#include <vtkType.h>
+
+#include <string>
+#include <vector>
+#include <cstddef>
+
+class vtkPolyData;
+
+/**
+ * Selection of the boundary vertices that generate the Voronoi diagram. The
+ * size of the diagram, and of every later stage, grows with the number of
+ * generators, so a dense mesh can be subsampled down to the spacing that the
+ * shape detail calls for. The generators are always vertices of the surface,
+ * so that the geodesic distances between them can still be measured on the
+ * full mesh.
+ *
+ * "VoxelGrid" keeps, in each cube of the given size, the vertex closest to
+ * the centroid of the vertices in the cube. "PoissonDisk" visits the vertices
+ * in a fixed pseudo-random order and keeps those that are at least the given
+ * distance away from all the vertices kept before (blue noise).
+ */
+enum GeneratorSamplingMethod
+{
+  SAMPLING_NONE = 0,
+  SAMPLING_VOXEL_GRID,
+  SAMPLING_POISSON_DISK
+};
+
+/** Parse the name of a sampling method, as used by the CLI ("None", ...) */
+GeneratorSamplingMethod GetGeneratorSamplingMethod(const std::string &name);
+
+/**
+ * Select the generators with the given spacing. The ids of the selected
+ * vertices are returned in increasing order.
+ */
+void SampleGenerators(vtkPolyData *surface, GeneratorSamplingMethod method, double spacing,
+                      std::vector<vtkIdType> &ids);
+
+/**
+ * Select about nTarget generators, searching for the spacing that yields the
+ * closest number of vertices. Returns that spacing.
+ */
+double SampleGeneratorCount(vtkPolyData *surface, GeneratorSamplingMethod method, size_t nTarget,
+                            std::vector<vtkIdType> &ids);
+
+#endif
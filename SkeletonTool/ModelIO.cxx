@@ -0,0 +1,77 @@
+#include "ModelIO.h"
+
+#include <vtkNew.h>
+#include <vtkPolyData.h>
+
+#include "vtkMRMLModelNode.h"
+#include "vtkMRMLModelStorageNode.h"
+#include "vtkMRMLScene.h"
+
+#include <cstdint>
+#include <cstdlib>
+
+namespace {
+
+const char MODEL_NODE_REFERENCE_PREFIX[] = "slicer:";
+
+} // end of anonymous namespace
+
+bool IsModelNodeReference(const std::string &model)
+{
+  return model.compare(0, sizeof(MODEL_NODE_REFERENCE_PREFIX) - 1, MODEL_NODE_REFERENCE_PREFIX) == 0;
+}
+
+vtkMRMLModelNode *GetReferencedModelNode(const std::string &model)
+{
+  size_t hash = model.find('#');
+  if (!IsModelNodeReference(model) || hash == std::string::npos)
+    return NULL;
+
+  // The address of the scene is in hexadecimal, with or without "0x"
+  std::string address = model.substr(sizeof(MODEL_NODE_REFERENCE_PREFIX) - 1,
+                                     hash - sizeof(MODEL_NODE_REFERENCE_PREFIX) + 1);
+  char *end = NULL;
+  uintptr_t scene = static_cast<uintptr_t>(std::strtoull(address.c_str(), &end, 16));
+  if (scene == 0 || *end != '\0')
+    return NULL;
+
+  return vtkMRMLModelNode::SafeDownCast(
+      reinterpret_cast<vtkMRMLScene *>(scene)->GetNodeByID(model.substr(hash + 1).c_str()));
+}
+
+vtkSmartPointer<vtkPolyData> ReadModel(const std::string &model)
+{
+  vtkSmartPointer<vtkPolyData> poly = vtkSmartPointer<vtkPolyData>::New();
+  if (IsModelNodeReference(model)) {
+    vtkMRMLModelNode *node = GetReferencedModelNode(model);
+    if (!node || !node->GetPolyData())
+      return NULL;
+    poly->ShallowCopy(node->GetPolyData());
+    return poly;
+  }
+
+  vtkNew<vtkMRMLModelStorageNode> storageNode;
+  vtkNew<vtkMRMLModelNode> node;
+  storageNode->SetFileName(model.c_str());
+  if (!storageNode->ReadData(node) || !node->GetPolyData())
+    return NULL;
+  poly = node->GetPolyData();
+  return poly;
+}
+
+bool WriteModel(const std::string &model, vtkPolyData *poly)
+{
+  if (IsModelNodeReference(model)) {
+    vtkMRMLModelNode *node = GetReferencedModelNode(model);
+    if (!node)
+      return false;
+    node->SetAndObservePolyData(poly);
+    return true;
+  }
+
+  vtkNew<vtkMRMLModelNode> node;
+  node->SetAndObservePolyData(poly);
+  vtkNew<vtkMRMLModelStorageNode> storageNode;
+  storageNode->SetFileName(model.c_str());
+  return storageNode->WriteData(node) != 0;
+}
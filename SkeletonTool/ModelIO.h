@@ -0,0 +1,36 @@
+#ifndef __ModelIO_h_
+#define __ModelIO_h_
+
+#include <vtkSmartPointer.h>
+
+#include <string>
+
+class vtkPolyData;
+class vtkMRMLModelNode;
+
+/**
+ * Reading and writing the models of the CLIs. A model is given either by
+ * the name of a file, or by a reference "slicer:<scene address>#<node ID>"
+ * to a model node of a scene of the same process. The references are
+ * passed when the CLI runs as a shared library in the process of Slicer,
+ * so that the models are exchanged in memory rather than through temporary
+ * files.
+ *
+ * A model read from a node is a shallow copy of its polydata, so that the
+ * CLI can add arrays or build links without touching the node. A model
+ * written to a node is set as its polydata.
+ */
+
+/** Whether the model is given by a reference to a model node */
+bool IsModelNodeReference(const std::string &model);
+
+/** The model node referenced by a "slicer:" reference, or NULL */
+vtkMRMLModelNode *GetReferencedModelNode(const std::string &model);
+
+/** Read a model from a file or a model node, returns NULL on failure */
+vtkSmartPointer<vtkPolyData> ReadModel(const std::string &model);
+
+/** Write a model to a file or a model node, returns false on failure */
+bool WriteModel(const std::string &model, vtkPolyData *poly);
+
+#endif
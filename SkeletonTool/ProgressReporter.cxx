@@ -0,0 +1,65 @@
+#include "ProgressReporter.h"
+
+#include "ModuleProcessInformation.h"
+
+#include <vtkTimerLog.h>
+
+#include <cstring>
+#include <iostream>
+
+ProgressReporter::ProgressReporter(ModuleProcessInformation *info)
+  : m_Info(info), m_Start(0.0), m_End(0.0), m_Last(-1.0), m_StartTime(0.0)
+{
+}
+
+void ProgressReporter::StartStage(const std::string &name, const std::string &comment, double start, double end)
+{
+  EndStage();
+  m_Name = name;
+  m_Start = start;
+  m_End = end;
+  m_StartTime = vtkTimerLog::GetUniversalTime();
+  if (m_Info) {
+    strncpy(m_Info->ProgressMessage, comment.c_str(), sizeof(m_Info->ProgressMessage) - 1);
+    m_Info->ProgressMessage[sizeof(m_Info->ProgressMessage) - 1] = 0;
+    m_Info->StageProgress = 0.0f;
+  } else {
+    std::cout << "<filter-start><filter-name>" << name << "</filter-name><filter-comment>" << comment
+              << "</filter-comment></filter-start>" << std::endl;
+  }
+  Update(0.0);
+}
+
+bool ProgressReporter::Update(double fraction)
+{
+  double progress = m_Start + (m_End - m_Start) * fraction;
+  if (progress >= m_Last + 0.005 || fraction >= 1.0) {
+    m_Last = progress;
+    if (m_Info) {
+      m_Info->Progress = static_cast<float>(progress);
+      m_Info->StageProgress = static_cast<float>(fraction);
+      if (m_Info->ProgressCallbackFunction && m_Info->ProgressCallbackClientData)
+        (*m_Info->ProgressCallbackFunction)(m_Info->ProgressCallbackClientData);
+    } else {
+      std::cout << "<filter-progress>" << progress << "</filter-progress>" << std::endl;
+    }
+  }
+  return !IsCancelled();
+}
+
+void ProgressReporter::EndStage()
+{
+  if (m_Name.empty())
+    return;
+  Update(1.0);
+  if (!m_Info) {
+    std::cout << "<filter-end><filter-name>" << m_Name << "</filter-name><filter-time>"
+              << vtkTimerLog::GetUniversalTime() - m_StartTime << "</filter-time></filter-end>" << std::endl;
+  }
+  m_Name.clear();
+}
+
+bool ProgressReporter::IsCancelled() const
+{
+  return m_Info && m_Info->Abort;
+}
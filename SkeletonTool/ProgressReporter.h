@@ -0,0 +1,40 @@
+#ifndef __ProgressReporter_h_
+#define __ProgressReporter_h_
+
+#include <string>
+
+struct ModuleProcessInformation;
+
+/**
+ * Reports the progress of the run of a CLI to Slicer: through the process
+ * information when the module runs in-process, and through <filter-*> tags
+ * on stdout when it runs as an executable. Each stage covers a range of the
+ * overall progress, and runs from StartStage() to the next StartStage() or
+ * EndStage(). Update() returns false once the user has asked to cancel the
+ * run.
+ */
+class ProgressReporter
+{
+public:
+  ProgressReporter(ModuleProcessInformation *info);
+
+  /** Start a stage covering the range [start, end] of the overall progress,
+   * ending the current one */
+  void StartStage(const std::string &name, const std::string &comment, double start, double end);
+
+  /** Report the fraction of the current stage that is done */
+  bool Update(double fraction);
+
+  /** End the current stage, if any */
+  void EndStage();
+
+  /** Whether the user has asked to cancel the run */
+  bool IsCancelled() const;
+
+private:
+  ModuleProcessInformation *m_Info;
+  std::string m_Name;
+  double m_Start, m_End, m_Last, m_StartTime;
+};
+
+#endif
@@ -0,0 +1,829 @@
+#include "QhullVoronoi.h"
+#include "StageProfiler.h"
+
+#include <vtkSMPTools.h>
+
+#include <algorithm>
+#include <atomic>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <fstream>
+#include <iostream>
+#include <limits>
+#include <string>
+#include <unordered_map>
+
+extern "C" {
+#include <libqhull_r/qhull_ra.h>
+}
+
+namespace {
+
+// https://github.com/ros-planning/geometric_shapes/blob/3c23af045de12eee725205f3e9e1c42aa1d53dc8/src/bodies.cpp#L934-L941
+FILE *GetNullFile()
+{
+  static FILE* null = fopen("/dev/null", "w");
+  return null;
+}
+
+/**
+ * qhull prints coordinates with the format qh_REAL_1 ("%6.16g "), i.e., with
+ * 16 significant digits. Round the coordinate the same way, so that the values
+ * are identical to the ones parsed back from the text output.
+ */
+double RoundAsPrintedByQhull(double x)
+{
+  char buffer[64];
+  snprintf(buffer, sizeof(buffer), "%.16g", x);
+  return strtod(buffer, NULL);
+}
+
+/**
+ * Ridge callback for qh_printvdiagram2. Stores the ridge the same way as
+ * qh_printvridge prints it. qhull passes the FILE pointer through to the
+ * callback untouched, so it is used to carry the output diagram.
+ */
+void AppendVoronoiRidge(qhT *qh, FILE *fp, vertexT *vertex, vertexT *vertexA, setT *centers, boolT unbounded)
+{
+  QhullVoronoiDiagram *vd = reinterpret_cast<QhullVoronoiDiagram *>(fp);
+  facetT *facet, **facetp;
+  QHULL_UNUSED(unbounded);
+
+  vd->Ridges.push_back(qh_setsize(qh, centers) + 2);
+  vd->Ridges.push_back(qh_pointid(qh, vertex->point));
+  vd->Ridges.push_back(qh_pointid(qh, vertexA->point));
+  FOREACHfacet_(centers)
+    vd->Ridges.push_back(facet->visitid);
+  vd->NumberOfRidges++;
+}
+
+void FreeQhull(qhT *qh)
+{
+  int curlong, totlong;
+  qh_freeqhull(qh, !qh_ALL);
+  qh_memfreeshort(qh, &curlong, &totlong);
+}
+
+// Number of points in the leaves of the octree used for the point queries
+const size_t OCTREE_LEAF_POINTS = 32;
+const int OCTREE_MAX_DEPTH = 24;
+
+// Initial width of the halo around a block, relative to its largest side
+const double HALO_FRACTION = 0.1;
+
+// Relative tolerance of the emptiness tests. Points on a circumsphere or on a
+// hull plane count as inside, since qhull may merge them into the cell
+const double CERTIFY_TOLERANCE = 1e-9;
+
+bool BoxContainsBox(const double outer[6], const double inner[6])
+{
+  for (int d = 0; d < 3; d++)
+    if (inner[2 * d] < outer[2 * d] || inner[2 * d + 1] > outer[2 * d + 1])
+      return false;
+  return true;
+}
+
+bool BoxContainsPoint(const double box[6], const double x[3])
+{
+  for (int d = 0; d < 3; d++)
+    if (x[d] < box[2 * d] || x[d] > box[2 * d + 1])
+      return false;
+  return true;
+}
+
+// A closed ball, e.g., the circumsphere of a Delaunay cell
+struct Ball
+{
+  double Center[3], Radius2;
+
+  bool Intersects(const double box[6]) const
+  {
+    double dist2 = 0.0;
+    for (int d = 0; d < 3; d++) {
+      double t = std::max(box[2 * d] - Center[d], std::max(0.0, Center[d] - box[2 * d + 1]));
+      dist2 += t * t;
+    }
+    return dist2 <= Radius2;
+  }
+
+  bool Contains(const double x[3]) const
+  {
+    double dist2 = 0.0;
+    for (int d = 0; d < 3; d++)
+      dist2 += (x[d] - Center[d]) * (x[d] - Center[d]);
+    return dist2 <= Radius2;
+  }
+
+  bool IsInside(const double box[6]) const
+  {
+    double r = sqrt(Radius2);
+    for (int d = 0; d < 3; d++)
+      if (Center[d] - r < box[2 * d] || Center[d] + r > box[2 * d + 1])
+        return false;
+    return true;
+  }
+};
+
+// The closed outer side of a plane, e.g., beyond a convex hull face
+struct HalfSpace
+{
+  double Normal[3], Offset;
+
+  bool Intersects(const double box[6]) const
+  {
+    double xMax = 0.0;
+    for (int d = 0; d < 3; d++)
+      xMax += Normal[d] * (Normal[d] > 0 ? box[2 * d + 1] : box[2 * d]);
+    return xMax >= Offset;
+  }
+
+  bool Contains(const double x[3]) const
+  {
+    return Normal[0] * x[0] + Normal[1] * x[1] + Normal[2] * x[2] >= Offset;
+  }
+};
+
+// An octree over a set of points. Each node holds a range of the permuted
+// point ids and the tight bounds of its points
+class PointOctree
+{
+public:
+  struct Node
+  {
+    double Bounds[6];
+    size_t Begin, End;
+    int Child[8];
+    int NumberOfChildren;
+  };
+
+  PointOctree(const std::vector<double> &points)
+    : m_Points(points)
+  {
+    m_Ids.resize(points.size() / 3);
+    for (size_t i = 0; i < m_Ids.size(); i++)
+      m_Ids[i] = i;
+    Build(0, m_Ids.size(), 0);
+  }
+
+  const Node &GetNode(int iNode) const { return m_Nodes[iNode]; }
+  const std::vector<size_t> &GetIds() const { return m_Ids; }
+
+  // The largest nodes with at most nMaxPoints points, covering all points
+  void GetBlocks(int iNode, size_t nMaxPoints, std::vector<int> &blocks) const
+  {
+    const Node &node = m_Nodes[iNode];
+    if (node.End - node.Begin <= nMaxPoints || node.NumberOfChildren == 0)
+      blocks.push_back(iNode);
+    else
+      for (int c = 0; c < node.NumberOfChildren; c++)
+        GetBlocks(node.Child[c], nMaxPoints, blocks);
+  }
+
+  // The points inside a box
+  void FindPointsInBox(int iNode, const double box[6], std::vector<size_t> &ids) const
+  {
+    const Node &node = m_Nodes[iNode];
+    for (int d = 0; d < 3; d++)
+      if (node.Bounds[2 * d] > box[2 * d + 1] || node.Bounds[2 * d + 1] < box[2 * d])
+        return;
+
+    if (BoxContainsBox(box, node.Bounds)) {
+      ids.insert(ids.end(), m_Ids.begin() + node.Begin, m_Ids.begin() + node.End);
+    } else if (node.NumberOfChildren == 0) {
+      for (size_t k = node.Begin; k < node.End; k++)
+        if (BoxContainsPoint(box, &m_Points[3 * m_Ids[k]]))
+          ids.push_back(m_Ids[k]);
+    } else {
+      for (int c = 0; c < node.NumberOfChildren; c++)
+        FindPointsInBox(node.Child[c], box, ids);
+    }
+  }
+
+  // Find the point closest to x among the points in the region that are
+  // neither in the box nor in the sorted list of extra points
+  template <class TRegion>
+  void FindNearestPointOutside(int iNode, const TRegion &region, const double box[6],
+                               const std::vector<size_t> &extra, const double x[3],
+                               size_t &iBest, double &xBestDist2) const
+  {
+    const Node &node = m_Nodes[iNode];
+    if (!region.Intersects(node.Bounds) || BoxContainsBox(box, node.Bounds))
+      return;
+
+    double dist2 = 0.0;
+    for (int d = 0; d < 3; d++) {
+      double t = std::max(node.Bounds[2 * d] - x[d], std::max(0.0, x[d] - node.Bounds[2 * d + 1]));
+      dist2 += t * t;
+    }
+    if (dist2 >= xBestDist2)
+      return;
+
+    if (node.NumberOfChildren == 0) {
+      for (size_t k = node.Begin; k < node.End; k++) {
+        const double *y = &m_Points[3 * m_Ids[k]];
+        if (BoxContainsPoint(box, y) || !region.Contains(y)
+            || std::binary_search(extra.begin(), extra.end(), m_Ids[k]))
+          continue;
+        double d2 = 0.0;
+        for (int d = 0; d < 3; d++)
+          d2 += (y[d] - x[d]) * (y[d] - x[d]);
+        if (d2 < xBestDist2) {
+          iBest = m_Ids[k];
+          xBestDist2 = d2;
+        }
+      }
+    } else {
+      for (int c = 0; c < node.NumberOfChildren; c++)
+        FindNearestPointOutside(node.Child[c], region, box, extra, x, iBest, xBestDist2);
+    }
+  }
+
+  // Find all the points in the region that are not taken yet, and take
+  // them. The points in the box must be taken already
+  template <class TRegion>
+  void FindPointsNotTaken(int iNode, const TRegion &region, const double box[6],
+                          std::vector<char> &isTaken, std::vector<size_t> &ids) const
+  {
+    const Node &node = m_Nodes[iNode];
+    if (!region.Intersects(node.Bounds) || BoxContainsBox(box, node.Bounds))
+      return;
+
+    if (node.NumberOfChildren == 0) {
+      for (size_t k = node.Begin; k < node.End; k++) {
+        if (!isTaken[m_Ids[k]] && region.Contains(&m_Points[3 * m_Ids[k]])) {
+          isTaken[m_Ids[k]] = 1;
+          ids.push_back(m_Ids[k]);
+        }
+      }
+    } else {
+      for (int c = 0; c < node.NumberOfChildren; c++)
+        FindPointsNotTaken(node.Child[c], region, box, isTaken, ids);
+    }
+  }
+
+private:
+  const std::vector<double> &m_Points;
+  std::vector<size_t> m_Ids;
+  std::vector<Node> m_Nodes;
+
+  int Build(size_t begin, size_t end, int depth)
+  {
+    Node node;
+    node.Begin = begin;
+    node.End = end;
+    node.NumberOfChildren = 0;
+    for (int d = 0; d < 3; d++) {
+      node.Bounds[2 * d] = m_Points[3 * m_Ids[begin] + d];
+      node.Bounds[2 * d + 1] = node.Bounds[2 * d];
+    }
+    for (size_t k = begin; k < end; k++) {
+      for (int d = 0; d < 3; d++) {
+        double x = m_Points[3 * m_Ids[k] + d];
+        node.Bounds[2 * d] = std::min(node.Bounds[2 * d], x);
+        node.Bounds[2 * d + 1] = std::max(node.Bounds[2 * d + 1], x);
+      }
+    }
+
+    int iNode = static_cast<int>(m_Nodes.size());
+    m_Nodes.push_back(node);
+    if (end - begin <= OCTREE_LEAF_POINTS || depth >= OCTREE_MAX_DEPTH)
+      return iNode;
+
+    // Split the points at the center of the bounds, one axis at a time
+    double center[3];
+    for (int d = 0; d < 3; d++)
+      center[d] = 0.5 * (node.Bounds[2 * d] + node.Bounds[2 * d + 1]);
+
+    size_t split[9];
+    split[0] = begin;
+    split[8] = end;
+    for (int d = 0, step = 4; d < 3; d++, step /= 2) {
+      for (int c = 0; c < 8; c += 2 * step) {
+        size_t *first = &m_Ids[0] + split[c], *last = &m_Ids[0] + split[c + 2 * step];
+        split[c + step] = std::partition(first, last, [&](size_t i) { return m_Points[3 * i + d] < center[d]; })
+            - &m_Ids[0];
+      }
+    }
+
+    // All the points coincide
+    for (int c = 0; c < 8; c++)
+      if (split[c] == begin && split[c + 1] == end)
+        return iNode;
+
+    int child[8], nChildren = 0;
+    for (int c = 0; c < 8; c++)
+      if (split[c + 1] > split[c])
+        child[nChildren++] = Build(split[c], split[c + 1], depth + 1);
+
+    std::copy(child, child + nChildren, m_Nodes[iNode].Child);
+    m_Nodes[iNode].NumberOfChildren = nChildren;
+    return iNode;
+  }
+};
+
+// The Voronoi ridges owned by one block, with their Voronoi vertices. The
+// vertices are identified by the sorted ids of the generators of their
+// Delaunay cells
+struct BlockDiagram
+{
+  std::vector<double> Vertices;
+  std::vector<int> KeyOffsets, Keys;
+  std::vector<int> Ridges;
+  size_t NumberOfRidges;
+  int ExitCode;
+};
+
+enum BlockStatus
+{
+  BLOCK_COMPUTED,
+  BLOCK_UNCERTIFIED,
+  BLOCK_OVER_BUDGET
+};
+
+// Compute the Voronoi ridges of the core points of a block (the points of
+// an octree node) from the points within the halo around it and the extra
+// points (sorted). Returns BLOCK_UNCERTIFIED if the ridges could not be
+// certified, after adding to the extra points all those that invalidate a
+// Delaunay cell around a core point and the nearest one beyond each invalid
+// hull face. If there are none, the halo must be grown. Returns
+// BLOCK_OVER_BUDGET, without running qhull, if the block would take more than
+// nMaxPoints points.
+BlockStatus ComputeBlockVoronoiDiagram(const PointOctree &tree, const std::vector<double> &points,
+                                       const std::vector<int> &blockOf, int iBlock, double halo,
+                                       size_t nMaxPoints, std::vector<size_t> &extra, BlockDiagram &bd)
+{
+  const PointOctree::Node &node = tree.GetNode(iBlock), &root = tree.GetNode(0);
+  double box[6];
+  for (int d = 0; d < 3; d++) {
+    box[2 * d] = node.Bounds[2 * d] - halo;
+    box[2 * d + 1] = node.Bounds[2 * d + 1] + halo;
+  }
+
+  // The points in the halo, in increasing order, so that qhull orders the
+  // generators of the ridges as it does for the whole point set
+  std::vector<size_t> ids(extra);
+  tree.FindPointsInBox(0, box, ids);
+  std::sort(ids.begin(), ids.end());
+  ids.erase(std::unique(ids.begin(), ids.end()), ids.end());
+  if (ids.size() > nMaxPoints)
+    return BLOCK_OVER_BUDGET;
+
+  std::vector<double> local(3 * ids.size());
+  for (size_t i = 0; i < ids.size(); i++)
+    std::copy(&points[3 * ids[i]], &points[3 * ids[i]] + 3, &local[3 * i]);
+
+  bd = BlockDiagram();
+  bd.NumberOfRidges = 0;
+  char qhull_cmd[] = "qhull v Qbb";
+  qhT qh_qh;
+  qhT* qh = &qh_qh;
+  qh_zero(qh, GetNullFile());
+  bd.ExitCode = qh_new_qhull(qh, 3, static_cast<int>(ids.size()), local.data(), false, qhull_cmd, NULL,
+                             GetNullFile());
+  if (bd.ExitCode != 0) {
+    FreeQhull(qh);
+    return BLOCK_COMPUTED;
+  }
+
+  // Voronoi vertices, numbered as for the whole point set
+  facetT *facet;
+  std::vector<facetT *> centerFacet(1, NULL);
+  FORALLfacet_(qh->facet_list) {
+    if (!qh_skipfacet(qh, facet)) {
+      if (!facet->center)
+        facet->center = qh_facetcenter(qh, facet->vertices);
+      centerFacet.push_back(facet);
+    }
+  }
+
+  boolT isLower;
+  int numcenters;
+  setT *vertices = qh_markvoronoi(qh, qh->facet_list, NULL, !qh_ALL, &isLower, &numcenters);
+
+  // Certify the Delaunay cells and the hull faces around the core points,
+  // unless the halo and the extra points already hold all the points
+  double diag = 0.0;
+  for (int d = 0; d < 3; d++)
+    diag += (root.Bounds[2 * d + 1] - root.Bounds[2 * d]) * (root.Bounds[2 * d + 1] - root.Bounds[2 * d]);
+  diag = sqrt(diag);
+
+  // The certification stops as soon as the missing points exceed the budget
+  std::vector<size_t> missing;
+  bool certified = true, isOverBudget = false;
+  bool isComplete = ids.size() == points.size() / 3;
+  std::vector<char> isTaken(isComplete ? 0 : points.size() / 3, 0);
+  for (size_t i = 0; i < ids.size() && !isComplete; i++)
+    isTaken[ids[i]] = 1;
+  for (int v = 1; v < numcenters && !isComplete && !isOverBudget; v++) {
+    facet = centerFacet[v];
+    vertexT *vertex, **vertexp;
+    bool isCore = false;
+    FOREACHvertex_(facet->vertices)
+      isCore |= blockOf[ids[qh_pointid(qh, vertex->point)]] == iBlock;
+    if (!isCore)
+      continue;
+
+    Ball ball;
+    const double *x0 = &local[3 * qh_pointid(qh, SETfirstt_(facet->vertices, vertexT)->point)];
+    ball.Radius2 = 0.0;
+    for (int d = 0; d < 3; d++) {
+      ball.Center[d] = facet->center[d];
+      ball.Radius2 += (x0[d] - ball.Center[d]) * (x0[d] - ball.Center[d]);
+    }
+    ball.Radius2 *= 1.0 + CERTIFY_TOLERANCE;
+
+    // All the points in the circumsphere are missing, so that a single rerun
+    // of qhull fixes the cell
+    if (!ball.IsInside(box)) {
+      size_t nMissing = missing.size();
+      tree.FindPointsNotTaken(0, ball, box, isTaken, missing);
+      certified &= missing.size() == nMissing;
+    }
+
+    // The faces shared with the upper Delaunay facets lie on the convex hull
+    facetT *neighbor, **neighborp;
+    FOREACHneighbor_(facet) {
+      if (neighbor->visitid != 0)
+        continue;
+
+      std::vector<const double *> shared;
+      const double *opposite = NULL;
+      bool isCoreFace = false;
+      FOREACHvertex_(facet->vertices) {
+        int i = qh_pointid(qh, vertex->point);
+        if (qh_setin(neighbor->vertices, vertex)) {
+          shared.push_back(&local[3 * i]);
+          isCoreFace |= blockOf[ids[i]] == iBlock;
+        } else {
+          opposite = &local[3 * i];
+        }
+      }
+      if (!isCoreFace)
+        continue;
+
+      // The plane of the face, facing away from the cell
+      HalfSpace hs;
+      double len = 0.0;
+      for (size_t k = 2; k < shared.size() && len == 0.0; k++) {
+        double a[3], b[3];
+        for (int d = 0; d < 3; d++) {
+          a[d] = shared[1][d] - shared[0][d];
+          b[d] = shared[k][d] - shared[0][d];
+        }
+        hs.Normal[0] = a[1] * b[2] - a[2] * b[1];
+        hs.Normal[1] = a[2] * b[0] - a[0] * b[2];
+        hs.Normal[2] = a[0] * b[1] - a[1] * b[0];
+        len = sqrt(hs.Normal[0] * hs.Normal[0] + hs.Normal[1] * hs.Normal[1] + hs.Normal[2] * hs.Normal[2]);
+      }
+      if (len == 0.0 || !opposite) {
+        certified = false;
+        continue;
+      }
+
+      double side = 0.0;
+      for (int d = 0; d < 3; d++)
+        side += hs.Normal[d] * (opposite[d] - shared[0][d]);
+      for (int d = 0; d < 3; d++)
+        hs.Normal[d] /= side > 0 ? -len : len;
+      hs.Offset = -CERTIFY_TOLERANCE * diag;
+      for (int d = 0; d < 3; d++)
+        hs.Offset += hs.Normal[d] * shared[0][d];
+      double centroid[3] = { 0.0, 0.0, 0.0 };
+      for (size_t k = 0; k < shared.size(); k++)
+        for (int d = 0; d < 3; d++)
+          centroid[d] += shared[k][d] / shared.size();
+      size_t iBest = 0;
+      double xBestDist2 = std::numeric_limits<double>::infinity();
+      tree.FindNearestPointOutside(0, hs, box, extra, centroid, iBest, xBestDist2);
+      if (xBestDist2 < std::numeric_limits<double>::infinity()) {
+        if (!isTaken[iBest])
+          missing.push_back(iBest);
+        isTaken[iBest] = 1;
+        certified = false;
+      }
+    }
+    isOverBudget = ids.size() + missing.size() > nMaxPoints;
+  }
+
+  if (certified && !isOverBudget) {
+    // Keep the ridges whose first generator is a core point
+    QhullVoronoiDiagram vd;
+    qh_printvdiagram2(qh, reinterpret_cast<FILE *>(&vd), AppendVoronoiRidge, vertices, qh_RIDGEall, True);
+
+    std::vector<int> compact(numcenters, 0);
+    for (size_t j = 0, offset = 0; j < vd.NumberOfRidges; j++, offset += vd.Ridges[offset] + 1) {
+      const int *ridge = &vd.Ridges[offset];
+      int ip1 = static_cast<int>(ids[ridge[1]]), ip2 = static_cast<int>(ids[ridge[2]]);
+      if (blockOf[std::min(ip1, ip2)] != iBlock)
+        continue;
+
+      bd.Ridges.push_back(ridge[0]);
+      bd.Ridges.push_back(ip1);
+      bd.Ridges.push_back(ip2);
+      for (int k = 3; k <= ridge[0]; k++) {
+        int v = ridge[k];
+        if (v > 0 && compact[v] == 0) {
+          facet = centerFacet[v];
+          for (int d = 0; d < 3; d++)
+            bd.Vertices.push_back(RoundAsPrintedByQhull(facet->center[d]));
+
+          vertexT *vertex, **vertexp;
+          size_t first = bd.Keys.size();
+          FOREACHvertex_(facet->vertices)
+            bd.Keys.push_back(static_cast<int>(ids[qh_pointid(qh, vertex->point)]));
+          std::sort(bd.Keys.begin() + first, bd.Keys.end());
+          bd.KeyOffsets.push_back(static_cast<int>(first));
+          compact[v] = static_cast<int>(bd.KeyOffsets.size());
+        }
+        bd.Ridges.push_back(v > 0 ? compact[v] : 0);
+      }
+      bd.NumberOfRidges++;
+    }
+    bd.KeyOffsets.push_back(static_cast<int>(bd.Keys.size()));
+  }
+
+  qh_settempfree(qh, &vertices);
+  FreeQhull(qh);
+  if (isOverBudget)
+    return BLOCK_OVER_BUDGET;
+
+  extra.insert(extra.end(), missing.begin(), missing.end());
+  std::sort(extra.begin(), extra.end());
+  extra.erase(std::unique(extra.begin(), extra.end()), extra.end());
+  return certified ? BLOCK_COMPUTED : BLOCK_UNCERTIFIED;
+}
+
+// Computes the diagrams of a range of blocks, growing the halo of each block
+// until its ridges are certified. Gives up on all the blocks as soon as one
+// of them needs more than nMaxBlockPoints points
+class BlockVoronoiFunctor
+{
+public:
+  BlockVoronoiFunctor(const PointOctree &tree, const std::vector<double> &points, const std::vector<int> &blockOf,
+                      const std::vector<int> &blocks, size_t nMaxBlockPoints, std::vector<BlockDiagram> &diagrams)
+    : m_Tree(tree), m_Points(points), m_BlockOf(blockOf), m_Blocks(blocks), m_MaxBlockPoints(nMaxBlockPoints),
+      m_Diagrams(diagrams), m_OverBudget(false) {}
+
+  bool IsOverBudget() const { return m_OverBudget; }
+
+  void operator()(vtkIdType begin, vtkIdType end)
+  {
+    for (vtkIdType b = begin; b < end && !m_OverBudget; b++) {
+      const PointOctree::Node &node = m_Tree.GetNode(m_Blocks[b]), &root = m_Tree.GetNode(0);
+      double xMaxSide = 0.0, xRootSide = 0.0;
+      for (int d = 0; d < 3; d++) {
+        xMaxSide = std::max(xMaxSide, node.Bounds[2 * d + 1] - node.Bounds[2 * d]);
+        xRootSide = std::max(xRootSide, root.Bounds[2 * d + 1] - root.Bounds[2 * d]);
+      }
+
+      // Add the missing points until the block is certified. If there are
+      // none, the certification failed on a degenerate face: grow the halo
+      double halo = HALO_FRACTION * std::max(xMaxSide, 1e-6 * xRootSide);
+      std::vector<size_t> extra;
+      size_t nExtra = 0;
+      BlockStatus status;
+      while ((status = ComputeBlockVoronoiDiagram(m_Tree, m_Points, m_BlockOf, m_Blocks[b], halo, m_MaxBlockPoints,
+                                                  extra, m_Diagrams[b])) == BLOCK_UNCERTIFIED && !m_OverBudget) {
+        if (extra.size() == nExtra)
+          halo *= 2.0;
+        nExtra = extra.size();
+      }
+      if (status == BLOCK_OVER_BUDGET)
+        m_OverBudget = true;
+    }
+  }
+
+private:
+  const PointOctree &m_Tree;
+  const std::vector<double> &m_Points;
+  const std::vector<int> &m_BlockOf, &m_Blocks;
+  size_t m_MaxBlockPoints;
+  std::vector<BlockDiagram> &m_Diagrams;
+  std::atomic<bool> m_OverBudget;
+};
+
+struct RidgeReference
+{
+  int Generator[2];
+  size_t Block, Offset;
+  bool operator < (const RidgeReference &other) const
+  {
+    return Generator[0] < other.Generator[0]
+        || (Generator[0] == other.Generator[0] && Generator[1] < other.Generator[1]);
+  }
+};
+
+} // end of anonymous namespace
+
+int ComputeQhullVoronoiDiagram(std::vector<double> &points, QhullVoronoiDiagram &vd, StageProfiler *profiler)
+{
+  int ndim = 3;
+  int num_points = points.size() / ndim;
+
+  // With no output file, qh_new_qhull prepares the Voronoi centers and the
+  // vertex neighbors but prints nothing
+  char qhull_cmd[] = "qhull v Qbb";
+  qhT qh_qh;
+  qhT* qh = &qh_qh;
+  QHULL_LIB_CHECK
+  qh_zero(qh, GetNullFile());
+  if (profiler)
+    profiler->Start("qhull");
+  int exitcode = qh_new_qhull(qh, ndim, num_points, points.data(), false, qhull_cmd, NULL, GetNullFile());
+  if (exitcode != 0)
+  {
+    FreeQhull(qh);
+    return exitcode;
+  }
+  if (profiler) {
+    profiler->Stop(num_points);
+    profiler->Start("parse");
+  }
+
+  // Voronoi vertices, in the order in which the "p" option prints them
+  facetT *facet;
+  vd.Vertices.clear();
+  FORALLfacet_(qh->facet_list) {
+    if (!qh_skipfacet(qh, facet)) {
+      if (!facet->center)
+        facet->center = qh_facetcenter(qh, facet->vertices);
+      for (int k = 0; k < ndim; k++)
+        vd.Vertices.push_back(RoundAsPrintedByQhull(facet->center[k]));
+    }
+  }
+  vd.NumberOfVertices = vd.Vertices.size() / ndim;
+
+  // Voronoi ridges, as the "Fv" option prints them. qh_markvoronoi numbers the
+  // Voronoi vertices in the same order as above, starting at 1.
+  boolT isLower;
+  int numcenters;
+  setT *vertices = qh_markvoronoi(qh, qh->facet_list, NULL, !qh_ALL, &isLower, &numcenters);
+  vd.Ridges.clear();
+  vd.NumberOfRidges = 0;
+  qh_printvdiagram2(qh, reinterpret_cast<FILE *>(&vd), AppendVoronoiRidge, vertices, qh_RIDGEall, True);
+  qh_settempfree(qh, &vertices);
+
+  FreeQhull(qh);
+  if (profiler)
+    profiler->Stop(vd.NumberOfRidges);
+  return 0;
+}
+
+int ComputeQhullVoronoiDiagramUsingTextFile(std::vector<double> &points, QhullVoronoiDiagram &vd,
+                                            StageProfiler *profiler)
+{
+  // Create a temporary file where to store the points
+  char *fnPoints = tmpnam(NULL);
+  std::string fnVoronoiOutput = std::string(fnPoints) + "_voronoi.txt";
+  std::cout << fnVoronoiOutput.c_str() << std::endl;
+  FILE *output = fopen(fnVoronoiOutput.c_str(), "w");
+
+  int ndim = 3;
+  int num_points = points.size() / ndim;
+
+  char qhull_cmd[] = "qhull v Qbb p Fv";
+  qhT qh_qh;
+  qhT* qh = &qh_qh;
+  QHULL_LIB_CHECK
+  qh_zero(qh, GetNullFile());
+  if (profiler)
+    profiler->Start("qhull");
+  int exitcode = qh_new_qhull(qh, ndim, num_points, points.data(), false, qhull_cmd, output, GetNullFile());
+  fclose(output);
+  FreeQhull(qh);
+
+  if (exitcode != 0)
+  {
+    remove(fnVoronoiOutput.c_str());
+    return exitcode;
+  }
+
+  // Load the file
+  if (profiler) {
+    profiler->Stop(num_points);
+    profiler->Start("parse");
+  }
+  std::ifstream fin(fnVoronoiOutput.c_str());
+
+  // First two lines
+  size_t junk;
+  fin >> junk;
+  fin >> vd.NumberOfVertices;
+
+  vd.Vertices.resize(vd.NumberOfVertices * ndim);
+  for (size_t i = 0; i < vd.Vertices.size(); i++)
+    fin >> vd.Vertices[i];
+
+  // The ridges, each preceded by its length
+  fin >> vd.NumberOfRidges;
+  vd.Ridges.clear();
+  for (size_t j = 0; j < vd.NumberOfRidges; j++) {
+    int m;
+    fin >> m;
+    vd.Ridges.push_back(m);
+    for (int k = 0; k < m; k++) {
+      int id;
+      fin >> id;
+      vd.Ridges.push_back(id);
+    }
+  }
+
+  // Clean up files
+  fin.close();
+  remove(fnVoronoiOutput.c_str());
+  remove(fnPoints);
+
+  if (profiler)
+    profiler->Stop(vd.NumberOfRidges);
+  return 0;
+}
+
+int ComputePartitionedQhullVoronoiDiagram(std::vector<double> &points, QhullVoronoiDiagram &vd,
+                                          size_t nMaxBlockPoints, int nWorkers, StageProfiler *profiler)
+{
+  // A single qhull run is faster, when it fits in the memory of the workers
+  if (points.size() / 3 <= nMaxBlockPoints * std::max(nWorkers, 1))
+    return ComputeQhullVoronoiDiagram(points, vd, profiler);
+
+  // The blocks hold half of the points that qhull may handle at once, the
+  // other half is for the halo
+  PointOctree tree(points);
+  std::vector<int> blocks;
+  tree.GetBlocks(0, std::max(nMaxBlockPoints / 2, OCTREE_LEAF_POINTS), blocks);
+  if (blocks.size() <= 1)
+    return QHULL_OVER_BUDGET;
+
+  std::vector<int> blockOf(points.size() / 3);
+  for (size_t b = 0; b < blocks.size(); b++) {
+    const PointOctree::Node &node = tree.GetNode(blocks[b]);
+    for (size_t k = node.Begin; k < node.End; k++)
+      blockOf[tree.GetIds()[k]] = blocks[b];
+  }
+
+  // Compute the blocks, nWorkers at a time
+  if (profiler)
+    profiler->Start("qhull");
+  std::vector<BlockDiagram> diagrams(blocks.size());
+  BlockVoronoiFunctor fBlocks(tree, points, blockOf, blocks, nMaxBlockPoints, diagrams);
+  size_t nBatch = std::max(nWorkers, 1);
+  for (size_t b = 0; b < blocks.size() && !fBlocks.IsOverBudget(); b += nBatch)
+    vtkSMPTools::For(b, std::min(b + nBatch, blocks.size()), 1, fBlocks);
+
+  // The halos needed to certify some block do not fit in the budget
+  if (fBlocks.IsOverBudget()) {
+    if (profiler)
+      profiler->Stop(blocks.size());
+    return QHULL_OVER_BUDGET;
+  }
+
+  for (size_t b = 0; b < blocks.size(); b++)
+    if (diagrams[b].ExitCode != 0)
+      return diagrams[b].ExitCode;
+
+  if (profiler) {
+    profiler->Stop(blocks.size());
+    profiler->Start("parse");
+  }
+
+  // Stitch the ridges in the order of their generators
+  std::vector<RidgeReference> refs;
+  for (size_t b = 0; b < blocks.size(); b++) {
+    const std::vector<int> &ridges = diagrams[b].Ridges;
+    for (size_t offset = 0; offset < ridges.size(); offset += ridges[offset] + 1) {
+      RidgeReference ref = { { ridges[offset + 1], ridges[offset + 2] }, b, offset };
+      refs.push_back(ref);
+    }
+  }
+  std::sort(refs.begin(), refs.end());
+
+  std::unordered_map<std::string, int> vertexIndex;
+  vd.Vertices.clear();
+  vd.Ridges.clear();
+  vd.NumberOfRidges = refs.size();
+  for (size_t j = 0; j < refs.size(); j++) {
+    const BlockDiagram &bd = diagrams[refs[j].Block];
+    const int *ridge = &bd.Ridges[refs[j].Offset];
+    vd.Ridges.insert(vd.Ridges.end(), ridge, ridge + 3);
+    for (int k = 3; k <= ridge[0]; k++) {
+      int v = ridge[k];
+      if (v == 0) {
+        vd.Ridges.push_back(0);
+        continue;
+      }
+
+      const int *key = &bd.Keys[bd.KeyOffsets[v - 1]];
+      std::string skey(reinterpret_cast<const char *>(key), (bd.KeyOffsets[v] - bd.KeyOffsets[v - 1]) * sizeof(int));
+      std::pair<std::unordered_map<std::string, int>::iterator, bool> it =
+          vertexIndex.insert(std::make_pair(skey, static_cast<int>(vertexIndex.size()) + 1));
+      if (it.second)
+        vd.Vertices.insert(vd.Vertices.end(), &bd.Vertices[3 * (v - 1)], &bd.Vertices[3 * v]);
+      vd.Ridges.push_back(it.first->second);
+    }
+  }
+  vd.NumberOfVertices = vd.Vertices.size() / 3;
+
+  if (profiler)
+    profiler->Stop(vd.NumberOfRidges);
+  return 0;
+}
@@ -0,0 +1,100 @@
+#ifndef __QhullVoronoi_h_
+#define __QhullVoronoi_h_
+
+#include <vector>
+#include <cstddef>
+
+class StageProfiler;
+
+/**
+ * The Voronoi diagram of a set of points, as produced by running qhull with
+ * the options "v Qbb p Fv". The layout mirrors qhull's text output so that
+ * the diagram can be obtained either from qhull's data structures directly
+ * or by parsing the text that qhull prints.
+ *
+ * Vertices holds the coordinates of the Voronoi vertices ("p" output), three
+ * values per vertex.
+ *
+ * Ridges holds the Voronoi ridges ("Fv" output) one after another. Each ridge
+ * is stored as n, ip1, ip2, v_1, ..., v_(n-2), where ip1 and ip2 are the
+ * indices of the two input points separated by the ridge and v_i are the
+ * 1-based indices of the ridge's Voronoi vertices. An index of 0 stands for
+ * the vertex at infinity.
+ */
+struct QhullVoronoiDiagram
+{
+  std::vector<double> Vertices;
+  std::vector<int> Ridges;
+  size_t NumberOfVertices;
+  size_t NumberOfRidges;
+
+  QhullVoronoiDiagram() : NumberOfVertices(0), NumberOfRidges(0) {}
+};
+
+/**
+ * Compute the Voronoi diagram of the points (three coordinates per point)
+ * by walking qhull's facet and vertex structures. The vertex coordinates are
+ * rounded exactly as qhull rounds them when it prints them, so the result is
+ * identical to ComputeQhullVoronoiDiagramUsingTextFile(). Returns the qhull
+ * exit code (0 on success).
+ *
+ * If a profiler is given, the time spent in qhull and in extracting the
+ * diagram are recorded as the stages "qhull" and "parse".
+ */
+int ComputeQhullVoronoiDiagram(std::vector<double> &points, QhullVoronoiDiagram &vd,
+                               StageProfiler *profiler = NULL);
+
+/**
+ * Compute the Voronoi diagram of the points by letting qhull write its text
+ * output to a temporary file and parsing that file. Returns the qhull exit
+ * code (0 on success).
+ */
+int ComputeQhullVoronoiDiagramUsingTextFile(std::vector<double> &points, QhullVoronoiDiagram &vd,
+                                            StageProfiler *profiler = NULL);
+
+/** Returned by ComputePartitionedQhullVoronoiDiagram() when the diagram does
+ * not fit in blocks of the given size. Qhull exit codes are positive */
+const int QHULL_OVER_BUDGET = -1;
+
+/**
+ * Compute the Voronoi diagram of the points block by block, for point sets
+ * too large for a single qhull run. If all the points fit in the nWorkers
+ * blocks of nMaxBlockPoints points, a single qhull run is used. Otherwise the
+ * points are split into the blocks of an octree, each with at most
+ * nMaxBlockPoints / 2 points (its core). The diagram of each block is
+ * computed from the core and the points in a halo around it, up to nWorkers
+ * blocks at a time.
+ *
+ * A block is accepted once the Delaunay star of each of its core points is
+ * certified: the circumsphere of every Delaunay cell around a core point is
+ * empty of the points left out of the block, and so is the outer side of
+ * every convex hull face around a core point. The stars are then those of the
+ * whole point set, so the ridges of the core points are exact. Otherwise all
+ * the points found in the circumspheres, and the nearest point beyond each
+ * hull face, are added to the block in one pass and the block is computed
+ * again. The halo is doubled only if there are none.
+ *
+ * A block never takes more than nMaxBlockPoints points. As soon as one would,
+ * the blocks are abandoned and QHULL_OVER_BUDGET is returned, without a
+ * diagram: the budget is a hard limit. This is the common case for the
+ * boundary of a solid: the circumspheres of the Voronoi vertices inside it
+ * are its medial balls, which reach across the solid, so the blocks need
+ * points from all around it.
+ *
+ * The ridges are stitched by their generators and the Voronoi vertices by the
+ * generators of their Delaunay cells. The result has the same ridges as
+ * ComputeQhullVoronoiDiagram(), sorted by generator, with the Voronoi
+ * vertices numbered in the order in which the ridges first use them. The
+ * coordinates of the vertices may differ in the last digits, since qhull
+ * scales its input and orders the vertices of its cells differently for
+ * each block, which may flip the inside test of a vertex lying on the
+ * boundary. Returns the qhull exit code (0 on success) or QHULL_OVER_BUDGET.
+ *
+ * If a profiler is given, the time spent on the blocks and on stitching them
+ * are recorded as the stages "qhull" and "parse".
+ */
+int ComputePartitionedQhullVoronoiDiagram(std::vector<double> &points, QhullVoronoiDiagram &vd,
+                                          size_t nMaxBlockPoints, int nWorkers,
+                                          StageProfiler *profiler = NULL);
+
+#endif
@@ -0,0 +1,78 @@
+#include "SkeletonComponents.h"
+
+#include <algorithm>
+
+namespace {
+
+// Union-find over the vertices of the skeleton, with union by size and path
+// halving
+class VertexUnionFind
+{
+public:
+  VertexUnionFind(size_t n)
+    : m_Parent(n), m_Size(n, 1)
+  {
+    for (size_t i = 0; i < n; i++)
+      m_Parent[i] = i;
+  }
+
+  vtkIdType Find(vtkIdType i)
+  {
+    while (m_Parent[i] != i)
+      i = m_Parent[i] = m_Parent[m_Parent[i]];
+    return i;
+  }
+
+  void Union(vtkIdType i, vtkIdType j)
+  {
+    i = Find(i);
+    j = Find(j);
+    if (i == j)
+      return;
+    if (m_Size[i] < m_Size[j])
+      std::swap(i, j);
+    m_Parent[j] = i;
+    m_Size[i] += m_Size[j];
+  }
+
+private:
+  std::vector<vtkIdType> m_Parent;
+  std::vector<size_t> m_Size;
+};
+
+} // end of anonymous namespace
+
+size_t FlagLargestComponents(size_t nPoints, const std::vector<vtkIdType> &offsets,
+                             const std::vector<vtkIdType> &conn, size_t nComp, std::vector<char> &isKept)
+{
+  size_t nFaces = offsets.size() - 1;
+  VertexUnionFind components(nPoints);
+  for (size_t f = 0; f < nFaces; f++)
+    for (vtkIdType k = offsets[f] + 1; k < offsets[f + 1]; k++)
+      components.Union(conn[offsets[f]], conn[k]);
+
+  // Number of faces of each component, the components being ranked by size
+  // and then by their first face
+  std::vector<size_t> size(nPoints, 0), first(nPoints, nFaces);
+  for (size_t f = 0; f < nFaces; f++) {
+    vtkIdType c = components.Find(conn[offsets[f]]);
+    size[c]++;
+    first[c] = std::min(first[c], f);
+  }
+  std::vector<vtkIdType> ranked;
+  for (size_t c = 0; c < size.size(); c++)
+    if (size[c] > 0)
+      ranked.push_back(c);
+  std::sort(ranked.begin(), ranked.end(), [&](vtkIdType a, vtkIdType b) {
+    return size[a] != size[b] ? size[a] > size[b] : first[a] < first[b];
+  });
+
+  std::vector<char> isKeptComponent(nPoints, 0);
+  for (size_t r = 0; r < ranked.size() && r < nComp; r++)
+    isKeptComponent[ranked[r]] = 1;
+  size_t nKept = 0;
+  isKept.resize(nFaces);
+  for (size_t f = 0; f < nFaces; f++)
+    nKept += (isKept[f] = isKeptComponent[components.Find(conn[offsets[f]])]);
+  return nKept;
+}
@@ -0,0 +1,28 @@
+#ifndef __SkeletonComponents_h_
+#define __SkeletonComponents_h_
+
+#include <vtkType.h>
+
+#include <vector>
+#include <cstddef>
+
+/**
+ * Selection of the largest connected components of the skeleton, in place of
+ * vtkPolyDataConnectivityFilter. The faces are connected through their
+ * vertices, and the components are found with a union-find over the
+ * vertices, in a single pass over the faces.
+ *
+ * The components are ranked by their number of faces, and components of the
+ * same size by their first face, so that the selection does not depend on
+ * the seeds of a region growing.
+ */
+
+/**
+ * Flag the faces of the nComp largest connected components of a polygonal
+ * mesh. Face f has the vertices conn[offsets[f]] to conn[offsets[f + 1] - 1],
+ * which are ids below nPoints. Returns the number of kept faces.
+ */
+size_t FlagLargestComponents(size_t nPoints, const std::vector<vtkIdType> &offsets,
+                             const std::vector<vtkIdType> &conn, size_t nComp, std::vector<char> &isKept);
+
+#endif
@@ -3,6 +3,16 @@
 // Logic includes
 #include "VTKMeshShortestDistance.h"
 #include "VTKMeshHalfEdgeWrapper.h"
+#include "BreadthFirstSearch.h"
+#include "QhullVoronoi.h"
+#include "GeneratorSampling.h"
+#include "SurfaceOccupancyGrid.h"
+#include "VoronoiCache.h"
+#include "StageProfiler.h"
+#include "BatchRunner.h"
+#include "SkeletonComponents.h"
+#include "ModelIO.h"
+#include "ProgressReporter.h"
 
 // VNL includes
 #include <vnl/vnl_vector.h>
@@ -11,9 +21,17 @@
 // VTK includes
 #include <vtkQuadricClustering.h>
 #include <vtkSelectEnclosedPoints.h>
+#include <vtkStaticCellLocator.h>
+#include <vtkGenericCell.h>
+#include <vtkIdList.h>
+#include <vtkIntersectionCounter.h>
+#include <vtkRandomPool.h>
+#include <vtkSMPTools.h>
+#include <vtkSMPThreadLocal.h>
+#include <vtkSMPThreadLocalObject.h>
 #include <vtkBoundingBox.h>
 #include <vtkCellArray.h>
-#include <vtkCellDataToPointData.h>
+#include <vtkIdTypeArray.h>
 #include <vtkPolyData.h>
 #include <vtkLODActor.h>
 #include <vtkRenderer.h>
@@ -21,19 +39,25 @@
 #include <vtkTriangleFilter.h>
 #include <vtkCell.h>
 #include <vtkCellData.h>
+#include <vtkPointData.h>
 #include <vtkDoubleArray.h>
 #include <vtkCleanPolyData.h>
-#include <vtkPolyDataConnectivityFilter.h>
+#include <vtkAppendPolyData.h>
+#include <vtkMath.h>
 #include <vtkTriangle.h>
 #include <vtkPolyDataNormals.h>
+#include <vtkSmartPointer.h>
+#include <vtkTimerLog.h>
 
-// MRML includes
-#include "vtkMRMLModelStorageNode.h"
-#include "vtkMRMLModelNode.h"
+#include <vtksys/SystemTools.hxx>
 
-extern "C" {
-#include <libqhull_r/libqhull_r.h>
-}
+#include <algorithm>
+#include <exception>
+#include <fstream>
+#include <memory>
+#include <sstream>
+#include <unordered_map>
+#include <vector>
 
 // Use an anonymous namespace to keep class types and function names
 // from colliding when module is used as shared object module.  Every
@@ -55,27 +79,939 @@ namespace {
       return 0.5 * vnl_cross_3d(B - A, C - A).magnitude();
     }
 
+    // Number of blocks the parallel loops are split into. Progress is reported
+    // and cancellation checked between blocks
+    const size_t NUMBER_OF_BLOCKS = 100;
+
+    // Approximate memory used by qhull per input point when computing the
+    // Voronoi diagram of a surface, used to size the blocks of the
+    // partitioned computation
+    const size_t QHULL_BYTES_PER_POINT = 2500;
+
+    // Reports the number of subjects done by a batch run
+    bool ReportBatchProgress(size_t nDone, size_t nJobs, void *clientData) {
+      ProgressReporter *progress = static_cast<ProgressReporter *>(clientData);
+      return progress->Update(nJobs > 0 ? nDone / (double) nJobs : 1.0);
+    }
+
+    // Format a parameter value for the command line, without loss of precision
+    template <class T> std::string ParameterToString(const T &value) {
+      std::ostringstream oss;
+      oss.precision(17);
+      oss << value;
+      return oss.str();
+    }
+
+    /**
+     * Functor for vtkSMPTools::For that flags the Voronoi vertices lying inside
+     * the boundary surface. The cell locator is shared by all threads, while
+     * each thread has its own work objects. The ray directions come from a
+     * fixed random pool indexed by the vertex, so the result does not depend on
+     * the number of threads or on how the vertices are split between them.
+     *
+     * Optionally, an occupancy grid of the surface decides the points away
+     * from the surface, and only the points near the surface are tested by
+     * casting rays.
+     */
+    class InsideSurfaceFunctor {
+    public:
+      InsideSurfaceFunctor(vtkPolyData *surface, double tol, const double *x, bool *ptin)
+          : Surface(surface), Tolerance(tol), X(x), PtIn(ptin), Grid(NULL) {
+        surface->GetBounds(this->Bounds);
+        this->BoundBox.SetBounds(this->Bounds);
+        this->Length = surface->GetLength();
+        this->Locator->SetDataSet(surface);
+        this->Locator->BuildLocator();
+        this->RandomPool->SetSize(3 * 1024);
+        this->RandomPool->GeneratePool();
+      }
+
+      void Initialize() {
+        this->Counter.Local() = vtkIntersectionCounter(this->Tolerance, this->Length);
+      }
+
+      void operator()(vtkIdType begin, vtkIdType end) {
+        for (vtkIdType i = begin; i < end; i++) {
+          double x[3] = { this->X[3 * i], this->X[3 * i + 1], this->X[3 * i + 2] };
+
+          // Is this point outside of the bounding box
+          if (!this->BoundBox.ContainsPoint(x))
+            this->PtIn[i] = false;
+          else if (this->Tolerance <= 0)
+            this->PtIn[i] = true;
+          else if (!this->Grid)
+            this->PtIn[i] = this->CastRays(x, 3 * i);
+          else switch (this->Grid->Classify(x)) {
+            case SurfaceOccupancyGrid::INSIDE: this->PtIn[i] = true; break;
+            case SurfaceOccupancyGrid::OUTSIDE: this->PtIn[i] = false; break;
+            default: this->PtIn[i] = this->CastRays(x, 3 * i); break;
+          }
+        }
+      }
+
+      void Reduce() {}
+
+      /**
+       * Use an occupancy grid for the points away from the surface. The regions
+       * of the grid are classified here, by casting rays from their seeds.
+       */
+      void SetGrid(SurfaceOccupancyGrid *grid) {
+        this->Initialize();
+        for (size_t k = 0; k < grid->GetNumberOfRegions(); k++) {
+          double x[3];
+          grid->GetRegionSeed(k, x);
+          grid->SetRegionInside(k, this->CastRays(x, 3 * k));
+        }
+        this->Grid = grid;
+      }
+
+    private:
+      vtkPolyData *Surface;
+      double Bounds[6], Length, Tolerance;
+      vtkBoundingBox BoundBox;
+      vtkNew<vtkStaticCellLocator> Locator;
+      vtkNew<vtkRandomPool> RandomPool;
+      const double *X;
+      bool *PtIn;
+      const SurfaceOccupancyGrid *Grid;
+
+      // Exact test, with the rays taken from the random pool at index iRandom
+      bool CastRays(double x[3], vtkIdType iRandom) {
+        return vtkSelectEnclosedPoints::IsInsideSurface(
+            x, this->Surface, this->Bounds, this->Length, this->Tolerance, this->Locator,
+            this->CellIds.Local(), this->Cell.Local(), this->Counter.Local(), this->RandomPool, iRandom) != 0;
+      }
+
+      vtkSMPThreadLocalObject<vtkIdList> CellIds;
+      vtkSMPThreadLocalObject<vtkGenericCell> Cell;
+      vtkSMPThreadLocal<vtkIntersectionCounter> Counter;
+    };
+
+    /**
+     * Classify the points with each inside/outside engine in turn and report
+     * the time taken and the number of points on which each engine disagrees
+     * with ray casting. The time of the voxel grid engine includes building
+     * the grid.
+     */
+    void BenchmarkInsideTests(vtkPolyData *surface, double tol, const double *x, size_t n) {
+      std::vector<char> ptinRays(n), ptinGrid(n);
+      bool *ptin = new bool[n];
+      vtkNew<vtkTimerLog> timer;
+
+      cout << "Benchmarking inside/outside tests (n = " << n << ")" << endl;
+      for (int engine = 0; engine < 2; engine++) {
+        timer->StartTimer();
+        InsideSurfaceFunctor fInside(surface, tol, x, ptin);
+        SurfaceOccupancyGrid grid;
+        if (engine == 1) {
+          grid.Build(surface, tol);
+          fInside.SetGrid(&grid);
+        }
+        vtkSMPTools::For(0, n, fInside);
+        timer->StopTimer();
+
+        std::vector<char> &result = engine == 0 ? ptinRays : ptinGrid;
+        size_t nInside = 0, nDiffer = 0;
+        for (size_t i = 0; i < n; i++) {
+          result[i] = ptin[i];
+          nInside += ptin[i];
+          nDiffer += ptin[i] != ptinRays[i];
+        }
+        cout << "  " << (engine == 0 ? "RayCasting" : "VoxelGrid ") << " : "
+             << timer->GetElapsedTime() << " s, " << nInside << " inside, "
+             << nDiffer << " differ from RayCasting" << endl;
+      }
+    }
+
+    /**
+     * Functor for vtkSMPTools::For that evaluates the edge and the geodesic
+     * pruning criteria on the Voronoi ridges. The candidate ridges (finite and
+     * inside the boundary) are grouped by their first generator, and a single
+     * k-ring search (edge criterion) and a single Dijkstra search (geodesic
+     * criterion) from that generator serve all the ridges of the group. The
+     * geodesic search radius is the largest one needed in the group; a larger
+     * radius gives the same distances for all vertices within the smaller
+     * radius, so the pruning decisions are the same as with one search per
+     * ridge. The geodesic search stops as soon as the other generators of the
+     * group are reached, and a search for a single generator is guided
+     * towards it by the Euclidean distance (A*).
+     *
+     * The searches are run once for a range of parameters: the ring reaches as
+     * far as the largest nDegrees and the geodesic search as far as the largest
+     * xPrune needs. ApplyCriteria() then decides the ridges for any nDegrees and
+     * xPrune in that range, without searching again.
+     *
+     * The mesh graph and its edge weights are shared, while each thread runs
+     * its own search instances on them. The outcome of every ridge is stored
+     * by ridge index, so that the faces can be assembled in the original order
+     * afterwards.
+     */
+    class PruneFacesFunctor {
+    public:
+      enum RidgeOutcome { SKIPPED = 0, PRUNED_EDGE, PRUNED_GEO, ACCEPTED };
+
+      PruneFacesFunctor(const VTKMeshHalfEdgeWrapper *graph, const float *wGeo, vtkPolyData *bnd,
+                        const int *ridges, const size_t *offsets, size_t np, const bool *ptin,
+                        int nMinDegrees, int nMaxDegrees, double xMaxPrune)
+          : Graph(graph), WeightGeo(wGeo), Boundary(bnd),
+            Ridges(ridges), Offsets(offsets), PtIn(ptin),
+            MinDegrees(nMinDegrees), MaxDegrees(nMaxDegrees), MaxPrune(xMaxPrune),
+            Depth(np, DepthLimitedBreadthFirstSearch::NO_PATH),
+            Outcome(np, SKIPPED), Radius(np, 0.0), Geodesic(np, 0.0) {
+        // Count the candidate ridges of each generator
+        std::vector<size_t> count(graph->GetNumberOfVertices() + 1, 0);
+        std::vector<char> candidate(np, 0);
+        for (size_t j = 0; j < np; j++) {
+          const int *ridge = this->Ridges + this->Offsets[j];
+          size_t m = ridge[0] - 2;
+
+          bool isinf = false;
+          bool isout = false;
+          for (size_t k = 0; k < m; k++) {
+            // Is this point at infinity?
+            vtkIdType id = ridge[3 + k];
+            if (id == 0) isinf = true; else id--;
+            if (!this->PtIn[id]) isout = true;
+          }
+
+          if (!isinf && !isout) {
+            candidate[j] = 1;
+            count[ridge[1] + 1]++;
+          }
+        }
+
+        // Group the candidate ridges by generator, keeping the ridge order
+        for (size_t v = 0; v < graph->GetNumberOfVertices(); v++) {
+          if (count[v + 1] > 0)
+            this->Sources.push_back(v);
+          count[v + 1] += count[v];
+        }
+        this->GroupRidges.resize(count.back());
+        for (size_t j = 0; j < np; j++)
+          if (candidate[j])
+            this->GroupRidges[count[this->Ridges[this->Offsets[j] + 1]]++] = j;
+
+        // After the fill, count[v] is the end of the group of v
+        this->GroupEnd.swap(count);
+      }
+
+      /** Number of generators with at least one candidate ridge */
+      size_t GetNumberOfSources() const { return this->Sources.size(); }
+
+      /** Number of ridges that are finite and inside the boundary */
+      size_t GetNumberOfCandidates() const { return this->GroupRidges.size(); }
+
+      void Initialize() {
+        ThreadShortestPaths &sp = this->ShortestPaths.Local();
+        unsigned int nv = this->Graph->GetNumberOfVertices();
+        if (!sp.Geo)
+          sp.Geo = std::make_shared<ShortestPath>(
+              nv, this->Graph->GetAdjacencyIndex(), this->Graph->GetAdjacency(), this->WeightGeo);
+        if (!sp.Ring)
+          sp.Ring = std::make_shared<DepthLimitedBreadthFirstSearch>(
+              nv, this->Graph->GetAdjacencyIndex(), this->Graph->GetAdjacency());
+      }
+
+      void operator()(vtkIdType begin, vtkIdType end) {
+        ThreadShortestPaths &sp = this->ShortestPaths.Local();
+        for (vtkIdType s = begin; s < end; s++) {
+          vtkIdType ip1 = this->Sources[s];
+          size_t gBegin = ip1 > 0 ? this->GroupEnd[ip1 - 1] : 0, gEnd = this->GroupEnd[ip1];
+
+          // Find the generators that are fewer than nDegrees edges away
+          if (this->MaxDegrees > 0)
+            sp.Ring->ComputeRing(ip1, this->MaxDegrees - 1);
+
+          double ipDb1[3];
+          float ipFt1[3];
+          this->Boundary->GetPoint(ip1, ipDb1);
+          for (int i = 0; i < 3; i++)
+            ipFt1[i] = (float) ipDb1[i];
+          vnl_vector_fixed<float, 3> p1(ipFt1);
+
+          double xMaxDistance = -1;
+          sp.Targets.clear();
+          sp.Pending.clear();
+          for (size_t g = gBegin; g < gEnd; g++) {
+            size_t j = this->GroupRidges[g];
+            vtkIdType ip2 = this->Ridges[this->Offsets[j] + 2];
+
+            // The ridges pruned by the edge criterion for every nDegrees need no
+            // geodesic distance
+            if (this->MaxDegrees > 0)
+              this->Depth[j] = sp.Ring->GetDepth(ip2);
+            if (this->MinDegrees > 0 && this->Depth[j] < (unsigned int) this->MinDegrees)
+              continue;
+
+            // Get the Euclidean distance between generator points
+            double ipDb2[3];
+            float ipFt2[3];
+            this->Boundary->GetPoint(ip2, ipDb2);
+            for (int i = 0; i < 3; i++)
+              ipFt2[i] = (float) ipDb2[i];
+            vnl_vector_fixed<float, 3> p2(ipFt2);
+            double r = (p1 - p2).magnitude();
+            this->Radius[j] = r;
+
+            // The geodesic distance between generators should exceed d * xPrune;
+            xMaxDistance = std::max(xMaxDistance, r * this->MaxPrune + 1);
+            sp.Targets.push_back(ip2);
+            sp.Pending.push_back(j);
+          }
+
+          if (xMaxDistance < 0)
+            continue;
+
+          // One geodesic search for all ridges of the group that are not decided
+          // yet. A search for a single target is guided towards it (A*),
+          // a search for several targets stops once all of them are reached
+          if (sp.Targets.size() == 1)
+            sp.Geo->ComputePathToTarget(
+                ip1, sp.Targets[0], EuclideanDistanceHeuristic(this->Boundary, sp.Targets[0]), xMaxDistance);
+          else
+            sp.Geo->ComputePathsFromSource(ip1, xMaxDistance, sp.Targets.size(), sp.Targets.data());
+
+          // Distances beyond the search radius of a ridge are not final, but
+          // they are not shorter than the final ones, so the ridge is still
+          // accepted. They are recorded as the search radius, so that the
+          // result does not depend on which ridges share a search
+          for (size_t k = 0; k < sp.Pending.size(); k++) {
+            size_t j = sp.Pending[k];
+            this->Geodesic[j] = std::min((double) sp.Geo->GetDistanceArray()[sp.Targets[k]],
+                                         this->Radius[j] * this->MaxPrune + 1);
+          }
+        }
+      }
+
+      void Reduce() {}
+
+      /**
+       * Decide the outcome of the candidate ridges for the given parameters,
+       * which must lie within the range the searches were run for
+       */
+      void ApplyCriteria(int nDegrees, double xPrune) {
+        for (size_t g = 0; g < this->GroupRidges.size(); g++) {
+          size_t j = this->GroupRidges[g];
+
+          // If the generators are too close on the mesh or the geodesic is too
+          // short, don't insert the face
+          if (nDegrees > 0 && this->Depth[j] < (unsigned int) nDegrees)
+            this->Outcome[j] = PRUNED_EDGE;
+          else if (this->Geodesic[j] < this->Radius[j] * xPrune)
+            this->Outcome[j] = PRUNED_GEO;
+          else
+            this->Outcome[j] = ACCEPTED;
+        }
+      }
+
+    private:
+      typedef DijkstraShortestPath<float> ShortestPath;
+      struct ThreadShortestPaths {
+        std::shared_ptr<ShortestPath> Geo;
+        std::shared_ptr<DepthLimitedBreadthFirstSearch> Ring;
+        std::vector<unsigned int> Targets;
+        std::vector<size_t> Pending;
+      };
+
+      const VTKMeshHalfEdgeWrapper *Graph;
+      const float *WeightGeo;
+      vtkPolyData *Boundary;
+      const int *Ridges;
+      const size_t *Offsets;
+      const bool *PtIn;
+      int MinDegrees, MaxDegrees;
+      double MaxPrune;
+      vtkSMPThreadLocal<ThreadShortestPaths> ShortestPaths;
+
+      // Candidate ridges grouped by their first generator
+      std::vector<unsigned int> Sources;
+      std::vector<size_t> GroupEnd, GroupRidges;
+
+      // Number of edges between the generators of each ridge, if fewer than
+      // the largest nDegrees
+      std::vector<unsigned int> Depth;
+
+    public:
+      // Per-ridge results
+      std::vector<char> Outcome;
+      std::vector<double> Radius, Geodesic;
+    };
+
+    /** One combination of pruning parameters in a parameter sweep */
+    struct SweepParameters {
+      double XPrune;
+      int NDegrees, NComp;
+    };
+
+    /**
+     * Name of the output file of a parameter combination: the parameters are
+     * appended to the name of the output surface, before the extension
+     */
+    std::string SweepOutputFileName(const std::string &fnOutput, const SweepParameters &sp) {
+      size_t iDot = fnOutput.find_last_of('.');
+      size_t iSlash = fnOutput.find_last_of("/\\");
+      if (iDot == std::string::npos || (iSlash != std::string::npos && iDot < iSlash))
+        iDot = fnOutput.size();
+
+      std::ostringstream oss;
+      oss << fnOutput.substr(0, iDot) << "_xPrune" << sp.XPrune << "_nDegrees" << sp.NDegrees
+          << "_nComp" << sp.NComp << fnOutput.substr(iDot);
+      return oss.str();
+    }
+
+    // Area-weighted percentiles of the thickness reported in the statistics
+    const double THICKNESS_PERCENTILES[] = { 5, 25, 50, 75, 95 };
+    const size_t NUMBER_OF_THICKNESS_PERCENTILES = sizeof(THICKNESS_PERCENTILES) / sizeof(double);
+
+    /**
+     * Statistics of the thickness (radius) over the area of the skeleton. As
+     * for the mean thickness printed by the tool, only the triangles count,
+     * each weighted by its area. The histogram holds the area of the
+     * triangles in each of the bins between the smallest and the largest
+     * thickness.
+     */
+    struct ThicknessStatistics {
+      double Area, Mean, Median, Min, Max;
+      double Percentiles[NUMBER_OF_THICKNESS_PERCENTILES];
+      std::vector<double> Histogram;
+    };
+
+    /**
+     * Functor for vtkSMPTools::For that computes the area of the triangles of
+     * the skeleton, and the sums over each thread of the area and of the
+     * area-weighted thickness. Other polygons get a zero area.
+     */
+    class CellAreaFunctor {
+    public:
+      CellAreaFunctor(vtkPolyData *skel, vtkDataArray *radius, double *area)
+          : Skeleton(skel), Radius(radius), Area(area), TotalArea(0.0), TotalThickness(0.0) {}
+
+      void Initialize() {
+        this->LocalArea.Local() = 0.0;
+        this->LocalThickness.Local() = 0.0;
+      }
+
+      void operator()(vtkIdType begin, vtkIdType end) {
+        vtkCellArray *polys = this->Skeleton->GetPolys();
+        vtkIdList *ids = this->Ids.Local();
+        double &sumArea = this->LocalArea.Local(), &sumThickness = this->LocalThickness.Local();
+        for (vtkIdType i = begin; i < end; i++) {
+          vtkIdType npts;
+          const vtkIdType *pts;
+          polys->GetCellAtId(i, npts, pts, ids);
+          this->Area[i] = 0.0;
+          if (npts != 3)
+            continue;
+
+          // Single precision, as in the original computation
+          vnl_vector_fixed<float, 3> p[3];
+          for (int k = 0; k < 3; k++) {
+            double x[3];
+            this->Skeleton->GetPoint(pts[k], x);
+            for (int d = 0; d < 3; d++)
+              p[k][d] = (float) x[d];
+          }
+          double a = fabs(TriangleArea(p[0], p[1], p[2]));
+          this->Area[i] = a;
+          sumArea += a;
+          sumThickness += this->Radius->GetTuple1(i) * a;
+        }
+      }
+
+      void Reduce() {
+        for (vtkSMPThreadLocal<double>::iterator it = this->LocalArea.begin(); it != this->LocalArea.end(); ++it)
+          this->TotalArea += *it;
+        for (vtkSMPThreadLocal<double>::iterator it = this->LocalThickness.begin();
+             it != this->LocalThickness.end(); ++it)
+          this->TotalThickness += *it;
+      }
+
+      double GetTotalArea() const { return this->TotalArea; }
+      double GetTotalThickness() const { return this->TotalThickness; }
+
+    private:
+      vtkPolyData *Skeleton;
+      vtkDataArray *Radius;
+      double *Area;
+      double TotalArea, TotalThickness;
+      vtkSMPThreadLocal<double> LocalArea, LocalThickness;
+      vtkSMPThreadLocalObject<vtkIdList> Ids;
+    };
+
+    // Percentile of values weighted by an area, given sorted (value, area) pairs
+    double WeightedPercentile(const std::vector<std::pair<double, double> > &values, double xTotal, double p) {
+      if (values.empty())
+        return 0.0;
+      double aTarget = xTotal * p / 100.0, aSum = 0.0;
+      size_t i = 0;
+      while (i + 1 < values.size() && (aSum += values[i].second) < aTarget)
+        i++;
+      return values[i].first;
+    }
+
+    /**
+     * Compute the thickness statistics of a skeleton whose cells hold the
+     * Radius array, with nBins bins in the histogram
+     */
+    void ComputeThicknessStatistics(vtkPolyData *skel, int nBins, ThicknessStatistics &stats) {
+      vtkIdType nc = skel->GetNumberOfCells();
+      vtkDataArray *radius = skel->GetCellData()->GetArray("Radius");
+      std::vector<double> area(nc);
+      CellAreaFunctor fArea(skel, radius, area.data());
+      vtkSMPTools::For(0, nc, fArea);
+
+      stats.Area = fArea.GetTotalArea();
+      stats.Mean = fArea.GetTotalThickness() / stats.Area;
+
+      // The triangles sorted by thickness give the percentiles
+      std::vector<std::pair<double, double> > thickness;
+      for (vtkIdType i = 0; i < nc; i++)
+        if (area[i] > 0.0)
+          thickness.push_back(std::make_pair(radius->GetTuple1(i), area[i]));
+      std::sort(thickness.begin(), thickness.end());
+
+      stats.Min = thickness.empty() ? 0.0 : thickness.front().first;
+      stats.Max = thickness.empty() ? 0.0 : thickness.back().first;
+      for (size_t k = 0; k < NUMBER_OF_THICKNESS_PERCENTILES; k++)
+        stats.Percentiles[k] = WeightedPercentile(thickness, stats.Area, THICKNESS_PERCENTILES[k]);
+      stats.Median = WeightedPercentile(thickness, stats.Area, 50.0);
+
+      stats.Histogram.assign(std::max(nBins, 1), 0.0);
+      double width = (stats.Max - stats.Min) / stats.Histogram.size();
+      for (size_t i = 0; i < thickness.size(); i++) {
+        size_t b = width > 0.0 ? (size_t) ((thickness[i].first - stats.Min) / width) : 0;
+        stats.Histogram[std::min(b, stats.Histogram.size() - 1)] += thickness[i].second;
+      }
+    }
+
+    /**
+     * Write the thickness statistics as a table with a name and a value
+     * column, which Slicer loads as a table node
+     */
+    bool WriteThicknessTable(const std::string &filename, const ThicknessStatistics &stats) {
+      std::ofstream fout(filename.c_str());
+      fout << "Statistic\tValue" << endl;
+      fout << "Area\t" << stats.Area << endl;
+      fout << "Mean\t" << stats.Mean << endl;
+      fout << "Median\t" << stats.Median << endl;
+      fout << "Min\t" << stats.Min << endl;
+      fout << "Max\t" << stats.Max << endl;
+      for (size_t k = 0; k < NUMBER_OF_THICKNESS_PERCENTILES; k++)
+        fout << "P" << THICKNESS_PERCENTILES[k] << "\t" << stats.Percentiles[k] << endl;
+
+      // The area of each bin of the histogram, named by its range
+      double width = (stats.Max - stats.Min) / stats.Histogram.size();
+      for (size_t b = 0; b < stats.Histogram.size(); b++)
+        fout << "Area [" << stats.Min + b * width << ", " << stats.Min + (b + 1) * width << "]\t"
+             << stats.Histogram[b] << endl;
+      return fout.good();
+    }
+
+    /**
+     * Add to the point data of a mesh the average of each cell data array
+     * over the cells around each point, in place of vtkCellDataToPointData,
+     * which copies the mesh. Arrays of ids are left out, their average
+     * means nothing
+     */
+    void AddCellDataToPointData(vtkPolyData *poly) {
+      vtkIdType nPoints = poly->GetNumberOfPoints();
+      std::vector<unsigned int> count(nPoints, 0);
+      vtkCellArray *polys = poly->GetPolys();
+      vtkNew<vtkIdList> ids;
+      for (vtkIdType i = 0; i < polys->GetNumberOfCells(); i++) {
+        vtkIdType npts;
+        const vtkIdType *pts;
+        polys->GetCellAtId(i, npts, pts, ids);
+        for (vtkIdType k = 0; k < npts; k++)
+          count[pts[k]]++;
+      }
+
+      vtkCellData *cd = poly->GetCellData();
+      for (int a = 0; a < cd->GetNumberOfArrays(); a++) {
+        vtkDataArray *cellArray = cd->GetArray(a);
+        if (!cellArray || vtkIdTypeArray::SafeDownCast(cellArray))
+          continue;
+        int nc = cellArray->GetNumberOfComponents();
+        std::vector<double> sum(nPoints * nc, 0.0);
+        for (vtkIdType i = 0; i < polys->GetNumberOfCells(); i++) {
+          vtkIdType npts;
+          const vtkIdType *pts;
+          polys->GetCellAtId(i, npts, pts, ids);
+          for (vtkIdType k = 0; k < npts; k++)
+            for (int d = 0; d < nc; d++)
+              sum[pts[k] * nc + d] += cellArray->GetComponent(i, d);
+        }
+
+        vtkSmartPointer<vtkDataArray> pointArray = vtkSmartPointer<vtkDataArray>::Take(cellArray->NewInstance());
+        pointArray->SetName(cellArray->GetName());
+        pointArray->SetNumberOfComponents(nc);
+        pointArray->SetNumberOfTuples(nPoints);
+        for (vtkIdType p = 0; p < nPoints; p++)
+          for (int d = 0; d < nc; d++)
+            pointArray->SetComponent(p, d, count[p] > 0 ? sum[p * nc + d] / count[p] : 0.0);
+        poly->GetPointData()->AddArray(pointArray);
+      }
+    }
+
+    /**
+     * Region of interest of the CLI: a union of axis-aligned boxes, each
+     * given by its center and radius, and the same boxes grown by a margin
+     */
+    class RegionOfInterest {
+    public:
+      RegionOfInterest(const std::vector<std::vector<float> > &regions, double margin) {
+        for (size_t i = 0; i < regions.size(); i++) {
+          const std::vector<float> &rg = regions[i];
+          vtkBoundingBox box(rg[0] - std::abs(rg[3]), rg[0] + std::abs(rg[3]), rg[1] - std::abs(rg[4]),
+                             rg[1] + std::abs(rg[4]), rg[2] - std::abs(rg[5]), rg[2] + std::abs(rg[5]));
+          this->Boxes.push_back(box);
+          box.Inflate(margin);
+          this->MarginBoxes.push_back(box);
+        }
+      }
+
+      bool Contains(const double x[3]) const { return IsInAnyBox(this->Boxes, x); }
+
+      bool ContainsWithMargin(const double x[3]) const { return IsInAnyBox(this->MarginBoxes, x); }
+
+    private:
+      static bool IsInAnyBox(const std::vector<vtkBoundingBox> &boxes, const double x[3]) {
+        for (size_t i = 0; i < boxes.size(); i++)
+          if (boxes[i].ContainsPoint(x))
+            return true;
+        return false;
+      }
+
+      std::vector<vtkBoundingBox> Boxes, MarginBoxes;
+    };
+
+    /**
+     * Replace the faces of a reference skeleton that lie inside the region by
+     * the faces of a skeleton recomputed for the region. The vertices where
+     * the two meet are merged, and the cell arrays common to both are
+     * averaged again onto the points.
+     */
+    vtkSmartPointer<vtkPolyData> SpliceSkeleton(
+        vtkPolyData *reference, vtkPolyData *patch, const RegionOfInterest &roi) {
+      // The faces of the reference with a vertex outside the region
+      vtkNew<vtkIdList> keptCells, ids;
+      vtkCellArray *polys = reference->GetPolys();
+      for (vtkIdType i = 0; i < polys->GetNumberOfCells(); i++) {
+        vtkIdType npts;
+        const vtkIdType *cellPts;
+        polys->GetCellAtId(i, npts, cellPts, ids);
+        for (vtkIdType k = 0; k < npts; k++) {
+          if (!roi.Contains(reference->GetPoint(cellPts[k]))) {
+            keptCells->InsertNextId(i);
+            break;
+          }
+        }
+      }
+
+      // CopyCells only copies the point data, the cell data is copied here
+      vtkNew<vtkPolyData> outside;
+      outside->AllocateCopy(reference);
+      outside->CopyCells(reference, keptCells);
+      outside->GetPointData()->Initialize();
+      outside->GetCellData()->CopyAllocate(reference->GetCellData(), keptCells->GetNumberOfIds());
+      for (vtkIdType k = 0; k < keptCells->GetNumberOfIds(); k++)
+        outside->GetCellData()->CopyData(reference->GetCellData(), keptCells->GetId(k), k);
+      vtkNew<vtkPolyData> inside;
+      inside->ShallowCopy(patch);
+      inside->GetPointData()->Initialize();
+      cout << "Splicing " << patch->GetNumberOfCells() << " faces of the region into "
+           << keptCells->GetNumberOfIds() << " of " << polys->GetNumberOfCells() << " faces of the reference" << endl;
+
+      vtkNew<vtkAppendPolyData> fAppend;
+      fAppend->AddInputData(outside);
+      fAppend->AddInputData(inside);
+      vtkNew<vtkCleanPolyData> fMerge;
+      fMerge->SetInputConnection(fAppend->GetOutputPort());
+      fMerge->SetTolerance(1e-9);
+      fMerge->ConvertPolysToLinesOff();
+      fMerge->ConvertLinesToPointsOff();
+      fMerge->Update();
+
+      vtkSmartPointer<vtkPolyData> spliced = fMerge->GetOutput();
+      AddCellDataToPointData(spliced);
+      return spliced;
+    }
+
+    /**
+     * Assemble the faces accepted by the pruning criteria into the skeleton,
+     * keep the nComp largest connected components, and compute the thickness
+     * statistics (before the clustering) and, if nBins > 0, the quadric
+     * clustering of the skeleton.
+     */
+    vtkSmartPointer<vtkPolyData> AssembleSkeleton(
+        const PruneFacesFunctor &fPrune, const QhullVoronoiDiagram &vd, const std::vector<size_t> &ridgeOffset,
+        vtkPoints *pts, double xPrune, int nComp, int nBins, int nThicknessBins, ThicknessStatistics &stats,
+        StageProfiler &profiler) {
+      size_t np = vd.NumberOfRidges;
+      profiler.Start("assembly");
+
+      // Keep track of number pruned
+      size_t npruned_geo = 0, npruned_edge = 0;
+
+      // The accepted faces in the order of the ridges. Coincident vertices
+      // are merged and the vertices are numbered in the order in which the
+      // faces first use them, as vtkCleanPolyData would do
+      std::vector<vtkIdType> pointMap(pts->GetNumberOfPoints(), -1), pointIds;
+      std::unordered_map<std::string, vtkIdType> pointIndex;
+      std::vector<vtkIdType> offsets(1, 0), conn;
+      std::vector<double> radius, geodesic;
+      std::vector<vtkIdType> generatorA, generatorB;
+      for (size_t j = 0; j < np; j++) {
+        switch (fPrune.Outcome[j]) {
+          case PruneFacesFunctor::PRUNED_EDGE:
+            npruned_edge++;
+            break;
+          case PruneFacesFunctor::PRUNED_GEO:
+            npruned_geo++;
+            break;
+          case PruneFacesFunctor::ACCEPTED: {
+            const int *ridge = vd.Ridges.data() + ridgeOffset[j];
+            size_t m = ridge[0] - 2;
+            for (size_t k = 0; k < m; k++) {
+              vtkIdType id = ridge[3 + k] - 1;
+              if (pointMap[id] < 0) {
+                double x[3];
+                pts->GetPoint(id, x);
+                std::pair<std::unordered_map<std::string, vtkIdType>::iterator, bool> it = pointIndex.insert(
+                    std::make_pair(std::string(reinterpret_cast<const char *>(x), sizeof(x)), pointIds.size()));
+                if (it.second)
+                  pointIds.push_back(id);
+                pointMap[id] = it.first->second;
+              }
+
+              // Skip the repeated vertices left by the merge
+              if (conn.size() == (size_t) offsets.back() || conn.back() != pointMap[id])
+                conn.push_back(pointMap[id]);
+            }
+            if (conn.size() - offsets.back() > 2 && conn[offsets.back()] == conn.back())
+              conn.pop_back();
+
+            // Faces that collapse to an edge or a vertex are dropped
+            if (conn.size() - offsets.back() < 3) {
+              conn.resize(offsets.back());
+              break;
+            }
+            offsets.push_back(conn.size());
+            radius.push_back(fPrune.Radius[j]);
+            // The distances are searched up to the limit of the largest xPrune
+            // of a sweep, they are recorded up to the limit of this xPrune as
+            // a run with this xPrune alone would do
+            geodesic.push_back(std::min(fPrune.Geodesic[j], fPrune.Radius[j] * xPrune + 1));
+            generatorA.push_back(ridge[1]);
+            generatorB.push_back(ridge[2]);
+            break;
+          }
+          default:
+            break;
+        }
+      }
+
+      cout << "Edge contraint pruned " << npruned_edge << " faces." << endl;
+      cout << "Geodesic to Euclidean distance ratio contraint (" << xPrune << ") pruned " << npruned_geo << " faces."
+           << endl;
+      cout << "Clean filter: trimmed " << pts->GetNumberOfPoints() << " vertices to " << pointIds.size() << endl;
+      size_t nFaces = radius.size();
+      profiler.Stop(nFaces);
+
+      // Keep the faces of the nComp largest connected components, faces
+      // being connected through their vertices
+      std::vector<char> isKept(nFaces, 1);
+      size_t nKept = nFaces;
+      if (nComp > 0) {
+        profiler.Start("connectivity");
+        nKept = FlagLargestComponents(pointIds.size(), offsets, conn, nComp, isKept);
+      }
+
+      // Build the skeleton from the kept faces only, numbering the vertices
+      // again in the order in which these faces first use them
+      vtkNew<vtkIdTypeArray> cellOffsets, cellConn;
+      vtkNew<vtkDoubleArray> daRad, daGeod, daPrune;
+      daRad->SetName("Radius");
+      daGeod->SetName("Geodesic");
+      daPrune->SetName("Pruning Ratio");
+
+      // The boundary vertices whose Voronoi cells the face separates
+      vtkNew<vtkIdTypeArray> iaGenA, iaGenB;
+      iaGenA->SetName("GeneratorA");
+      iaGenB->SetName("GeneratorB");
+      std::vector<vtkIdType> renumber(pointIds.size(), -1);
+      vtkNew<vtkPoints> keptPts;
+      keptPts->SetDataType(pts->GetDataType());
+      cellOffsets->InsertNextValue(0);
+      for (size_t f = 0; f < nFaces; f++) {
+        if (!isKept[f])
+          continue;
+        for (vtkIdType k = offsets[f]; k < offsets[f + 1]; k++) {
+          vtkIdType &id = renumber[conn[k]];
+          if (id < 0)
+            id = keptPts->InsertNextPoint(pts->GetPoint(pointIds[conn[k]]));
+          cellConn->InsertNextValue(id);
+        }
+        cellOffsets->InsertNextValue(cellConn->GetNumberOfValues());
+        daRad->InsertNextValue(radius[f]);
+        daGeod->InsertNextValue(geodesic[f]);
+        daPrune->InsertNextValue(geodesic[f] / radius[f]);
+        iaGenA->InsertNextValue(generatorA[f]);
+        iaGenB->InsertNextValue(generatorB[f]);
+      }
+
+      if (nComp > 0) {
+        cout << "Connected component constraint pruned " << nFaces - nKept << " faces and "
+             << pointIds.size() - keptPts->GetNumberOfPoints() << " points." << endl;
+        profiler.Stop(nKept);
+      }
+
+      vtkNew<vtkCellArray> cells;
+      cells->SetData(cellOffsets, cellConn);
+      vtkSmartPointer<vtkPolyData> final = vtkSmartPointer<vtkPolyData>::New();
+      final->SetPoints(keptPts);
+      final->SetPolys(cells);
+      final->GetCellData()->AddArray(daRad);
+      final->GetCellData()->AddArray(daGeod);
+      final->GetCellData()->AddArray(daPrune);
+      final->GetCellData()->AddArray(iaGenA);
+      final->GetCellData()->AddArray(iaGenB);
+
+      // Convert the cell data to point data
+      profiler.Start("cellToPoint");
+      AddCellDataToPointData(final);
+      profiler.Stop(final->GetNumberOfPoints());
+
+      // Thickness statistics of the skeleton
+      profiler.Start("thickness");
+      ComputeThicknessStatistics(final, nThicknessBins, stats);
+      cout << "Surface area: " << stats.Area << endl;
+      cout << "Mean thickness: " << stats.Mean << endl;
+      profiler.Stop(final->GetNumberOfCells());
+
+      vtkSmartPointer<vtkPolyData> skelfinal = final;
+
+      // Quadric clustering
+      if (nBins > 0) {
+        profiler.Start("clustering");
+        // Calculate appropriate bin size
+        double bbBnd[6];
+        skelfinal->GetBounds(bbBnd);
+        vtkBoundingBox fbb;
+        fbb.SetBounds(bbBnd);
+        double binsize = fbb.GetMaxLength() / nBins;
+
+        vtkNew<vtkQuadricClustering> fCluster;
+        fCluster->SetNumberOfDivisions(
+            ceil(fbb.GetLength(0) / binsize),
+            ceil(fbb.GetLength(1) / binsize),
+            ceil(fbb.GetLength(2) / binsize));
+        fCluster->SetInputData(final);
+        fCluster->SetCopyCellData(1);
+        fCluster->Update();
+
+        printf("QuadClustering (%d x %d x %d blocks) :\n",
+               fCluster->GetNumberOfXDivisions(),
+               fCluster->GetNumberOfYDivisions(),
+               fCluster->GetNumberOfZDivisions());
+        printf("  Input mesh: %d points, %d cells\n",
+               (int) skelfinal->GetNumberOfPoints(),
+               (int) skelfinal->GetNumberOfCells());
+        printf("  Output mesh: %d points, %d cells\n",
+               (int) fCluster->GetOutput()->GetNumberOfPoints(),
+               (int) fCluster->GetOutput()->GetNumberOfCells());
+
+        // Convert cell data to point data again
+        skelfinal = fCluster->GetOutput();
+        AddCellDataToPointData(skelfinal);
+        profiler.Stop(skelfinal->GetNumberOfCells());
+      }
+
+      return skelfinal;
+    }
 
 } // end of anonymous namespace
 
-int main(int argc, char *argv[]) {
+// The exceptions are caught here, so that they do not reach Slicer when the
+// module runs as a shared object module
+int main(int argc, char *argv[]) try {
   PARSE_ARGS;
 
-  // read the poly data
-  vtkNew<vtkMRMLModelStorageNode> modelStorageNode;
-  vtkNew<vtkMRMLModelNode> modelNode;
-  modelStorageNode->SetFileName(inputSurface.c_str());
-  if (!modelStorageNode->ReadData(modelNode)) {
+  // Time and memory use of the stages
+  StageProfiler profiler;
+
+  // Progress reporting and cancellation
+  ProgressReporter progress(CLPProcessInformation);
+
+  // In batch mode, run this executable on each subject of the manifest
+  if (!batchManifest.empty()) {
+    std::string executable = argv[0];
+    if (executable.find_first_of("/\\") == std::string::npos)
+      executable = vtksys::SystemTools::FindProgram(executable);
+    BatchRunner batch(vtksys::SystemTools::CollapseFullPath(executable));
+    if (!batch.ReadManifest(batchManifest)) {
+      std::cerr << batch.GetErrorMessage() << std::endl;
+      return EXIT_FAILURE;
+    }
+
+    // Share the cores between the workers
+    int nCores = threads > 0 ? threads : vtkSMPTools::GetEstimatedNumberOfThreads();
+    int nWorkers = batchWorkers > 0 ? batchWorkers : nCores;
+    nWorkers = std::max(1, std::min(nWorkers, (int) batch.GetJobs().size()));
+
+    // The parameters given here apply to all the subjects
+    BatchRunner::ParameterList common;
+    common.push_back(std::make_pair("nDegrees", ParameterToString(nDegrees)));
+    common.push_back(std::make_pair("xPrune", ParameterToString(xPrune)));
+    common.push_back(std::make_pair("nComp", ParameterToString(nComp)));
+    common.push_back(std::make_pair("xSearchTol", ParameterToString(xSearchTol)));
+    common.push_back(std::make_pair("nBins", ParameterToString(nBins)));
+    common.push_back(std::make_pair("threads", ParameterToString(std::max(1, nCores / nWorkers))));
+    common.push_back(std::make_pair("generatorSampling", generatorSampling));
+    common.push_back(std::make_pair("generatorSpacing", ParameterToString(generatorSpacing)));
+    common.push_back(std::make_pair("generatorCount", ParameterToString(generatorCount)));
+    common.push_back(std::make_pair("voronoiMemoryBudget", ParameterToString(voronoiMemoryBudget)));
+    common.push_back(std::make_pair("insideTest", insideTest));
+    common.push_back(std::make_pair("qhullTextFile", qhullTextFile ? "true" : "false"));
+    if (!cacheDirectory.empty()) {
+      common.push_back(std::make_pair("cacheDirectory", cacheDirectory));
+      common.push_back(std::make_pair("cacheSize", ParameterToString(cacheSize)));
+    }
+    batch.SetCommonParameters(common);
+
+    cout << "Processing " << batch.GetJobs().size() << " subjects with " << nWorkers << " workers" << endl;
+    progress.StartStage("Batch", "Processing the subjects of the manifest", 0.0, 1.0);
+    batch.Run(nWorkers, ReportBatchProgress, &progress);
+    progress.EndStage();
+
+    batch.PrintSummary(cout);
+    if (!batchSummary.empty() && !batch.WriteSummary(batchSummary)) {
+      std::cerr << "Failed to write batch summary " << batchSummary << std::endl;
+      return EXIT_FAILURE;
+    }
+    if (progress.IsCancelled()) {
+      cerr << "Cancelled" << endl;
+      return EXIT_FAILURE;
+    }
+    return batch.GetNumberOfSucceededJobs() == batch.GetJobs().size() ? EXIT_SUCCESS : EXIT_FAILURE;
+  }
+
+  // read the poly data, from a file or, in the process of Slicer, a model node
+  profiler.Start("read");
+  vtkSmartPointer<vtkPolyData> bndraw = ReadModel(inputSurface);
+  if (!bndraw) {
     std::cerr << "Failed to read input model file " << inputSurface << std::endl;
     return EXIT_FAILURE;
   }
+  profiler.Stop(bndraw->GetNumberOfPoints());
 
   // Load the input mesh
-  vtkPolyData *bndraw = modelNode->GetPolyData();
   bndraw->BuildLinks();
   bndraw->BuildCells();
 
   // The raw boundary must be triangulated and cleaned
+  progress.StartStage("Clean", "Cleaning the boundary", 0.0, 0.02);
+  profiler.Start("clean");
   vtkNew<vtkTriangleFilter> fTriangle;
   fTriangle->SetInputData(bndraw);
   fTriangle->Update();
@@ -85,102 +1021,228 @@ int main(int argc, char *argv[]) {
   fClean->SetTolerance(1e-4);
   fClean->Update();
   vtkPolyData *bnd = fClean->GetOutput();
+  profiler.Stop(bnd->GetNumberOfPoints());
 
   double bbBnd[6];
   bnd->GetBounds(bbBnd);
   printf("Bounding Box : %f %f %f %f %f %f\n", bbBnd[0], bbBnd[1], bbBnd[2], bbBnd[3], bbBnd[4], bbBnd[5]);
-  vtkBoundingBox fBoundBox;
-  fBoundBox.SetBounds(bbBnd);
-
-  std::vector<double> points_3D;
-  for (vtkIdType i = 0; i < bnd->GetNumberOfPoints(); i++) {
-    points_3D.push_back(bnd->GetPoint(i)[0]);
-    points_3D.push_back(bnd->GetPoint(i)[1]);
-    points_3D.push_back(bnd->GetPoint(i)[2]);
+
+  // Optionally, recompute the skeleton only inside a region of interest
+  for (size_t i = 0; i < region.size(); i++) {
+    if (region[i].size() != 6) {
+      std::cerr << "A region must be given by the 3 coordinates of its center and its 3 radii" << std::endl;
+      return EXIT_FAILURE;
+    }
+  }
+  RegionOfInterest roi(region, regionMargin);
+  vtkSmartPointer<vtkPolyData> reference;
+  if (!referenceSkeleton.empty()) {
+    reference = region.empty() ? NULL : ReadModel(referenceSkeleton);
+    if (!reference) {
+      std::cerr << "Failed to read reference skeleton " << referenceSkeleton
+                << (region.empty() ? ", which requires a region" : "") << std::endl;
+      return EXIT_FAILURE;
+    }
+    if (!reference->GetCellData()->GetArray("Radius")) {
+      std::cerr << "The reference skeleton " << referenceSkeleton << " has no Radius cell data, it must be computed "
+                << "without quadric clustering" << std::endl;
+      return EXIT_FAILURE;
+    }
   }
 
-  // Create a temporary file where to store the points
-  char *fnPoints = tmpnam(NULL);
-  string fnVoronoiOutput = string(fnPoints) + "_voronoi.txt";
-  cout << fnVoronoiOutput.c_str() << endl;
-  FILE *output = fopen(fnVoronoiOutput.c_str(), "w");
-
-  // https://github.com/ros-planning/geometric_shapes/blob/3c23af045de12eee725205f3e9e1c42aa1d53dc8/src/bodies.cpp#L934-L941
-  static FILE* null = fopen("/dev/null", "w");
-
-  int ndim = 3;
-  int num_points = points_3D.size() / ndim;
-
-  char qhull_cmd[] = "qhull v Qbb p Fv";
-  qhT qh_qh;
-  qhT* qh = &qh_qh;
-  QHULL_LIB_CHECK
-  qh_zero(qh, null);
-  int exitcode = qh_new_qhull(qh, 3, num_points, points_3D.data(), false, qhull_cmd, output, null);
-
-  if (exitcode != 0)
-  {
-    cerr << "Call to QVoronoi failed" << endl;
-    return -1;
+  // Optionally, only use some of the boundary vertices as generators
+  std::vector<vtkIdType> generators;
+  GeneratorSamplingMethod sampling = GetGeneratorSamplingMethod(generatorSampling);
+  if (sampling != SAMPLING_NONE && (generatorCount > 0 || generatorSpacing > 0)) {
+    profiler.Start("sampling");
+    double spacing = generatorSpacing;
+    if (generatorCount > 0)
+      spacing = SampleGeneratorCount(bnd, sampling, generatorCount, generators);
+    else
+      SampleGenerators(bnd, sampling, generatorSpacing, generators);
+    profiler.Stop(generators.size());
+    cout << "Sampled " << generators.size() << " of " << bnd->GetNumberOfPoints()
+         << " boundary vertices as generators (" << generatorSampling << ", spacing " << spacing << ")" << endl;
   }
 
-  // Process qhull voronoi output
+  // In a region, only the boundary vertices within the margin are generators
+  if (!region.empty()) {
+    std::vector<vtkIdType> regionGenerators;
+    vtkIdType ng = generators.empty() ? bnd->GetNumberOfPoints() : (vtkIdType) generators.size();
+    for (vtkIdType k = 0; k < ng; k++) {
+      vtkIdType i = generators.empty() ? k : generators[k];
+      if (roi.ContainsWithMargin(bnd->GetPoint(i)))
+        regionGenerators.push_back(i);
+    }
+    cout << "Region of interest: " << regionGenerators.size() << " of " << ng
+         << " boundary vertices within the margin are generators" << endl;
+    if (regionGenerators.size() < 5) {
+      std::cerr << "Too few boundary vertices in the region of interest" << std::endl;
+      return EXIT_FAILURE;
+    }
+    generators.swap(regionGenerators);
+  }
 
-  // Load the file
-  ifstream fin(fnVoronoiOutput.c_str());
+  // Set up the threads of the parallel stages. In the process of Slicer the
+  // thread pool is shared with the application, and initializing it again
+  // would change it for everyone
+  if (threads > 0 && CLPProcessInformation)
+    cout << "Running in process, the number of threads is left to the application" << endl;
+  else if (threads > 0)
+    vtkSMPTools::Initialize(threads);
+
+  // Look the Voronoi diagram and the inside flags up in the cache
+  QhullVoronoiDiagram vd;
+  VoronoiCache cache(cacheDirectory, (size_t) cacheSize << 20);
+  std::string cacheKey;
+  std::vector<char> ptinCached;
+  bool isCached = false;
+  if (!cacheDirectory.empty()) {
+    profiler.Start("cache");
+    cacheKey = VoronoiCache::ComputeKey(bnd, xSearchTol, generators, qhullTextFile, voronoiMemoryBudget);
+    isCached = cache.Load(cacheKey, vd, ptinCached);
+    profiler.Stop(vd.NumberOfVertices);
+    cout << "Voronoi cache entry " << cacheKey << (isCached ? " found" : " not found") << endl;
+  }
 
-  // Load the numbers
-  size_t nv, np, junk;
+  if (!isCached) {
+    std::vector<double> points_3D;
+    vtkIdType ng = generators.empty() ? bnd->GetNumberOfPoints() : (vtkIdType) generators.size();
+    for (vtkIdType k = 0; k < ng; k++) {
+      vtkIdType i = generators.empty() ? k : generators[k];
+      points_3D.push_back(bnd->GetPoint(i)[0]);
+      points_3D.push_back(bnd->GetPoint(i)[1]);
+      points_3D.push_back(bnd->GetPoint(i)[2]);
+    }
 
-  // First two lines
-  fin >> junk;
-  fin >> nv;
+    // Compute the Voronoi diagram of the boundary points
+    progress.StartStage("Voronoi", "Computing the Voronoi diagram", 0.02, 0.35);
+    int exitcode;
+    if (qhullTextFile) {
+      exitcode = ComputeQhullVoronoiDiagramUsingTextFile(points_3D, vd, &profiler);
+    } else if (voronoiMemoryBudget > 0) {
+      // Split the points into blocks small enough for the blocks computed at
+      // the same time to fit in the budget
+      int nWorkers = vtkSMPTools::GetEstimatedNumberOfThreads();
+      size_t nMaxBlockPoints = ((size_t) voronoiMemoryBudget << 20) / (QHULL_BYTES_PER_POINT * nWorkers);
+      exitcode = ComputePartitionedQhullVoronoiDiagram(points_3D, vd, nMaxBlockPoints, nWorkers, &profiler);
+    } else {
+      exitcode = ComputeQhullVoronoiDiagram(points_3D, vd, &profiler);
+    }
 
-  vtkNew<vtkSelectEnclosedPoints> sel;
-  sel->SetTolerance(xSearchTol);
-  sel->Initialize(bnd);
+    if (exitcode == QHULL_OVER_BUDGET) {
+      cerr << "The Voronoi diagram does not fit in the memory budget of " << voronoiMemoryBudget
+           << " MB, raise the budget or set it to zero to compute the diagram in a single qhull run" << endl;
+      return EXIT_FAILURE;
+    }
+    if (exitcode != 0)
+    {
+      cerr << "Call to QVoronoi failed" << endl;
+      return -1;
+    }
+
+    // The ridges refer to the generators by their index among the sampled
+    // vertices, map them back to the boundary vertices
+    if (!generators.empty()) {
+      for (size_t j = 0, offset = 0; j < vd.NumberOfRidges; j++) {
+        vd.Ridges[offset + 1] = generators[vd.Ridges[offset + 1]];
+        vd.Ridges[offset + 2] = generators[vd.Ridges[offset + 2]];
+        offset += vd.Ridges[offset] + 1;
+      }
+    }
+    if (!progress.Update(1.0)) {
+      cerr << "Cancelled" << endl;
+      return EXIT_FAILURE;
+    }
+  }
+
+  size_t nv = vd.NumberOfVertices, np = vd.NumberOfRidges;
 
   // Create an array of points
   vtkNew<vtkPoints> pts;
   pts->SetNumberOfPoints(nv);
+  for (size_t i = 0; i < nv; i++)
+    pts->SetPoint(i, &vd.Vertices[3 * i]);
+
+  // Create an array of in/out flags, released on every return path
+  std::unique_ptr<bool[]> ptinBuffer(new bool[nv]);
+  bool *ptin = ptinBuffer.get();
+
+  if (isCached) {
+    std::copy(ptinCached.begin(), ptinCached.end(), ptin);
+  } else {
+    // Set up the inside/outside test, shared by all threads
+    progress.StartStage("InsideTest", "Selecting Voronoi vertices inside the boundary", 0.35, 0.65);
+    profiler.Start("inside");
+    InsideSurfaceFunctor fInside(bnd, xSearchTol, vd.Vertices.data(), ptin);
+    SurfaceOccupancyGrid grid;
+    if (insideTest == "VoxelGrid") {
+      grid.Build(bnd, xSearchTol);
+      fInside.SetGrid(&grid);
+      const int *dims = grid.GetDimensions();
+      cout << "Occupancy grid: " << dims[0] << " x " << dims[1] << " x " << dims[2]
+           << " voxels of size " << grid.GetVoxelSize() << ", " << grid.GetNumberOfSurfaceVoxels()
+           << " on the surface, " << grid.GetNumberOfRegions() << " regions" << endl;
+    }
 
-  // Create an array of in/out flags
-  bool *ptin = new bool[nv];
+    if (insideTestBenchmark) {
+      profiler.Start("insideBenchmark");
+      BenchmarkInsideTests(bnd, xSearchTol, vd.Vertices.data(), nv);
+      profiler.Start("inside");
+    }
 
-  // Progress bar
-  cout << "Selecting points inside mesh (n = " << nv << ")" << endl;
-  cout << "|         |         |         |         |         |" << endl;
-  size_t next_prog_mark = nv / 50;
+    // Process the points in blocks, each block in parallel
+    cout << "Selecting points inside mesh (n = " << nv << ")" << endl;
+    for (size_t b = 0; b < NUMBER_OF_BLOCKS; b++) {
+      vtkSMPTools::For(nv * b / NUMBER_OF_BLOCKS, nv * (b + 1) / NUMBER_OF_BLOCKS, fInside);
+      if (!progress.Update((b + 1.0) / NUMBER_OF_BLOCKS)) {
+        cerr << "Cancelled" << endl;
+        return EXIT_FAILURE;
+      }
+    }
+    profiler.Stop(std::count(ptin, ptin + nv, true));
 
-  for (size_t i = 0; i < nv; i++) {
-    double x, y, z;
-    fin >> x;
-    fin >> y;
-    fin >> z;
-    pts->SetPoint(i, x, y, z);
+    if (!cacheDirectory.empty() && !cache.Store(cacheKey, vd, ptin))
+      cerr << "Failed to store the Voronoi diagram in the cache " << cacheDirectory << endl;
+  }
 
-    // Is this point outside of the bounding box
-    if (xSearchTol > 0)
-      ptin[i] = fBoundBox.ContainsPoint(x, y, z) && sel->IsInsideSurface(x, y, z);
-    else
-      ptin[i] = fBoundBox.ContainsPoint(x, y, z);
+  // In a region, only the Voronoi vertices inside the region make faces. A
+  // vertex is only a vertex of the diagram of all the boundary vertices if
+  // its empty sphere lies within the margin, where all of them are generators
+  if (!region.empty()) {
+    std::vector<char> isBeyondMargin(nv, 0);
+    for (size_t j = 0, offset = 0; j < np; j++) {
+      const int *ridge = vd.Ridges.data() + offset;
+      const double *generator = bnd->GetPoint(ridge[1]);
+      for (int k = 3; k < ridge[0] + 1; k++) {
+        vtkIdType id = ridge[k] - 1;
+        if (id >= 0 && ptin[id] && !isBeyondMargin[id]
+            && sqrt(vtkMath::Distance2BetweenPoints(&vd.Vertices[3 * id], generator)) > regionMargin)
+          isBeyondMargin[id] = 1;
+      }
+      offset += ridge[0] + 1;
+    }
 
-    if (i >= next_prog_mark) {
-      cout << "." << flush;
-      next_prog_mark += nv / 50;
+    size_t nInside = 0, nBeyondMargin = 0;
+    for (size_t i = 0; i < nv; i++) {
+      if (ptin[i] && !roi.Contains(&vd.Vertices[3 * i])) {
+        ptin[i] = false;
+      } else if (ptin[i] && isBeyondMargin[i]) {
+        ptin[i] = false;
+        nBeyondMargin++;
+      } else if (ptin[i]) {
+        nInside++;
+      }
     }
+    cout << "Region of interest: " << nInside << " Voronoi vertices inside the boundary and the region" << endl;
+    if (nBeyondMargin > 0)
+      cerr << "Warning: " << nBeyondMargin << " Voronoi vertices of the region have empty spheres reaching beyond "
+           << "the margin and were left out, increase the region margin" << endl;
   }
-  cout << "." << endl;
-
-  // Read the number of cells
-  fin >> np;
-
-  // Progress bar
-  cout << "Selecting faces using pruning criteria (n = " << np << ")" << endl;
-  cout << "|         |         |         |         |         |" << endl;
-  next_prog_mark = np / 50;
 
   // Create and configure Dijkstra's alg for geodesic distance
+  progress.StartStage("Graph", "Building the boundary graph", 0.65, 0.67);
+  profiler.Start("graph");
   VTKMeshHalfEdgeWrapper hewrap_geo(bnd);
   EuclideanDistanceMeshEdgeWeightFunction wfunc_geo;
   VTKMeshShortestDistance dijkstra_geo;
@@ -188,272 +1250,161 @@ int main(int argc, char *argv[]) {
   dijkstra_geo.SetEdgeWeightFunction(&wfunc_geo);
   dijkstra_geo.ComputeGraph();
 
-  // Create and configure Dijkstra's alg for edge counting
-  VTKMeshHalfEdgeWrapper hewrap_edge(bnd);
-  UnitLengthMeshEdgeWeightFunction wfunc_edge;
-  VTKMeshShortestDistance dijkstra_edge;
-  dijkstra_edge.SetInputMesh(&hewrap_edge);
-  dijkstra_edge.SetEdgeWeightFunction(&wfunc_edge);
-  dijkstra_edge.ComputeGraph();
-
-  // Keep track of number pruned
-  size_t npruned_geo = 0, npruned_edge = 0;
-
-  // Create the polygons
-  vtkNew<vtkCellArray> cells;
-
-  // Allocate the output radius data array
-  vtkNew<vtkDoubleArray> daRad;
-  daRad->SetNumberOfComponents(1);
-  daRad->SetName("Radius");
-
-// Another array for prune strength
-  vtkNew<vtkDoubleArray> daPrune;
-  daPrune->SetNumberOfComponents(1);
-  daPrune->SetName("Pruning Ratio");
-
-// Another array for prune strength
-  vtkNew<vtkDoubleArray> daGeod;
-  daGeod->SetNumberOfComponents(1);
-  daGeod->SetName("Geodesic");
-
-  // iterating over cells
-  for (size_t j = 0; j < np; j++) {
-    bool isinf = false;
-    bool isout = false;
-
-    size_t m;
-    fin >> m;
-    m -= 2;
-    vtkIdType ip1, ip2; // reading first two points of cell
-    fin >> ip1;
-    fin >> ip2;
-
-    // reading rest of cells
-    vtkIdType *ids = new vtkIdType[m];
-    for (size_t k = 0; k < m; k++) {
-      fin >> ids[k];
-
-      // Is this point at infinity?
-      if (ids[k] == 0) isinf = true; else ids[k]--;
-      if (!ptin[ids[k]]) isout = true;
-    }
-
-    if (!isinf && !isout) {
-      bool pruned = false;
-      double r = 0, dgeo = 0;
-
-      // Get the edge distance between generators
-      dijkstra_edge.ComputeDistances(ip1, nDegrees);
-      double elen = dijkstra_edge.GetVertexDistance(ip2);
-      if (elen < nDegrees) {
-        pruned = true;
-        npruned_edge++;
-      }
-      else {
-        // Get the Euclidean distance between generator points
-        double ipDb1[3];
-        double ipDb2[3];
-        float ipFt1[3];
-        float ipFt2[3];
-        bnd->GetPoint(ip1, ipDb1);
-        bnd->GetPoint(ip2, ipDb2);
-        for (int i = 0; i < 3; i++) {
-          ipFt1[i] = (float) ipDb1[i];
-          ipFt2[i] = (float) ipDb2[i];
-        }
-        vnl_vector_fixed<float, 3> p1(ipFt1);
-        vnl_vector_fixed<float, 3> p2(ipFt2);
-        r = (p1 - p2).magnitude();
-        /*std::cout << "p1: " << p1[0] << " " << p1[1] << " " << p1[2] << std::endl;
-        std::cout << "p2: " << p2[0] << " " << p2[1] << " " << p2[2] << std::endl;
-        std::cout << "r: " << r << std::endl;*/
-
-        // The geodesic distance between generators should exceed d * xPrune;
-        dijkstra_geo.ComputeDistances(ip1, r * xPrune + 1);
-
-        // Get the distance
-        dgeo = dijkstra_geo.GetVertexDistance(ip2);
-
-        // If the geodesic is too short, don't insert point
-        if (dgeo < r * xPrune) {
-          pruned = true;
-          npruned_geo++;
-        }
-      }
+  // Find where each ridge starts, so that the ridges can be processed in any order
+  std::vector<size_t> ridgeOffset(np);
+  for (size_t j = 0, offset = 0; j < np; j++) {
+    ridgeOffset[j] = offset;
+    offset += vd.Ridges[offset] + 1;
+  }
 
-      if (!pruned) {
-        // add the cell
-        cells->InsertNextCell(m, ids);
-        daRad->InsertNextTuple(&r);
-        daGeod->InsertNextTuple(&dgeo);
-        double ratio = dgeo / r;
-        daPrune->InsertNextTuple(&ratio);
+  // The combinations of parameters to compute skeletons for. Each list that
+  // is not given holds the single value of the corresponding parameter
+  bool isSweep = !xPruneSweep.empty() || !nDegreesSweep.empty() || !nCompSweep.empty();
+  if (isSweep && IsModelNodeReference(outputSurface)) {
+    std::cerr << "A parameter sweep writes its skeletons next to the output model, which must be a file" << std::endl;
+    return EXIT_FAILURE;
+  }
+  if (xPruneSweep.empty())
+    xPruneSweep.push_back(xPrune);
+  if (nDegreesSweep.empty())
+    nDegreesSweep.push_back(nDegrees);
+  if (nCompSweep.empty())
+    nCompSweep.push_back(nComp);
+
+  std::vector<SweepParameters> sweep;
+  for (size_t i = 0; i < xPruneSweep.size(); i++)
+    for (size_t j = 0; j < nDegreesSweep.size(); j++)
+      for (size_t k = 0; k < nCompSweep.size(); k++) {
+        SweepParameters sp = { xPruneSweep[i], nDegreesSweep[j], nCompSweep[k] };
+        sweep.push_back(sp);
       }
-    }
 
-    if (j >= next_prog_mark) {
-      cout << "." << flush;
-      next_prog_mark += np / 50;
-    }
+  double xMaxPrune = *std::max_element(xPruneSweep.begin(), xPruneSweep.end());
+  int nMinDegrees = *std::min_element(nDegreesSweep.begin(), nDegreesSweep.end());
+  int nMaxDegrees = *std::max_element(nDegreesSweep.begin(), nDegreesSweep.end());
 
-    delete[] ids;
-  }
+  // Evaluate the pruning criteria on the ridges in parallel, once for all the
+  // combinations. The edge criterion uses a breadth first search on the same graph
+  PruneFacesFunctor fPrune(
+      &hewrap_geo, dijkstra_geo.GetEdgeWeights(), bnd,
+      vd.Ridges.data(), ridgeOffset.data(), np, ptin, nMinDegrees, nMaxDegrees, xMaxPrune);
 
-  cout << "." << endl;
-  cout << "Edge contraint pruned " << npruned_edge << " faces." << endl;
-  cout << "Geodesic to Euclidean distance ratio contraint (" << xPrune << ") pruned " << npruned_geo << " faces."
-       << endl;
+  size_t ns = fPrune.GetNumberOfSources();
+  profiler.Stop(hewrap_geo.GetNumberOfHalfEdges());
 
-  // Clean up files
-  if (fin.is_open()) {
-    fin.close();
-    remove(fnVoronoiOutput.c_str());
-  }
-  remove(fnPoints);
-
-  // Create the vtk poly data
-  vtkNew<vtkPolyData> skel;
-  skel->SetPoints(pts);
-  skel->SetPolys(cells);
-  skel->GetCellData()->AddArray(daRad);
-  skel->GetCellData()->AddArray(daGeod);
-  skel->GetCellData()->AddArray(daPrune);
-  skel->BuildCells();
-  skel->BuildLinks();
-
-  // Drop the singleton points from the diagram (points not in any cell)
-  vtkNew<vtkCleanPolyData> fltClean;
-  fltClean->SetInputData(skel);
-  fltClean->Update();
-  cout << "Clean filter: trimmed "
-       << skel->GetNumberOfPoints() << " vertices to "
-       << fltClean->GetOutput()->GetNumberOfPoints() << endl;
-
-
-  // The output from the next branch
-  vtkPolyData *polySave = fltClean->GetOutput();
-
-  // Compute the connected components
-  if (nComp > 0) {
-    vtkNew<vtkPolyDataConnectivityFilter> fltConnect;
-    fltConnect->SetInputData(fltClean->GetOutput());
-
-    if (nComp == 1)
-      fltConnect->SetExtractionModeToLargestRegion();
-    else {
-      fltConnect->SetExtractionModeToSpecifiedRegions();
-      fltConnect->InitializeSpecifiedRegionList();
-      for (int rr = 0; rr < nComp; rr++)
-        fltConnect->AddSpecifiedRegion(rr);
-    }
-
-    fltConnect->ScalarConnectivityOff();
-    fltConnect->Update();
-
-    // Don't see why this is necessary, but Connectivity filter does not remove points,
-    // just faces. So we need another clear filter
-    vtkNew<vtkCleanPolyData> fltWhy;
-    fltWhy->SetInputData(fltConnect->GetOutput());
-    fltWhy->Update();
-
-    cout << "Connected component constraint pruned "
-         << polySave->GetNumberOfCells() - fltWhy->GetOutput()->GetNumberOfCells() << " faces and "
-         << polySave->GetNumberOfPoints() - fltWhy->GetOutput()->GetNumberOfPoints() << " points." << endl;
-    polySave = fltWhy->GetOutput();
+  // Process the generators in blocks, each block in parallel
+  progress.StartStage("Pruning", "Selecting faces using the pruning criteria", 0.67, 0.9);
+  profiler.Start("pruning");
+  cout << "Selecting faces using pruning criteria (n = " << np << ")" << endl;
+  cout << "  " << fPrune.GetNumberOfCandidates() << " candidate faces share " << ns << " generators" << endl;
+  for (size_t b = 0; b < NUMBER_OF_BLOCKS; b++) {
+    vtkSMPTools::For(ns * b / NUMBER_OF_BLOCKS, ns * (b + 1) / NUMBER_OF_BLOCKS, fPrune);
+    if (!progress.Update((b + 1.0) / NUMBER_OF_BLOCKS)) {
+      cerr << "Cancelled" << endl;
+      return EXIT_FAILURE;
+    }
   }
 
-  // Convert the cell data to point data
-  vtkNew<vtkCellDataToPointData> c2p;
-  c2p->SetInputData(polySave);
-  c2p->PassCellDataOn();
-  c2p->Update();
-  vtkPolyData *final = c2p->GetPolyDataOutput();
-
-  // Compute mean, median thickness?
-  double int_area = 0.0, int_thick = 0.0;
-  vtkDataArray *finalRad = final->GetCellData()->GetArray("Radius");
-  for (vtkIdType i = 0; i < final->GetNumberOfCells(); i++) {
-    double r = finalRad->GetTuple1(i);
-    //std::cout << "r: " << r << std::endl;
-    vtkCell *c = final->GetCell(i);
-    if (c->GetNumberOfPoints() == 3) {
-      vtkIdType p1Id = c->GetPointId(0);
-      vtkIdType p2Id = c->GetPointId(1);
-      vtkIdType p3Id = c->GetPointId(2);
-      double p1d[3];
-      double p2d[3];
-      double p3d[3];
-      float p1f[3];
-      float p2f[3];
-      float p3f[3];
-      final->GetPoint(p1Id, p1d);
-      final->GetPoint(p2Id, p2d);
-      final->GetPoint(p3Id, p3d);
-      for (int i = 0; i < 3; i++) {
-        p1f[i] = (float) p1d[i];
-        p2f[i] = (float) p2d[i];
-        p3f[i] = (float) p3d[i];
+  profiler.Stop(fPrune.GetNumberOfCandidates());
+
+  // Compute the skeleton for each combination of parameters. Without a sweep,
+  // there is a single combination and it goes to the output surface
+  progress.StartStage("Skeleton", "Assembling the skeleton", 0.9, 1.0);
+  ThicknessStatistics stats;
+  for (size_t c = 0; c < sweep.size(); c++) {
+    const SweepParameters &sp = sweep[c];
+    if (isSweep)
+      cout << "Parameter combination " << c + 1 << " of " << sweep.size() << ": xPrune = " << sp.XPrune
+           << ", nDegrees = " << sp.NDegrees << ", nComp = " << sp.NComp << endl;
+
+    fPrune.ApplyCriteria(sp.NDegrees, sp.XPrune);
+    ThicknessStatistics combinationStats;
+    vtkSmartPointer<vtkPolyData> skelfinal = AssembleSkeleton(
+        fPrune, vd, ridgeOffset, pts, sp.XPrune, region.empty() ? sp.NComp : 0, region.empty() ? nBins : 0,
+        thicknessBins, combinationStats, profiler);
+
+    // Replace the region of the reference skeleton by the new faces
+    if (reference) {
+      profiler.Start("splice");
+      skelfinal = SpliceSkeleton(reference, skelfinal, roi);
+      ComputeThicknessStatistics(skelfinal, thicknessBins, combinationStats);
+      cout << "Spliced surface area: " << combinationStats.Area << endl;
+      cout << "Spliced mean thickness: " << combinationStats.Mean << endl;
+      profiler.Stop(skelfinal->GetNumberOfCells());
+    }
+    if (c == 0)
+      stats = combinationStats;
+
+    // Write the skeleton, to a file of its own in a sweep, and the first
+    // combination also to the output surface
+    std::vector<std::string> fnOutput;
+    if (isSweep)
+      fnOutput.push_back(SweepOutputFileName(outputSurface, sp));
+    if (c == 0)
+      fnOutput.push_back(outputSurface);
+
+    profiler.Start("write");
+    for (size_t f = 0; f < fnOutput.size(); f++) {
+      if (!WriteModel(fnOutput[f], skelfinal)) {
+        std::cerr << "Failed to write output model file " << fnOutput[f] << std::endl;
+        return EXIT_FAILURE;
       }
-      vnl_vector_fixed<float, 3> p1(p1f);
-      vnl_vector_fixed<float, 3> p2(p2f);
-      vnl_vector_fixed<float, 3> p3(p3f);
-      double a = fabs(TriangleArea(p1, p2, p3));
-      //std::cout << "a: " << a << std::endl;
-      int_area += a;
-      int_thick += r * a;
     }
+    profiler.Stop(fnOutput.size());
+
+    if (!progress.Update((c + 1.0) / sweep.size())) {
+      cerr << "Cancelled" << endl;
+      return EXIT_FAILURE;
+    }
+  }
+  progress.EndStage();
+
+  // Report the time and memory use of the stages
+  cout << "Stages:" << endl;
+  profiler.Print(cout);
+
+  const std::vector<StageProfiler::Stage> &stages = profiler.GetStages();
+  if (!returnParameterFile.empty()) {
+    std::ofstream rts(returnParameterFile.c_str());
+    rts << "totalTime = " << profiler.GetTotalTime() << endl;
+    rts << "peakMemory = " << StageProfiler::GetPeakMemory() << endl;
+    rts << "surfaceArea = " << stats.Area << endl;
+    rts << "meanThickness = " << stats.Mean << endl;
+    rts << "medianThickness = " << stats.Median << endl;
+    rts << "thicknessHistogram = ";
+    for (size_t b = 0; b < stats.Histogram.size(); b++)
+      rts << (b > 0 ? "," : "") << stats.Histogram[b];
+    rts << endl;
+    rts << "stageNames = ";
+    for (size_t i = 0; i < stages.size(); i++)
+      rts << (i > 0 ? "," : "") << stages[i].Name;
+    rts << endl << "stageTimes = ";
+    for (size_t i = 0; i < stages.size(); i++)
+      rts << (i > 0 ? "," : "") << stages[i].Time;
+    rts << endl << "stagePeakMemory = ";
+    for (size_t i = 0; i < stages.size(); i++)
+      rts << (i > 0 ? "," : "") << stages[i].PeakMemory;
+    rts << endl << "stageItems = ";
+    for (size_t i = 0; i < stages.size(); i++)
+      rts << (i > 0 ? "," : "") << stages[i].Items;
+    rts << endl;
   }
-  cout << "Surface area: " << int_area << endl;
-  cout << "Mean thickness: " << int_thick / int_area << endl;
-
-  vtkPolyData *skelfinal = c2p->GetPolyDataOutput();
-
-  // Quadric clustering
-  if (nBins > 0) {
-    // Calculate appropriate bin size
-    double bbBnd[6];
-    skelfinal->GetBounds(bbBnd);
-    vtkBoundingBox fbb;
-    fbb.SetBounds(bbBnd);
-    double binsize = fbb.GetMaxLength() / nBins;
-
-    vtkNew<vtkQuadricClustering> fCluster;
-    fCluster->SetNumberOfDivisions(
-        ceil(fbb.GetLength(0) / binsize),
-        ceil(fbb.GetLength(1) / binsize),
-        ceil(fbb.GetLength(2) / binsize));
-    fCluster->SetInputData(c2p->GetPolyDataOutput());
-    fCluster->SetCopyCellData(1);
-    fCluster->Update();
-
-    printf("QuadClustering (%d x %d x %d blocks) :\n",
-           fCluster->GetNumberOfXDivisions(),
-           fCluster->GetNumberOfYDivisions(),
-           fCluster->GetNumberOfZDivisions());
-    printf("  Input mesh: %d points, %d cells\n",
-           (int) skelfinal->GetNumberOfPoints(),
-           (int) skelfinal->GetNumberOfCells());
-    printf("  Output mesh: %d points, %d cells\n",
-           (int) fCluster->GetOutput()->GetNumberOfPoints(),
-           (int) fCluster->GetOutput()->GetNumberOfCells());
-
-    // Convert cell data to point data again
-    vtkNew<vtkCellDataToPointData> c2p;
-    c2p->SetInputData(fCluster->GetOutput());
-    c2p->PassCellDataOn();
-    c2p->Update();
-    skelfinal->DeepCopy(c2p->GetPolyDataOutput());
+
+  if (!thicknessTable.empty() && !WriteThicknessTable(thicknessTable, stats)) {
+    std::cerr << "Failed to write thickness table " << thicknessTable << std::endl;
+    return EXIT_FAILURE;
   }
 
-  vtkNew<vtkMRMLModelNode> outputModelNode;
-  outputModelNode->SetAndObservePolyData(skelfinal);
-  vtkNew<vtkMRMLModelStorageNode> outputModelStorageNode;
-  outputModelStorageNode->SetFileName(outputSurface.c_str());
-  if (!outputModelStorageNode->WriteData(outputModelNode)) {
-    std::cerr << "Failed to write output model file " << outputSurface << std::endl;
+  if (!reportFile.empty() && !profiler.WriteJSON(reportFile)) {
+    std::cerr << "Failed to write report file " << reportFile << std::endl;
     return EXIT_FAILURE;
   }
 
   return EXIT_SUCCESS;
+} catch (const std::exception &exc) {
+  std::cerr << "Failed to compute the skeleton: " << exc.what() << std::endl;
+  return EXIT_FAILURE;
+} catch (const char *message) {
+  std::cerr << "Failed to compute the skeleton: " << message << std::endl;
+  return EXIT_FAILURE;
 }
@@ -0,0 +1,113 @@
+#include "StageProfiler.h"
+
+#include <vtkTimerLog.h>
+
+#include <cstdio>
+#include <fstream>
+#include <iostream>
+
+#if defined(_WIN32)
+#include <windows.h>
+#include <psapi.h>
+#else
+#include <sys/resource.h>
+#endif
+
+StageProfiler::StageProfiler()
+  : m_Current(-1)
+{
+  m_StartTime = m_StageStartTime = vtkTimerLog::GetUniversalTime();
+}
+
+void StageProfiler::Start(const std::string &name)
+{
+  Stop();
+
+  m_Current = -1;
+  for (size_t i = 0; i < m_Stages.size(); i++)
+    if (m_Stages[i].Name == name)
+      m_Current = static_cast<int>(i);
+
+  if (m_Current < 0) {
+    Stage stage = { name, 0.0, 0.0, 0, 0 };
+    m_Stages.push_back(stage);
+    m_Current = static_cast<int>(m_Stages.size()) - 1;
+  }
+
+  m_StageStartTime = vtkTimerLog::GetUniversalTime();
+}
+
+void StageProfiler::Stop(size_t nItems)
+{
+  if (m_Current < 0)
+    return;
+
+  Stage &stage = m_Stages[m_Current];
+  stage.Time += vtkTimerLog::GetUniversalTime() - m_StageStartTime;
+  stage.PeakMemory = GetPeakMemory();
+  stage.Items += nItems;
+  stage.Runs++;
+  m_Current = -1;
+}
+
+double StageProfiler::GetTotalTime() const
+{
+  return vtkTimerLog::GetUniversalTime() - m_StartTime;
+}
+
+double StageProfiler::GetPeakMemory()
+{
+#if defined(_WIN32)
+  PROCESS_MEMORY_COUNTERS pmc;
+  if (!GetProcessMemoryInfo(GetCurrentProcess(), &pmc, sizeof(pmc)))
+    return 0.0;
+  return pmc.PeakWorkingSetSize / (1024.0 * 1024.0);
+#else
+  struct rusage usage;
+  if (getrusage(RUSAGE_SELF, &usage) != 0)
+    return 0.0;
+#if defined(__APPLE__)
+  // Bytes on macOS, kilobytes elsewhere
+  return usage.ru_maxrss / (1024.0 * 1024.0);
+#else
+  return usage.ru_maxrss / 1024.0;
+#endif
+#endif
+}
+
+void StageProfiler::Print(std::ostream &os) const
+{
+  char line[256];
+  snprintf(line, sizeof(line), "%-16s %10s %12s %12s", "Stage", "Time (s)", "Peak (MB)", "Items");
+  os << line << std::endl;
+  for (size_t i = 0; i < m_Stages.size(); i++) {
+    const Stage &stage = m_Stages[i];
+    snprintf(line, sizeof(line), "%-16s %10.3f %12.1f %12lu", stage.Name.c_str(), stage.Time, stage.PeakMemory,
+             static_cast<unsigned long>(stage.Items));
+    os << line << std::endl;
+  }
+  snprintf(line, sizeof(line), "%-16s %10.3f %12.1f", "Total", GetTotalTime(), GetPeakMemory());
+  os << line << std::endl;
+}
+
+bool StageProfiler::WriteJSON(const std::string &filename) const
+{
+  std::ofstream fout(filename.c_str());
+  if (!fout.good())
+    return false;
+
+  // The stage names are identifiers chosen by the caller, they need no escaping
+  fout << "{" << std::endl;
+  fout << "  \"totalTime\": " << GetTotalTime() << "," << std::endl;
+  fout << "  \"peakMemory\": " << GetPeakMemory() << "," << std::endl;
+  fout << "  \"stages\": [" << std::endl;
+  for (size_t i = 0; i < m_Stages.size(); i++) {
+    const Stage &stage = m_Stages[i];
+    fout << "    { \"name\": \"" << stage.Name << "\", \"time\": " << stage.Time
+         << ", \"peakMemory\": " << stage.PeakMemory << ", \"items\": " << stage.Items
+         << ", \"runs\": " << stage.Runs << " }" << (i + 1 < m_Stages.size() ? "," : "") << std::endl;
+  }
+  fout << "  ]" << std::endl;
+  fout << "}" << std::endl;
+  return fout.good();
+}
@@ -0,0 +1,59 @@
+#ifndef __StageProfiler_h_
+#define __StageProfiler_h_
+
+#include <iosfwd>
+#include <string>
+#include <vector>
+#include <cstddef>
+
+/**
+ * Records the wall time, the peak memory use and the number of items
+ * processed by each stage of a computation. A stage runs from Start() to the
+ * next Start() or Stop(). A stage that runs several times, e.g., once per
+ * parameter combination, accumulates its time and items in a single entry.
+ *
+ * The peak memory of a stage is the peak resident set size of the process
+ * at the end of the stage, so it never decreases from one stage to the next.
+ */
+class StageProfiler
+{
+public:
+  struct Stage
+  {
+    std::string Name;
+    double Time;
+    double PeakMemory;
+    size_t Items;
+    size_t Runs;
+  };
+
+  StageProfiler();
+
+  /** Start a stage, ending the current one */
+  void Start(const std::string &name);
+
+  /** End the current stage, recording the number of items it processed */
+  void Stop(size_t nItems = 0);
+
+  /** The stages, in the order in which they first ran */
+  const std::vector<Stage> &GetStages() const { return m_Stages; }
+
+  /** Time since the profiler was created, in seconds */
+  double GetTotalTime() const;
+
+  /** Peak resident set size of the process, in megabytes */
+  static double GetPeakMemory();
+
+  /** Print the stages as a table */
+  void Print(std::ostream &os) const;
+
+  /** Write the stages to a JSON file, returns false if it cannot be written */
+  bool WriteJSON(const std::string &filename) const;
+
+private:
+  std::vector<Stage> m_Stages;
+  double m_StartTime, m_StageStartTime;
+  int m_Current;
+};
+
+#endif
@@ -0,0 +1,149 @@
+#include "SurfaceOccupancyGrid.h"
+
+#include <vtkPolyData.h>
+#include <vtkCellArray.h>
+#include <vtkIdList.h>
+#include <vtkMath.h>
+#include <vtkNew.h>
+
+#include <algorithm>
+#include <cmath>
+
+namespace {
+
+// Voxel size, in multiples of the mean edge length of the surface
+const double VOXEL_SIZE_IN_EDGES = 1.0;
+
+} // end of anonymous namespace
+
+SurfaceOccupancyGrid::SurfaceOccupancyGrid()
+  : m_Spacing(1.0), m_NumberOfSurfaceVoxels(0)
+{
+  m_Origin[0] = m_Origin[1] = m_Origin[2] = 0.0;
+  m_Dims[0] = m_Dims[1] = m_Dims[2] = 0;
+}
+
+void SurfaceOccupancyGrid::Build(vtkPolyData *surface, double tol, size_t nMaxVoxels)
+{
+  double bounds[6];
+  surface->GetBounds(bounds);
+  double pad = tol * surface->GetLength();
+
+  // Mean edge length of the surface
+  double xEdgeSum = 0.0;
+  size_t nEdges = 0;
+  vtkNew<vtkIdList> ids;
+  vtkCellArray *polys = surface->GetPolys();
+  for (polys->InitTraversal(); polys->GetNextCell(ids);) {
+    for (vtkIdType k = 0; k < ids->GetNumberOfIds(); k++) {
+      double a[3], b[3];
+      surface->GetPoint(ids->GetId(k), a);
+      surface->GetPoint(ids->GetId((k + 1) % ids->GetNumberOfIds()), b);
+      xEdgeSum += sqrt(vtkMath::Distance2BetweenPoints(a, b));
+      nEdges++;
+    }
+  }
+
+  // Pick the voxel size, coarsening the grid until it fits. The grid has an
+  // empty layer of voxels all around the surface
+  m_Spacing = nEdges > 0 ? VOXEL_SIZE_IN_EDGES * xEdgeSum / nEdges : 0.0;
+  if (m_Spacing <= 0.0)
+    m_Spacing = std::max(surface->GetLength(), 1.0);
+  for (;;) {
+    size_t nVoxels = 1;
+    for (int d = 0; d < 3; d++) {
+      m_Dims[d] = static_cast<int>(ceil((bounds[2 * d + 1] - bounds[2 * d] + 2 * pad) / m_Spacing)) + 2;
+      nVoxels *= m_Dims[d];
+    }
+    if (nVoxels <= nMaxVoxels)
+      break;
+    m_Spacing *= 1.25;
+  }
+  for (int d = 0; d < 3; d++)
+    m_Origin[d] = bounds[2 * d] - pad - m_Spacing;
+
+  // Mark the voxels overlapping the padded bounding box of each cell
+  m_Label.assign(static_cast<size_t>(m_Dims[0]) * m_Dims[1] * m_Dims[2], 0);
+  for (vtkIdType c = 0; c < surface->GetNumberOfCells(); c++) {
+    double cb[6];
+    surface->GetCellBounds(c, cb);
+    int lo[3], hi[3];
+    for (int d = 0; d < 3; d++) {
+      lo[d] = std::max(0, static_cast<int>(floor((cb[2 * d] - pad - m_Origin[d]) / m_Spacing)));
+      hi[d] = std::min(m_Dims[d] - 1, static_cast<int>(floor((cb[2 * d + 1] + pad - m_Origin[d]) / m_Spacing)));
+    }
+    for (int k = lo[2]; k <= hi[2]; k++)
+      for (int j = lo[1]; j <= hi[1]; j++)
+        for (int i = lo[0]; i <= hi[0]; i++)
+          m_Label[VoxelIndex(i, j, k)] = SURFACE;
+  }
+
+  // Label the connected regions of the remaining voxels, which are marked 0
+  // at this point, with region indices starting at 0 (stored as -(r + 2)
+  // during the fill so that they are distinct from the unvisited voxels)
+  m_RegionSeed.clear();
+  m_NumberOfSurfaceVoxels = 0;
+  std::vector<size_t> queue;
+  for (size_t v = 0; v < m_Label.size(); v++) {
+    if (m_Label[v] == SURFACE) {
+      m_NumberOfSurfaceVoxels++;
+      continue;
+    }
+    if (m_Label[v] != 0)
+      continue;
+
+    int region = static_cast<int>(m_RegionSeed.size());
+    m_RegionSeed.push_back(v);
+    m_Label[v] = -(region + 2);
+    queue.assign(1, v);
+    for (size_t q = 0; q < queue.size(); q++) {
+      size_t w = queue[q];
+      int i = static_cast<int>(w % m_Dims[0]);
+      int j = static_cast<int>((w / m_Dims[0]) % m_Dims[1]);
+      int k = static_cast<int>(w / (static_cast<size_t>(m_Dims[0]) * m_Dims[1]));
+      int nbr[6][3] = { { i - 1, j, k }, { i + 1, j, k }, { i, j - 1, k },
+                        { i, j + 1, k }, { i, j, k - 1 }, { i, j, k + 1 } };
+      for (int n = 0; n < 6; n++) {
+        if (nbr[n][0] < 0 || nbr[n][0] >= m_Dims[0] || nbr[n][1] < 0 || nbr[n][1] >= m_Dims[1]
+            || nbr[n][2] < 0 || nbr[n][2] >= m_Dims[2])
+          continue;
+        size_t u = VoxelIndex(nbr[n][0], nbr[n][1], nbr[n][2]);
+        if (m_Label[u] == 0) {
+          m_Label[u] = -(region + 2);
+          queue.push_back(u);
+        }
+      }
+    }
+  }
+
+  for (size_t v = 0; v < m_Label.size(); v++)
+    if (m_Label[v] != SURFACE)
+      m_Label[v] = -m_Label[v] - 2;
+
+  // The regions are outside until the caller has tested them
+  m_RegionInside.assign(m_RegionSeed.size(), 0);
+}
+
+void SurfaceOccupancyGrid::GetRegionSeed(size_t iRegion, double x[3]) const
+{
+  size_t v = m_RegionSeed[iRegion];
+  size_t ijk[3] = { v % m_Dims[0], (v / m_Dims[0]) % m_Dims[1], v / (static_cast<size_t>(m_Dims[0]) * m_Dims[1]) };
+  for (int d = 0; d < 3; d++)
+    x[d] = m_Origin[d] + (ijk[d] + 0.5) * m_Spacing;
+}
+
+SurfaceOccupancyGrid::Classification SurfaceOccupancyGrid::Classify(const double x[3]) const
+{
+  int ijk[3];
+  for (int d = 0; d < 3; d++) {
+    double t = floor((x[d] - m_Origin[d]) / m_Spacing);
+    if (!(t >= 0 && t < m_Dims[d]))
+      return OUTSIDE;
+    ijk[d] = static_cast<int>(t);
+  }
+
+  int label = m_Label[VoxelIndex(ijk[0], ijk[1], ijk[2])];
+  if (label == SURFACE)
+    return NEAR_SURFACE;
+  return m_RegionInside[label] ? INSIDE : OUTSIDE;
+}
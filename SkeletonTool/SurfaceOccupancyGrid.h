@@ -0,0 +1,74 @@
+#ifndef __SurfaceOccupancyGrid_h_
+#define __SurfaceOccupancyGrid_h_
+
+#include <vector>
+#include <cstddef>
+
+class vtkPolyData;
+
+/**
+ * A voxel grid over a closed surface that answers inside/outside queries
+ * without casting rays for most points. The surface is rasterised once: every
+ * voxel that a triangle may touch is marked as a surface voxel. The other
+ * voxels fall into connected regions (6-connectivity) that the surface does
+ * not cross, so all points of a region are on the same side of the surface,
+ * and a single exact test at a seed point of the region decides it.
+ *
+ * Points in surface voxels still need an exact test, which is left to the
+ * caller, as are the tests of the region seeds:
+ *
+ *   grid.Build(surface, tol);
+ *   for (size_t k = 0; k < grid.GetNumberOfRegions(); k++) {
+ *     grid.GetRegionSeed(k, x);
+ *     grid.SetRegionInside(k, exact_test(x));
+ *   }
+ *   ... grid.Classify(y) ...
+ */
+class SurfaceOccupancyGrid
+{
+public:
+  enum Classification { OUTSIDE = 0, INSIDE, NEAR_SURFACE };
+
+  SurfaceOccupancyGrid();
+
+  /**
+   * Rasterise the surface. The voxel size is a multiple of the mean edge
+   * length of the surface, limited so that the grid has at most nMaxVoxels
+   * voxels. The triangles are padded by tol times the diagonal of the
+   * bounding box of the surface, the same tolerance as used by the exact test.
+   */
+  void Build(vtkPolyData *surface, double tol, size_t nMaxVoxels = (1 << 24));
+
+  /** Number of connected regions of voxels that do not touch the surface */
+  size_t GetNumberOfRegions() const { return m_RegionInside.size(); }
+
+  /** Get a point of a region that is at least half a voxel from the surface */
+  void GetRegionSeed(size_t iRegion, double x[3]) const;
+
+  /** Set whether a region is inside the surface */
+  void SetRegionInside(size_t iRegion, bool inside) { m_RegionInside[iRegion] = inside; }
+
+  /** Classify a point, NEAR_SURFACE means that an exact test is needed */
+  Classification Classify(const double x[3]) const;
+
+  /** Grid dimensions, voxel size and number of surface voxels */
+  const int *GetDimensions() const { return m_Dims; }
+  double GetVoxelSize() const { return m_Spacing; }
+  size_t GetNumberOfSurfaceVoxels() const { return m_NumberOfSurfaceVoxels; }
+
+private:
+  // Label of the surface voxels, other voxels hold the index of their region
+  static const int SURFACE = -1;
+
+  double m_Origin[3], m_Spacing;
+  int m_Dims[3];
+  size_t m_NumberOfSurfaceVoxels;
+  std::vector<int> m_Label;
+  std::vector<size_t> m_RegionSeed;
+  std::vector<char> m_RegionInside;
+
+  size_t VoxelIndex(int i, int j, int k) const
+    { return (static_cast<size_t>(k) * m_Dims[1] + j) * m_Dims[0] + i; }
+};
+
+#endif
@@ -0,0 +1,197 @@
+#include "BatchRunner.h"
+#include "TestingMacros.h"
+
+#include <vtksys/SystemTools.hxx>
+
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <iostream>
+#include <sstream>
+#include <string>
+#include <vector>
+
+/**
+ * Tests of BatchRunner. The test executable also stands in for the tool:
+ * when it is given a return parameter file, it behaves as the tool would on
+ * a subject, according to the first word of the input file: "ok" writes the
+ * command line to the output and succeeds, "fail" prints an error and
+ * returns 1, and "crash" aborts.
+ */
+
+namespace {
+
+int RunAsTool(int argc, char *argv[])
+{
+  std::string parameterFile = argv[2];
+  std::string input = argv[argc - 2], output = argv[argc - 1];
+
+  std::string behavior;
+  std::ifstream(input.c_str()) >> behavior;
+  if (behavior == "fail") {
+    std::cerr << "Reading the mesh" << std::endl << "Error: the mesh has no triangles" << std::endl;
+    return EXIT_FAILURE;
+  }
+  if (behavior == "crash")
+    abort();
+
+  std::ofstream fout(output.c_str());
+  for (int i = 3; i < argc - 2; i++)
+    fout << argv[i] << std::endl;
+  std::ofstream(parameterFile.c_str()) << "peakMemory = 12.5" << std::endl;
+  return EXIT_SUCCESS;
+}
+
+void WriteFile(const std::string &filename, const std::string &content)
+{
+  std::ofstream(filename.c_str()) << content;
+}
+
+std::string ReadFile(const std::string &filename)
+{
+  std::ifstream fin(filename.c_str());
+  std::ostringstream oss;
+  oss << fin.rdbuf();
+  return oss.str();
+}
+
+void TestReadManifest(const std::string &dir)
+{
+  std::string manifest = dir + "/manifest.csv";
+  WriteFile(manifest,
+            "# Cohort of the test\n"
+            "input, output, xPrune, qhullTextFile, \"nBins\"\n"
+            "\n"
+            "a.vtk, out/a.vtk, 1.5, true, \n"
+            "\"b, \"\"2\"\".vtk\", /tmp/b.vtk, , false, 10\r\n");
+
+  BatchRunner batch("tool");
+  CHECK(batch.ReadManifest(manifest));
+  const std::vector<BatchRunner::Job> &jobs = batch.GetJobs();
+  CHECK(jobs.size() == 2);
+  CHECK(batch.GetResults().size() == 2);
+  if (jobs.size() != 2)
+    return;
+
+  // Paths are relative to the manifest, and empty cells are left out
+  std::string fullDir = vtksys::SystemTools::CollapseFullPath(dir);
+  CHECK(jobs[0].Input == fullDir + "/a.vtk");
+  CHECK(jobs[0].Output == fullDir + "/out/a.vtk");
+  CHECK(jobs[0].Parameters.size() == 2);
+  CHECK(jobs[0].Parameters[0] == std::make_pair(std::string("xPrune"), std::string("1.5")));
+  CHECK(jobs[0].Parameters[1] == std::make_pair(std::string("qhullTextFile"), std::string("true")));
+
+  // Quoted fields keep their commas and doubled quotes
+  CHECK(jobs[1].Input == fullDir + "/b, \"2\".vtk");
+  CHECK(jobs[1].Output == "/tmp/b.vtk");
+  CHECK(jobs[1].Parameters.size() == 2);
+  CHECK(jobs[1].Parameters[1] == std::make_pair(std::string("nBins"), std::string("10")));
+  CHECK(batch.GetResults()[1].Status == BatchRunner::JOB_PENDING);
+}
+
+void TestInvalidManifest(const std::string &dir)
+{
+  BatchRunner batch("tool");
+  CHECK(!batch.ReadManifest(dir + "/missing.csv"));
+  CHECK(batch.GetErrorMessage().find("missing.csv") != std::string::npos);
+
+  std::string manifest = dir + "/no_output.csv";
+  WriteFile(manifest, "input,xPrune\na.vtk,1.5\n");
+  CHECK(!batch.ReadManifest(manifest));
+  CHECK(batch.GetErrorMessage().find("no input or output column") != std::string::npos);
+
+  manifest = dir + "/short_row.csv";
+  WriteFile(manifest, "input,output,xPrune\na.vtk,a_out.vtk,1.5\n\nb.vtk,b_out.vtk\n");
+  CHECK(!batch.ReadManifest(manifest));
+  CHECK(batch.GetErrorMessage().find("Line 4") != std::string::npos);
+}
+
+bool StopAfterFirst(size_t nDone, size_t, void *)
+{
+  return nDone < 1;
+}
+
+void TestRun(const std::string &executable, const std::string &dir)
+{
+  WriteFile(dir + "/ok.txt", "ok");
+  WriteFile(dir + "/fail.txt", "fail");
+  WriteFile(dir + "/crash.txt", "crash");
+  std::string manifest = dir + "/run.csv";
+  WriteFile(manifest,
+            "input,output,xPrune,qhullTextFile\n"
+            "ok.txt,ok_out.txt,,\n"
+            "fail.txt,fail_out.txt,,\n"
+            "crash.txt,crash_out.txt,,\n"
+            "ok.txt,ok_override_out.txt,2.5,false\n");
+
+  BatchRunner batch(executable);
+  BatchRunner::ParameterList common;
+  common.push_back(std::make_pair(std::string("xPrune"), std::string("1.2")));
+  common.push_back(std::make_pair(std::string("qhullTextFile"), std::string("true")));
+  batch.SetCommonParameters(common);
+  CHECK(batch.ReadManifest(manifest));
+  batch.Run(2);
+
+  // A subject that fails or crashes does not stop the others
+  const std::vector<BatchRunner::Result> &results = batch.GetResults();
+  CHECK(results.size() == 4);
+  if (results.size() != 4)
+    return;
+  CHECK(results[0].Status == BatchRunner::JOB_SUCCEEDED);
+  CHECK(results[0].ExitCode == 0);
+  CHECK(results[0].PeakMemory == 12.5);
+  CHECK(results[1].Status == BatchRunner::JOB_FAILED);
+  CHECK(results[1].ExitCode == EXIT_FAILURE);
+  CHECK(results[1].Message == "Error: the mesh has no triangles");
+  CHECK(results[2].Status == BatchRunner::JOB_CRASHED);
+  CHECK(results[3].Status == BatchRunner::JOB_SUCCEEDED);
+  CHECK(batch.GetNumberOfSucceededJobs() == 2);
+
+  // The parameters of the manifest replace the common ones, and false drops
+  // a flag
+  CHECK(ReadFile(dir + "/ok_out.txt") == "--xPrune\n1.2\n--qhullTextFile\n");
+  CHECK(ReadFile(dir + "/ok_override_out.txt") == "--xPrune\n2.5\n");
+  CHECK(!vtksys::SystemTools::FileExists(dir + "/ok_out.txt.batch.txt"));
+
+  std::ostringstream summary;
+  batch.PrintSummary(summary);
+  CHECK(summary.str().find("Error: the mesh has no triangles") != std::string::npos);
+  CHECK(summary.str().find("2 of 4 subjects succeeded") != std::string::npos);
+
+  std::string summaryFile = dir + "/summary.csv";
+  CHECK(batch.WriteSummary(summaryFile));
+  std::string csv = ReadFile(summaryFile);
+  CHECK(csv.find("input,output,status,exitCode,time,peakMemory,message\n") == 0);
+  CHECK(csv.find(",failed,1,") != std::string::npos);
+  CHECK(csv.find(",crashed,") != std::string::npos);
+
+  // Cancelling skips the subjects not started yet
+  batch.Run(1, StopAfterFirst);
+  CHECK(results[0].Status == BatchRunner::JOB_SUCCEEDED);
+  CHECK(results[1].Status == BatchRunner::JOB_CANCELLED);
+  CHECK(results[2].Status == BatchRunner::JOB_CANCELLED);
+  CHECK(results[3].Status == BatchRunner::JOB_CANCELLED);
+}
+
+} // end of anonymous namespace
+
+int main(int argc, char *argv[])
+{
+  if (argc > 4 && strcmp(argv[1], "--returnparameterfile") == 0)
+    return RunAsTool(argc, argv);
+
+  if (argc < 2) {
+    std::cerr << "Usage: " << argv[0] << " <temporary directory>" << std::endl;
+    return EXIT_FAILURE;
+  }
+  std::string dir = std::string(argv[1]) + "/BatchRunnerTest";
+  vtksys::SystemTools::RemoveADirectory(dir);
+  vtksys::SystemTools::MakeDirectory(dir);
+
+  std::string executable = vtksys::SystemTools::CollapseFullPath(argv[0]);
+  TestReadManifest(dir);
+  TestInvalidManifest(dir);
+  TestRun(executable, dir);
+
+  return TestResult();
+}
@@ -0,0 +1,96 @@
+#include "BreadthFirstSearch.h"
+#include "VTKMeshHalfEdgeWrapper.h"
+#include "TestingMacros.h"
+
+#include <vtkNew.h>
+#include <vtkPolyData.h>
+#include <vtkSphereSource.h>
+#include <vtkTransform.h>
+#include <vtkTransformPolyDataFilter.h>
+
+#include <cstdlib>
+#include <iostream>
+#include <random>
+#include <vector>
+
+/**
+ * Test of the depth-limited breadth first search of the edge criterion
+ * against full breadth first searches on the surface of an ellipsoid. One
+ * search instance answers a series of queries, so that the stamps of earlier
+ * queries must not leak into later ones: each query must give the depths of
+ * the full search up to its limit, and no other vertex.
+ */
+
+namespace {
+
+// Number of edges from a vertex to every other one
+std::vector<unsigned int> GetFullDepths(const VTKMeshHalfEdgeWrapper &graph, unsigned int source)
+{
+  std::vector<unsigned int> depth(graph.GetNumberOfVertices(), DepthLimitedBreadthFirstSearch::NO_PATH);
+  std::vector<unsigned int> queue(1, source);
+  depth[source] = 0;
+  for (size_t q = 0; q < queue.size(); q++) {
+    unsigned int v = queue[q];
+    for (unsigned int k = graph.GetAdjacencyIndex()[v]; k < graph.GetAdjacencyIndex()[v + 1]; k++) {
+      unsigned int w = graph.GetAdjacency()[k];
+      if (depth[w] == DepthLimitedBreadthFirstSearch::NO_PATH) {
+        depth[w] = depth[v] + 1;
+        queue.push_back(w);
+      }
+    }
+  }
+  return depth;
+}
+
+void TestRings(vtkPolyData *surface)
+{
+  VTKMeshHalfEdgeWrapper graph(surface);
+  unsigned int nv = graph.GetNumberOfVertices();
+  DepthLimitedBreadthFirstSearch search(nv, graph.GetAdjacencyIndex(), graph.GetAdjacency());
+
+  std::mt19937 random(1);
+  std::uniform_int_distribution<unsigned int> vertex(0, nv - 1);
+  size_t nDifferent = 0, nUnordered = 0, nMaxRing = 0;
+  for (int q = 0; q < 300; q++) {
+    unsigned int source = vertex(random), nMaxDepth = q % 7;
+    search.ComputeRing(source, nMaxDepth);
+    std::vector<unsigned int> expected = GetFullDepths(graph, source);
+
+    size_t nInRing = 0;
+    for (unsigned int v = 0; v < nv; v++) {
+      bool isInRing = expected[v] <= nMaxDepth;
+      nInRing += isInRing;
+      nDifferent += search.GetDepth(v) != (isInRing ? expected[v] : DepthLimitedBreadthFirstSearch::NO_PATH);
+    }
+
+    // The ring holds its vertices once each, by increasing depth
+    const std::vector<unsigned int> &ring = search.GetRing();
+    nDifferent += ring.size() != nInRing;
+    for (size_t k = 1; k < ring.size(); k++)
+      nUnordered += expected[ring[k]] < expected[ring[k - 1]];
+    nMaxRing = std::max(nMaxRing, ring.size());
+  }
+
+  CHECK(nMaxRing > 50);
+  CHECK(nDifferent == 0);
+  CHECK(nUnordered == 0);
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  vtkNew<vtkSphereSource> sphere;
+  sphere->SetThetaResolution(40);
+  sphere->SetPhiResolution(40);
+  vtkNew<vtkTransform> transform;
+  transform->Scale(30, 20, 10);
+  vtkNew<vtkTransformPolyDataFilter> fTransform;
+  fTransform->SetInputConnection(sphere->GetOutputPort());
+  fTransform->SetTransform(transform);
+  fTransform->Update();
+
+  TestRings(fTransform->GetOutput());
+
+  return TestResult();
+}
@@ -0,0 +1,196 @@
+#include "BinaryHeap.h"
+#include "DAryHeap.h"
+#include "ShortestPath.h"
+#include "TestingMacros.h"
+
+#include <cstdlib>
+#include <iostream>
+#include <limits>
+#include <random>
+#include <vector>
+
+/**
+ * Tests of DAryHeap against BinaryHeap: the same operations on both heaps
+ * pop the same elements, and the searches of DijkstraShortestPath, which use
+ * DAryHeap, give the same distances as Dijkstra's algorithm with BinaryHeap.
+ */
+
+namespace {
+
+// Random insertions, weight decreases and pops applied to both heaps. The
+// weights are distinct, so the heaps pop the same elements. The weights are
+// only decreased, as by Dijkstra's algorithm, since BinaryHeap cannot
+// increase them
+template <unsigned int VArity>
+void TestHeapOperations(unsigned int seed)
+{
+  const unsigned int n = 1000;
+  std::mt19937 random(seed);
+  std::uniform_real_distribution<double> weight(0.0, 1000.0), unit(0.0, 1.0);
+  std::uniform_int_distribution<unsigned int> element(0, n - 1);
+  std::uniform_int_distribution<int> operation(0, 9);
+
+  std::vector<double> wBinary(n), wDAry(n);
+  BinaryHeap<double> binary(n, wBinary.data());
+  DAryHeap<double, VArity> dary(n, wDAry.data());
+  for (int step = 0; step < 20000; step++) {
+    unsigned int i = element(random);
+    int op = operation(random);
+    if (op < 4) {
+      if (!binary.ContainsElement(i)) {
+        wBinary[i] = wDAry[i] = weight(random);
+        binary.InsertElement(i);
+        dary.InsertElement(i);
+      }
+    } else if (op < 7) {
+      if (binary.ContainsElement(i)) {
+        double w = wBinary[i] * unit(random);
+        binary.DecreaseElementWeight(i, w);
+        dary.DecreaseElementWeight(i, w);
+      }
+    } else if (op < 9) {
+      if (binary.GetSize() > 0)
+        CHECK(binary.PopMinimum() == dary.PopMinimum());
+    } else if (step % 1000 == 999) {
+      binary.Clear();
+      dary.Clear();
+    }
+    CHECK(binary.GetSize() == dary.GetSize());
+    CHECK(binary.ContainsElement(i) == dary.ContainsElement(i));
+  }
+
+  // Emptying the heaps pops the elements in increasing weight
+  double wLast = -1.0;
+  while (binary.GetSize() > 0) {
+    unsigned int i = dary.PopMinimum();
+    CHECK(binary.PopMinimum() == i);
+    CHECK(wDAry[i] >= wLast);
+    wLast = wDAry[i];
+  }
+  CHECK(dary.GetSize() == 0);
+}
+
+// A grid graph with diagonals and random edge weights, in the adjacency
+// format of DijkstraShortestPath
+struct Graph
+{
+  std::vector<unsigned int> AdjacencyIndex, Adjacency;
+  std::vector<double> EdgeWeight;
+  unsigned int NumberOfVertices;
+
+  Graph(unsigned int nx, unsigned int ny, unsigned int seed)
+  {
+    std::mt19937 random(seed);
+    std::uniform_real_distribution<double> length(0.5, 1.5);
+    NumberOfVertices = nx * ny;
+    std::vector<std::vector<std::pair<unsigned int, double> > > edges(NumberOfVertices);
+    for (unsigned int y = 0; y < ny; y++) {
+      for (unsigned int x = 0; x < nx; x++) {
+        unsigned int i = y * nx + x;
+        const int dx[] = {1, 0, 1}, dy[] = {0, 1, 1};
+        for (int k = 0; k < 3; k++) {
+          if (x + dx[k] >= nx || y + dy[k] >= ny)
+            continue;
+          unsigned int j = (y + dy[k]) * nx + x + dx[k];
+          double l = length(random);
+          edges[i].push_back(std::make_pair(j, l));
+          edges[j].push_back(std::make_pair(i, l));
+        }
+      }
+    }
+    AdjacencyIndex.push_back(0);
+    for (unsigned int i = 0; i < NumberOfVertices; i++) {
+      for (size_t k = 0; k < edges[i].size(); k++) {
+        Adjacency.push_back(edges[i][k].first);
+        EdgeWeight.push_back(edges[i][k].second);
+      }
+      AdjacencyIndex.push_back(Adjacency.size());
+    }
+  }
+};
+
+// Distances from the sources by Dijkstra's algorithm with BinaryHeap, as
+// DijkstraShortestPath computed them before DAryHeap
+std::vector<double> GetReferenceDistances(const Graph &g, const std::vector<unsigned int> &sources)
+{
+  std::vector<double> distance(g.NumberOfVertices);
+  BinaryHeap<double> heap(g.NumberOfVertices, distance.data());
+  heap.InsertAllElementsWithEqualWeights(std::numeric_limits<double>::max());
+  for (size_t s = 0; s < sources.size(); s++)
+    heap.DecreaseElementWeight(sources[s], 0.0);
+  while (heap.GetSize()) {
+    unsigned int w = heap.PopMinimum();
+    for (unsigned int i = g.AdjacencyIndex[w]; i < g.AdjacencyIndex[w + 1]; i++) {
+      unsigned int iNbr = g.Adjacency[i];
+      if (heap.ContainsElement(iNbr) && distance[w] + g.EdgeWeight[i] < distance[iNbr])
+        heap.DecreaseElementWeight(iNbr, distance[w] + g.EdgeWeight[i]);
+    }
+  }
+  return distance;
+}
+
+// A heuristic of zero, for A* to search like Dijkstra's algorithm
+struct ZeroHeuristic
+{
+  double operator()(unsigned int) const { return 0.0; }
+};
+
+void TestShortestPaths()
+{
+  Graph g(40, 30, 7);
+  DijkstraShortestPath<double> dsp(g.NumberOfVertices, g.AdjacencyIndex.data(), g.Adjacency.data(),
+                                   g.EdgeWeight.data());
+  std::mt19937 random(11);
+  std::uniform_int_distribution<unsigned int> vertex(0, g.NumberOfVertices - 1);
+  for (int trial = 0; trial < 20; trial++) {
+    unsigned int iSource = vertex(random);
+    std::vector<double> expected = GetReferenceDistances(g, std::vector<unsigned int>(1, iSource));
+
+    // Full search
+    dsp.ComputePathsFromSource(iSource);
+    const double *distance = dsp.GetDistanceArray();
+    size_t nDifferent = 0;
+    for (unsigned int i = 0; i < g.NumberOfVertices; i++)
+      nDifferent += distance[i] != expected[i];
+    CHECK(nDifferent == 0);
+
+    // Search limited to a radius, the vertices beyond it being further
+    double xMaxDistance = 10.0;
+    dsp.ComputePathsFromSource(iSource, xMaxDistance);
+    nDifferent = 0;
+    for (unsigned int i = 0; i < g.NumberOfVertices; i++)
+      nDifferent += expected[i] <= xMaxDistance ? distance[i] != expected[i] : distance[i] <= xMaxDistance;
+    CHECK(nDifferent == 0);
+
+    // Search of a single target
+    unsigned int iTarget = vertex(random);
+    CHECK(dsp.ComputePathToTarget(iSource, iTarget, ZeroHeuristic()));
+    CHECK(dsp.GetDistanceArray()[iTarget] == expected[iTarget]);
+  }
+
+  // Multiple sources
+  GraphVoronoiDiagram<double> gvd(g.NumberOfVertices, g.AdjacencyIndex.data(), g.Adjacency.data(),
+                                  g.EdgeWeight.data());
+  std::vector<unsigned int> sources;
+  for (int s = 0; s < 10; s++)
+    sources.push_back(vertex(random));
+  std::vector<double> expected = GetReferenceDistances(g, sources);
+  gvd.ComputePathsFromManySources(sources.size(), sources.data());
+  size_t nDifferent = 0;
+  for (unsigned int i = 0; i < g.NumberOfVertices; i++)
+    nDifferent += gvd.GetDistanceArray()[i] != expected[i];
+  CHECK(nDifferent == 0);
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  TestHeapOperations<2>(1);
+  TestHeapOperations<3>(2);
+  TestHeapOperations<4>(3);
+  TestHeapOperations<8>(4);
+  TestShortestPaths();
+
+  return TestResult();
+}
@@ -0,0 +1,185 @@
+#include "GeneratorSampling.h"
+#include "TestingMacros.h"
+
+#include <vtkMath.h>
+#include <vtkNew.h>
+#include <vtkPolyData.h>
+#include <vtkSmartPointer.h>
+#include <vtkSphereSource.h>
+#include <vtkTransform.h>
+#include <vtkTransformPolyDataFilter.h>
+
+#include <algorithm>
+#include <cmath>
+#include <cstdlib>
+#include <iostream>
+#include <map>
+#include <tuple>
+#include <vector>
+
+/**
+ * Tests of the subsampling of the Voronoi generators on the surface of an
+ * ellipsoid. The Poisson disk samples are at least the spacing apart, and
+ * every vertex is within the spacing of a sample. The voxel grid keeps one
+ * vertex per occupied cube, the closest to the centroid of the cube. The
+ * search for a number of generators gets close to it, and its spacing gives
+ * the same samples again.
+ */
+
+namespace {
+
+vtkSmartPointer<vtkPolyData> CreateEllipsoid()
+{
+  vtkNew<vtkSphereSource> sphere;
+  sphere->SetThetaResolution(60);
+  sphere->SetPhiResolution(60);
+  vtkNew<vtkTransform> transform;
+  transform->Scale(30, 20, 10);
+  vtkNew<vtkTransformPolyDataFilter> fTransform;
+  fTransform->SetInputConnection(sphere->GetOutputPort());
+  fTransform->SetTransform(transform);
+  fTransform->Update();
+  return fTransform->GetOutput();
+}
+
+// Sorted vertex ids with no duplicates
+bool IsSortedSample(vtkPolyData *surface, const std::vector<vtkIdType> &ids)
+{
+  for (size_t k = 0; k < ids.size(); k++)
+    if (ids[k] < 0 || ids[k] >= surface->GetNumberOfPoints() || (k > 0 && ids[k] <= ids[k - 1]))
+      return false;
+  return true;
+}
+
+double GetDistance(vtkPolyData *surface, vtkIdType i, vtkIdType j)
+{
+  double x[3], y[3];
+  surface->GetPoint(i, x);
+  surface->GetPoint(j, y);
+  return sqrt(vtkMath::Distance2BetweenPoints(x, y));
+}
+
+void TestMethodNames()
+{
+  CHECK(GetGeneratorSamplingMethod("None") == SAMPLING_NONE);
+  CHECK(GetGeneratorSamplingMethod("VoxelGrid") == SAMPLING_VOXEL_GRID);
+  CHECK(GetGeneratorSamplingMethod("PoissonDisk") == SAMPLING_POISSON_DISK);
+  CHECK(GetGeneratorSamplingMethod("") == SAMPLING_NONE);
+}
+
+void TestNone(vtkPolyData *surface)
+{
+  std::vector<vtkIdType> ids;
+  SampleGenerators(surface, SAMPLING_NONE, 2.0, ids);
+  CHECK(ids.size() == static_cast<size_t>(surface->GetNumberOfPoints()));
+  CHECK(IsSortedSample(surface, ids));
+
+  // A spacing of zero keeps all the vertices too
+  SampleGenerators(surface, SAMPLING_POISSON_DISK, 0.0, ids);
+  CHECK(ids.size() == static_cast<size_t>(surface->GetNumberOfPoints()));
+}
+
+void TestPoissonDisk(vtkPolyData *surface, double spacing)
+{
+  std::vector<vtkIdType> ids, again;
+  SampleGenerators(surface, SAMPLING_POISSON_DISK, spacing, ids);
+  CHECK(IsSortedSample(surface, ids));
+  CHECK(ids.size() > 10);
+  CHECK(ids.size() < static_cast<size_t>(surface->GetNumberOfPoints()) / 2);
+
+  size_t nClose = 0, nUncovered = 0;
+  for (size_t a = 0; a < ids.size(); a++)
+    for (size_t b = a + 1; b < ids.size(); b++)
+      nClose += GetDistance(surface, ids[a], ids[b]) < spacing;
+  for (vtkIdType i = 0; i < surface->GetNumberOfPoints(); i++) {
+    bool isCovered = false;
+    for (size_t a = 0; a < ids.size() && !isCovered; a++)
+      isCovered = GetDistance(surface, i, ids[a]) < spacing;
+    nUncovered += !isCovered;
+  }
+  CHECK(nClose == 0);
+  CHECK(nUncovered == 0);
+
+  // The samples do not change from run to run
+  SampleGenerators(surface, SAMPLING_POISSON_DISK, spacing, again);
+  CHECK(again == ids);
+}
+
+void TestVoxelGrid(vtkPolyData *surface, double spacing)
+{
+  std::vector<vtkIdType> ids;
+  SampleGenerators(surface, SAMPLING_VOXEL_GRID, spacing, ids);
+  CHECK(IsSortedSample(surface, ids));
+
+  // The vertices of each cube of the grid, which starts at the corner of the
+  // bounding box
+  double bounds[6];
+  surface->GetBounds(bounds);
+  typedef std::tuple<long, long, long> Cube;
+  std::map<Cube, std::vector<vtkIdType> > cubes;
+  std::vector<Cube> vertexCube(surface->GetNumberOfPoints());
+  for (vtkIdType i = 0; i < surface->GetNumberOfPoints(); i++) {
+    double x[3];
+    surface->GetPoint(i, x);
+    vertexCube[i] = Cube(static_cast<long>(floor((x[0] - bounds[0]) / spacing)),
+                         static_cast<long>(floor((x[1] - bounds[2]) / spacing)),
+                         static_cast<long>(floor((x[2] - bounds[4]) / spacing)));
+    cubes[vertexCube[i]].push_back(i);
+  }
+  CHECK(ids.size() == cubes.size());
+
+  // Each sample is in its own cube and is the closest vertex to its centroid
+  std::map<Cube, int> nSamples;
+  size_t nNotClosest = 0;
+  for (size_t k = 0; k < ids.size(); k++) {
+    const std::vector<vtkIdType> &members = cubes[vertexCube[ids[k]]];
+    nSamples[vertexCube[ids[k]]]++;
+    double centroid[3] = { 0.0, 0.0, 0.0 }, x[3];
+    for (size_t m = 0; m < members.size(); m++) {
+      surface->GetPoint(members[m], x);
+      for (int d = 0; d < 3; d++)
+        centroid[d] += x[d] / members.size();
+    }
+    surface->GetPoint(ids[k], x);
+    double dSample = vtkMath::Distance2BetweenPoints(x, centroid);
+    for (size_t m = 0; m < members.size(); m++) {
+      surface->GetPoint(members[m], x);
+      nNotClosest += vtkMath::Distance2BetweenPoints(x, centroid) < dSample * (1 - 1e-9);
+    }
+  }
+  CHECK(nSamples.size() == ids.size());
+  CHECK(nNotClosest == 0);
+}
+
+void TestCount(vtkPolyData *surface, GeneratorSamplingMethod method, size_t nTarget)
+{
+  std::vector<vtkIdType> ids, again;
+  double spacing = SampleGeneratorCount(surface, method, nTarget, ids);
+  CHECK(spacing > 0.0);
+  CHECK(IsSortedSample(surface, ids));
+  CHECK(ids.size() >= nTarget * 0.95 && ids.size() <= nTarget * 1.05);
+
+  SampleGenerators(surface, method, spacing, again);
+  CHECK(again == ids);
+
+  // More generators than vertices keeps them all
+  double none = SampleGeneratorCount(surface, method, surface->GetNumberOfPoints() + 1, ids);
+  CHECK(none == 0.0);
+  CHECK(ids.size() == static_cast<size_t>(surface->GetNumberOfPoints()));
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  vtkSmartPointer<vtkPolyData> surface = CreateEllipsoid();
+
+  TestMethodNames();
+  TestNone(surface);
+  TestPoissonDisk(surface, 4.0);
+  TestVoxelGrid(surface, 4.0);
+  TestCount(surface, SAMPLING_POISSON_DISK, 500);
+  TestCount(surface, SAMPLING_VOXEL_GRID, 500);
+
+  return TestResult();
+}
@@ -0,0 +1,117 @@
+#include "VTKMeshHalfEdgeWrapper.h"
+#include "VTKMeshShortestDistance.h"
+#include "TestingMacros.h"
+
+#include <vtkNew.h>
+#include <vtkPolyData.h>
+#include <vtkSphereSource.h>
+#include <vtkTransform.h>
+#include <vtkTransformPolyDataFilter.h>
+
+#include <algorithm>
+#include <cmath>
+#include <cstdlib>
+#include <iostream>
+#include <random>
+#include <vector>
+
+/**
+ * Tests of the geodesic searches of the pruning that stop early, against
+ * full Dijkstra searches on the surface of an ellipsoid: the search guided
+ * towards a single target (A*) and the search that stops once all its
+ * targets are reached give the distances of the full search to the targets
+ * within the search radius, and no shorter ones beyond it.
+ */
+
+namespace {
+
+typedef DijkstraShortestPath<float> ShortestPath;
+
+// Distances of a search that stopped early are the full ones up to the
+// rounding of paths of the same length through other edges
+bool IsSameDistance(double actual, double expected)
+{
+  return std::abs(actual - expected) <= 1e-5 * expected;
+}
+
+void TestSearches(vtkPolyData *surface)
+{
+  VTKMeshHalfEdgeWrapper graph(surface);
+  VTKMeshShortestDistance distance;
+  distance.SetInputMesh(&graph);
+  distance.ComputeGraph();
+
+  unsigned int nv = graph.GetNumberOfVertices();
+  ShortestPath full(nv, graph.GetAdjacencyIndex(), graph.GetAdjacency(), distance.GetEdgeWeights());
+  ShortestPath search(nv, graph.GetAdjacencyIndex(), graph.GetAdjacency(), distance.GetEdgeWeights());
+
+  std::mt19937 random(1);
+  std::uniform_int_distribution<unsigned int> vertex(0, nv - 1);
+  size_t nWithin = 0, nBeyond = 0, nDifferent = 0;
+  for (int q = 0; q < 200; q++) {
+    unsigned int source = vertex(random);
+    std::vector<unsigned int> targets(1 + q % 5);
+    for (size_t k = 0; k < targets.size(); k++)
+      targets[k] = vertex(random);
+
+    // The search radius of the pruning, the Euclidean distance to the
+    // furthest target times xPrune, or no radius at all
+    double xMaxDistance = ShortestPath::INFINITE_WEIGHT;
+    if (q % 2 == 0) {
+      double xMaxEuclidean = 0.0;
+      for (size_t k = 0; k < targets.size(); k++)
+        xMaxEuclidean = std::max(xMaxEuclidean, EuclideanDistanceHeuristic(surface, targets[k])(source) / 0.999);
+      xMaxDistance = xMaxEuclidean * 1.2 + 1;
+    }
+
+    full.ComputePathsFromSource(source);
+    std::vector<float> expected(full.GetDistanceArray(), full.GetDistanceArray() + nv);
+
+    // Several targets, in one search
+    search.ComputePathsFromSource(source, xMaxDistance, targets.size(), targets.data());
+    for (size_t k = 0; k < targets.size(); k++) {
+      double actual = search.GetDistanceArray()[targets[k]], d = expected[targets[k]];
+      if (d <= xMaxDistance) {
+        nWithin++;
+        nDifferent += actual != d;
+      } else {
+        nBeyond++;
+        nDifferent += actual < d;
+      }
+    }
+
+    // Each target on its own, guided towards it
+    for (size_t k = 0; k < targets.size(); k++) {
+      bool isReached = search.ComputePathToTarget(
+          source, targets[k], EuclideanDistanceHeuristic(surface, targets[k]), xMaxDistance);
+      double actual = search.GetDistanceArray()[targets[k]], d = expected[targets[k]];
+      if (d <= xMaxDistance)
+        nDifferent += !isReached || !IsSameDistance(actual, d);
+      else
+        nDifferent += actual < d && !IsSameDistance(actual, d);
+    }
+  }
+
+  CHECK(nWithin > 100);
+  CHECK(nBeyond > 10);
+  CHECK(nDifferent == 0);
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  vtkNew<vtkSphereSource> sphere;
+  sphere->SetThetaResolution(40);
+  sphere->SetPhiResolution(40);
+  vtkNew<vtkTransform> transform;
+  transform->Scale(30, 20, 10);
+  vtkNew<vtkTransformPolyDataFilter> fTransform;
+  fTransform->SetInputConnection(sphere->GetOutputPort());
+  fTransform->SetTransform(transform);
+  fTransform->Update();
+
+  TestSearches(fTransform->GetOutput());
+
+  return TestResult();
+}
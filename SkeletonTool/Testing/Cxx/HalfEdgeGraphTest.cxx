@@ -0,0 +1,172 @@
+#include "VTKMeshHalfEdgeWrapper.h"
+#include "VTKMeshShortestDistance.h"
+#include "TestingMacros.h"
+
+#include <vtkIdList.h>
+#include <vtkNew.h>
+#include <vtkPolyData.h>
+#include <vtkSmartPointer.h>
+#include <vtkSphereSource.h>
+#include <vtkTransform.h>
+#include <vtkTransformPolyDataFilter.h>
+
+#include <cstdlib>
+#include <iostream>
+#include <list>
+#include <vector>
+
+/**
+ * Tests of the members of the boundary graph that are built on demand. The
+ * half-edge wrapper builds the adjacency of the graph, and the faces, next
+ * and opposite half-edges only on request, once. The shortest distance
+ * object creates its search on the first query and its locators on the
+ * first lookup, and rebuilds them for a new mesh: its distances are those of
+ * a fresh search over its edge weights, and the closest vertex to each vertex
+ * is that vertex.
+ */
+
+namespace {
+
+typedef DijkstraShortestPath<float> ShortestPath;
+
+// Exposes whether the topology of the faces has been built
+class InspectedHalfEdgeWrapper : public VTKMeshHalfEdgeWrapper
+{
+public:
+  InspectedHalfEdgeWrapper(vtkPolyData *mesh) : VTKMeshHalfEdgeWrapper(mesh) {}
+
+  const unsigned int *GetFaceArray() const { return xFace; }
+};
+
+vtkSmartPointer<vtkPolyData> CreateEllipsoid(int resolution, double offset)
+{
+  vtkNew<vtkSphereSource> sphere;
+  sphere->SetThetaResolution(resolution);
+  sphere->SetPhiResolution(resolution);
+  vtkNew<vtkTransform> transform;
+  transform->Translate(offset, 0, 0);
+  transform->Scale(30, 20, 10);
+  vtkNew<vtkTransformPolyDataFilter> fTransform;
+  fTransform->SetInputConnection(sphere->GetOutputPort());
+  fTransform->SetTransform(transform);
+  fTransform->Update();
+  return fTransform->GetOutput();
+}
+
+void TestTopology(vtkPolyData *surface)
+{
+  InspectedHalfEdgeWrapper graph(surface);
+  CHECK(graph.GetFaceArray() == NULL);
+
+  // The adjacency holds each edge of each cell once, from its tail
+  size_t nMissing = 0;
+  for (vtkIdType iCell = 0; iCell < surface->GetNumberOfCells(); iCell++) {
+    vtkNew<vtkIdList> points;
+    surface->GetCellPoints(iCell, points);
+    for (vtkIdType j = 0; j < points->GetNumberOfIds(); j++) {
+      unsigned int iEdge, iTail = points->GetId(j), iHead = points->GetId((j + 1) % points->GetNumberOfIds());
+      nMissing += !graph.GetHalfEdgeBetweenVertices(iTail, iHead, iEdge);
+    }
+  }
+  CHECK(nMissing == 0);
+  CHECK(graph.GetNumberOfHalfEdges() == 3 * surface->GetNumberOfCells());
+
+  graph.BuildTopology();
+  const unsigned int *xFace = graph.GetFaceArray();
+  CHECK(xFace != NULL);
+
+  size_t nInconsistent = 0;
+  for (unsigned int iTail = 0; iTail < graph.GetNumberOfVertices(); iTail++) {
+    for (unsigned int k = 0; k < graph.GetVertexNumberOfEdges(iTail); k++) {
+      unsigned int iEdge = graph.GetVertexHalfEdge(iTail, k);
+      unsigned int iFlip = graph.GetHalfEdgeOpposite(iEdge), iNext = graph.GetHalfEdgeNext(iEdge);
+      nInconsistent += graph.GetHalfEdgeOpposite(iFlip) != iEdge;
+      nInconsistent += graph.GetHalfEdgeTailVertex(iEdge) != iTail;
+      nInconsistent += graph.GetHalfEdgeVertex(iFlip) != iTail;
+      nInconsistent += graph.GetHalfEdgeTailVertex(iNext) != graph.GetHalfEdgeVertex(iEdge);
+      nInconsistent += graph.GetHalfEdgeFace(iNext) != graph.GetHalfEdgeFace(iEdge);
+      nInconsistent += graph.GetHalfEdgeNext(graph.GetHalfEdgeNext(iNext)) != iEdge;
+      nInconsistent += graph.GetHalfEdgeFace(iFlip) == graph.GetHalfEdgeFace(iEdge);
+    }
+  }
+  for (vtkIdType iFace = 0; iFace < surface->GetNumberOfCells(); iFace++)
+    nInconsistent += graph.GetHalfEdgeFace(graph.GetFaceHalfEdge(iFace)) != iFace;
+  CHECK(nInconsistent == 0);
+
+  // The topology is built once
+  graph.BuildTopology();
+  CHECK(graph.GetFaceArray() == xFace);
+}
+
+// Whether the distances of the last query are those of a fresh search
+bool IsSameAsFreshSearch(const VTKMeshShortestDistance &distance, const VTKMeshHalfEdgeWrapper &graph,
+                         unsigned int source)
+{
+  ShortestPath fresh(graph.GetNumberOfVertices(), graph.GetAdjacencyIndex(), graph.GetAdjacency(),
+                     distance.GetEdgeWeights());
+  fresh.ComputePathsFromSource(source);
+  for (unsigned int v = 0; v < graph.GetNumberOfVertices(); v++)
+    if (distance.GetVertexDistance(v) != fresh.GetDistanceArray()[v]
+        || distance.GetVertexPredecessor(v) != static_cast<vtkIdType>(fresh.GetPredecessorArray()[v]))
+      return false;
+  return true;
+}
+
+// Whether the closest vertex to each vertex is that vertex
+bool IsEachVertexClosest(VTKMeshShortestDistance &distance, vtkPolyData *surface)
+{
+  for (vtkIdType i = 0; i < surface->GetNumberOfPoints(); i++)
+    if (distance.FindClosestVertexInSpace(VTKMeshShortestDistance::Vec(surface->GetPoint(i))) != i)
+      return false;
+  return true;
+}
+
+void TestShortestDistance(vtkPolyData *surface, vtkPolyData *other)
+{
+  VTKMeshHalfEdgeWrapper graph(surface), otherGraph(other);
+  VTKMeshShortestDistance distance;
+  distance.SetInputMesh(&graph);
+  distance.ComputeGraph();
+
+  // Before the first query, no vertex is reached
+  size_t nReached = 0;
+  for (unsigned int v = 0; v < graph.GetNumberOfVertices(); v++)
+    nReached += distance.IsVertexConnected(v) || distance.GetVertexDistance(v) != ShortestPath::INFINITE_WEIGHT;
+  CHECK(nReached == 0);
+
+  distance.ComputeDistances(7);
+  CHECK(IsSameAsFreshSearch(distance, graph, 7));
+  distance.ComputeDistances(graph.GetNumberOfVertices() - 1);
+  CHECK(IsSameAsFreshSearch(distance, graph, graph.GetNumberOfVertices() - 1));
+  CHECK(IsEachVertexClosest(distance, surface));
+
+  // A new mesh replaces the search and the locators of the previous one
+  distance.SetInputMesh(&otherGraph);
+  distance.ComputeGraph();
+  CHECK(IsEachVertexClosest(distance, other));
+  distance.ComputeDistances(3);
+  CHECK(IsSameAsFreshSearch(distance, otherGraph, 3));
+
+  // A search from many sources reaches every vertex
+  std::list<vtkIdType> sources;
+  sources.push_back(0);
+  sources.push_back(otherGraph.GetNumberOfVertices() - 1);
+  distance.ComputeDistances(sources);
+  nReached = 0;
+  for (unsigned int v = 0; v < otherGraph.GetNumberOfVertices(); v++)
+    nReached += distance.IsVertexConnected(v);
+  CHECK(nReached == otherGraph.GetNumberOfVertices());
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  vtkSmartPointer<vtkPolyData> surface = CreateEllipsoid(40, 0.0);
+  vtkSmartPointer<vtkPolyData> other = CreateEllipsoid(24, 100.0);
+
+  TestTopology(surface);
+  TestShortestDistance(surface, other);
+
+  return TestResult();
+}
@@ -0,0 +1,150 @@
+#include "ProgressReporter.h"
+#include "TestingMacros.h"
+
+#include "ModuleProcessInformation.h"
+
+#include <cmath>
+#include <cstdlib>
+#include <cstring>
+#include <iostream>
+#include <sstream>
+#include <string>
+#include <vector>
+
+/**
+ * Tests of ProgressReporter. In-process, each stage maps its own progress
+ * into its range of the overall progress, sets the message of the process
+ * information and calls its callback, and a run that the user aborted is
+ * cancelled. As an executable, the stages are reported through the
+ * <filter-*> tags on stdout.
+ */
+
+namespace {
+
+// Overall progress at each call of the callback
+struct Recorder
+{
+  ModuleProcessInformation *Info;
+  std::vector<float> Progress;
+};
+
+void RecordInfo(void *clientData)
+{
+  Recorder *recorder = static_cast<Recorder *>(clientData);
+  recorder->Progress.push_back(recorder->Info->Progress);
+}
+
+bool IsClose(double a, double b)
+{
+  return fabs(a - b) < 1e-6;
+}
+
+void TestInProcess()
+{
+  ModuleProcessInformation info;
+  info.Initialize();
+  Recorder recorder;
+  recorder.Info = &info;
+  info.ProgressCallbackFunction = RecordInfo;
+  info.ProgressCallbackClientData = &recorder;
+
+  ProgressReporter progress(&info);
+  progress.StartStage("qhull", "Computing the Voronoi diagram", 0.2, 0.6);
+  CHECK(strcmp(info.ProgressMessage, "Computing the Voronoi diagram") == 0);
+  CHECK(IsClose(info.Progress, 0.2));
+  CHECK(IsClose(info.StageProgress, 0.0));
+
+  CHECK(progress.Update(0.5));
+  CHECK(IsClose(info.Progress, 0.4));
+  CHECK(IsClose(info.StageProgress, 0.5));
+
+  // Small steps are not reported
+  size_t nCalls = recorder.Progress.size();
+  progress.Update(0.501);
+  CHECK(recorder.Progress.size() == nCalls);
+  CHECK(IsClose(info.Progress, 0.4));
+
+  // Starting a stage completes the current one
+  std::string comment(2000, 'x');
+  progress.StartStage("pruning", comment, 0.6, 1.0);
+  CHECK(recorder.Progress.size() == nCalls + 1);
+  CHECK(IsClose(recorder.Progress.back(), 0.6));
+  CHECK(strlen(info.ProgressMessage) == sizeof(info.ProgressMessage) - 1);
+
+  progress.Update(0.25);
+  CHECK(IsClose(info.Progress, 0.7));
+  progress.EndStage();
+  CHECK(IsClose(info.Progress, 1.0));
+  CHECK(IsClose(info.StageProgress, 1.0));
+
+  // The overall progress never goes back
+  size_t nBack = 0;
+  for (size_t k = 1; k < recorder.Progress.size(); k++)
+    nBack += recorder.Progress[k] < recorder.Progress[k - 1];
+  CHECK(nBack == 0);
+
+  // Ending with no current stage does nothing
+  nCalls = recorder.Progress.size();
+  progress.EndStage();
+  CHECK(recorder.Progress.size() == nCalls);
+}
+
+void TestCancel()
+{
+  ModuleProcessInformation info;
+  info.Initialize();
+  Recorder recorder;
+  recorder.Info = &info;
+  info.ProgressCallbackFunction = RecordInfo;
+  info.ProgressCallbackClientData = &recorder;
+
+  ProgressReporter progress(&info);
+  progress.StartStage("voxel", "Classifying the voxels", 0.0, 1.0);
+  CHECK(!progress.IsCancelled());
+  CHECK(progress.Update(0.1));
+  CHECK(!recorder.Progress.empty());
+
+  info.Abort = 1;
+  CHECK(progress.IsCancelled());
+  CHECK(!progress.Update(0.2));
+  CHECK(!progress.Update(0.2001));
+
+  // With no process information, the run cannot be cancelled
+  ProgressReporter standalone(NULL);
+  CHECK(!standalone.IsCancelled());
+}
+
+void TestExecutable()
+{
+  std::ostringstream out;
+  std::streambuf *stdoutBuffer = std::cout.rdbuf(out.rdbuf());
+  ProgressReporter progress(NULL);
+  progress.StartStage("qhull", "Computing the Voronoi diagram", 0.0, 0.5);
+  progress.Update(0.5);
+  progress.EndStage();
+  progress.EndStage();
+  std::cout.rdbuf(stdoutBuffer);
+
+  std::string text = out.str();
+  size_t iStart = text.find("<filter-start><filter-name>qhull</filter-name>"
+                            "<filter-comment>Computing the Voronoi diagram</filter-comment></filter-start>");
+  size_t iMiddle = text.find("<filter-progress>0.25</filter-progress>");
+  size_t iLast = text.find("<filter-progress>0.5</filter-progress>");
+  size_t iEnd = text.find("<filter-end><filter-name>qhull</filter-name><filter-time>");
+  CHECK(iStart != std::string::npos);
+  CHECK(iMiddle != std::string::npos && iMiddle > iStart);
+  CHECK(iLast != std::string::npos && iLast > iMiddle);
+  CHECK(iEnd != std::string::npos && iEnd > iLast);
+  CHECK(text.find("<filter-end>", iEnd + 1) == std::string::npos);
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  TestInProcess();
+  TestCancel();
+  TestExecutable();
+
+  return TestResult();
+}
@@ -0,0 +1,143 @@
+#include "QhullVoronoi.h"
+#include "TestingMacros.h"
+
+#include <algorithm>
+#include <array>
+#include <cmath>
+#include <cstdlib>
+#include <iostream>
+#include <limits>
+#include <map>
+#include <random>
+#include <utility>
+#include <vector>
+
+/**
+ * Tests of the Voronoi diagrams computed with qhull. The diagram read from
+ * qhull's data structures must be the one parsed from its text output, with
+ * the same numbering and the same coordinates. The diagram computed block by
+ * block, on random points in a cube whose blocks certify, must have the
+ * ridges of a single qhull run. On points on a sphere, whose blocks need
+ * points from all around it, the memory budget must make the computation
+ * fail.
+ */
+
+namespace {
+
+typedef std::array<double, 3> Vertex;
+typedef std::map<std::pair<int, int>, std::vector<Vertex> > RidgeMap;
+
+// The ridges of a diagram by their generators, each as the cycle of its
+// vertices starting from the smallest one and oriented towards the smaller
+// of its neighbors, the vertex at infinity standing after all the others
+RidgeMap GetRidges(const QhullVoronoiDiagram &vd)
+{
+  const double inf = std::numeric_limits<double>::infinity();
+  RidgeMap ridges;
+  for (size_t j = 0, offset = 0; j < vd.NumberOfRidges; j++, offset += vd.Ridges[offset] + 1) {
+    const int *ridge = &vd.Ridges[offset];
+    std::vector<Vertex> cycle;
+    for (int k = 3; k <= ridge[0]; k++) {
+      int v = ridge[k];
+      if (v == 0)
+        cycle.push_back(Vertex{ { inf, inf, inf } });
+      else
+        cycle.push_back(Vertex{ { vd.Vertices[3 * (v - 1)], vd.Vertices[3 * (v - 1) + 1], vd.Vertices[3 * (v - 1) + 2] } });
+    }
+    std::rotate(cycle.begin(), std::min_element(cycle.begin(), cycle.end()), cycle.end());
+    if (cycle.size() > 2 && cycle.back() < cycle[1])
+      std::reverse(cycle.begin() + 1, cycle.end());
+    ridges[std::make_pair(ridge[1], ridge[2])] = cycle;
+  }
+  return ridges;
+}
+
+bool IsSameVertex(const Vertex &a, const Vertex &b)
+{
+  for (int d = 0; d < 3; d++)
+    if (a[d] != b[d] && !(std::abs(a[d] - b[d]) <= 1e-9 * std::max(1.0, std::abs(b[d]))))
+      return false;
+  return true;
+}
+
+void TestInMemoryDiagram()
+{
+  std::mt19937 random(3);
+  std::uniform_real_distribution<double> coordinate(-10.0, 10.0);
+  std::vector<double> points(3 * 5000);
+  for (size_t i = 0; i < points.size(); i++)
+    points[i] = coordinate(random);
+
+  std::vector<double> input(points);
+  QhullVoronoiDiagram expected, actual;
+  CHECK(ComputeQhullVoronoiDiagramUsingTextFile(input, expected) == 0);
+  input = points;
+  CHECK(ComputeQhullVoronoiDiagram(input, actual) == 0);
+
+  CHECK(expected.NumberOfRidges > 0);
+  CHECK(actual.NumberOfVertices == expected.NumberOfVertices);
+  CHECK(actual.NumberOfRidges == expected.NumberOfRidges);
+  CHECK(actual.Vertices == expected.Vertices);
+  CHECK(actual.Ridges == expected.Ridges);
+}
+
+void TestPartitionedDiagram()
+{
+  std::mt19937 random(1);
+  std::uniform_real_distribution<double> coordinate(-1.0, 1.0);
+  std::vector<double> points(3 * 20000);
+  for (size_t i = 0; i < points.size(); i++)
+    points[i] = coordinate(random);
+
+  // The points do not fit in the two blocks of 6000 points computed at the
+  // same time, so the diagram is computed in blocks
+  std::vector<double> input(points);
+  QhullVoronoiDiagram expected, actual;
+  CHECK(ComputeQhullVoronoiDiagram(input, expected) == 0);
+  input = points;
+  CHECK(ComputePartitionedQhullVoronoiDiagram(input, actual, 6000, 2) == 0);
+
+  CHECK(expected.NumberOfRidges > 0);
+  CHECK(actual.NumberOfRidges == expected.NumberOfRidges);
+  CHECK(actual.NumberOfVertices == expected.NumberOfVertices);
+
+  RidgeMap ridgesExpected = GetRidges(expected), ridgesActual = GetRidges(actual);
+  CHECK(ridgesActual.size() == ridgesExpected.size());
+  size_t nDifferent = 0;
+  for (RidgeMap::const_iterator it = ridgesExpected.begin(); it != ridgesExpected.end(); ++it) {
+    RidgeMap::const_iterator found = ridgesActual.find(it->first);
+    bool isSame = found != ridgesActual.end() && found->second.size() == it->second.size();
+    for (size_t k = 0; isSame && k < it->second.size(); k++)
+      isSame = IsSameVertex(found->second[k], it->second[k]);
+    nDifferent += !isSame;
+  }
+  CHECK(nDifferent == 0);
+}
+
+void TestOverBudget()
+{
+  std::mt19937 random(2);
+  std::normal_distribution<double> coordinate;
+  std::vector<double> points;
+  for (int i = 0; i < 5000; i++) {
+    double x[3] = { coordinate(random), coordinate(random), coordinate(random) };
+    double norm = std::sqrt(x[0] * x[0] + x[1] * x[1] + x[2] * x[2]);
+    for (int d = 0; d < 3; d++)
+      points.push_back(x[d] / norm);
+  }
+
+  QhullVoronoiDiagram vd;
+  CHECK(ComputePartitionedQhullVoronoiDiagram(points, vd, 1000, 2) == QHULL_OVER_BUDGET);
+  CHECK(vd.NumberOfRidges == 0);
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  TestInMemoryDiagram();
+  TestPartitionedDiagram();
+  TestOverBudget();
+
+  return TestResult();
+}
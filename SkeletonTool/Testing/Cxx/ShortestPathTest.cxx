@@ -0,0 +1,147 @@
+#include "ShortestPath.h"
+#include "VTKMeshHalfEdgeWrapper.h"
+#include "TestingMacros.h"
+
+#include <vtkMath.h>
+#include <vtkNew.h>
+#include <vtkPolyData.h>
+#include <vtkSphereSource.h>
+#include <vtkTransform.h>
+#include <vtkTransformPolyDataFilter.h>
+
+#include <cmath>
+#include <cstdlib>
+#include <iostream>
+#include <random>
+#include <vector>
+
+/**
+ * Test of the reuse of a shortest path search on the surface of an
+ * ellipsoid. Each query resets only the vertices that the previous one
+ * touched, so one search instance answers a series of queries of all kinds:
+ * full, limited to a radius, stopped at targets, guided towards a target,
+ * and after the multi-source search of GraphVoronoiDiagram, which touches
+ * every vertex. After each query, its distances and predecessors must be
+ * those of a fresh instance running the same query.
+ */
+
+namespace {
+
+typedef DijkstraShortestPath<float> ShortestPath;
+
+// Lower bound on the distance to a target: slightly less than the Euclidean
+// distance, so that the rounding of the edge weights keeps it consistent
+class EuclideanHeuristic
+{
+public:
+  EuclideanHeuristic(vtkPolyData *surface, unsigned int iTarget) : m_Surface(surface)
+  {
+    surface->GetPoint(iTarget, m_Target);
+  }
+
+  double operator()(unsigned int iVertex) const
+  {
+    double x[3];
+    m_Surface->GetPoint(iVertex, x);
+    return 0.999 * sqrt(vtkMath::Distance2BetweenPoints(x, m_Target));
+  }
+
+private:
+  vtkPolyData *m_Surface;
+  double m_Target[3];
+};
+
+// Euclidean length of each edge of the graph
+std::vector<float> GetEdgeLengths(vtkPolyData *surface, const VTKMeshHalfEdgeWrapper &graph)
+{
+  std::vector<float> weights(graph.GetNumberOfHalfEdges());
+  for (unsigned int v = 0; v < graph.GetNumberOfVertices(); v++) {
+    for (unsigned int k = graph.GetAdjacencyIndex()[v]; k < graph.GetAdjacencyIndex()[v + 1]; k++) {
+      double x[3], y[3];
+      surface->GetPoint(v, x);
+      surface->GetPoint(graph.GetAdjacency()[k], y);
+      weights[k] = static_cast<float>(sqrt(vtkMath::Distance2BetweenPoints(x, y)));
+    }
+  }
+  return weights;
+}
+
+// Run a query of the given kind from a source, towards targets
+void RunQuery(ShortestPath &search, vtkPolyData *surface, int kind, unsigned int source,
+              std::vector<unsigned int> &targets)
+{
+  switch (kind) {
+    case 0: search.ComputePathsFromSource(source); break;
+    case 1: search.ComputePathsFromSource(source, 8.0); break;
+    case 2: search.ComputePathsFromSource(source, ShortestPath::INFINITE_WEIGHT, targets.size(), targets.data()); break;
+    default: search.ComputePathToTarget(source, targets[0], EuclideanHeuristic(surface, targets[0]), 20.0); break;
+  }
+}
+
+// Whether two searches have the same distances and predecessors
+bool IsSameSearch(ShortestPath &actual, ShortestPath &expected, unsigned int nv)
+{
+  for (unsigned int v = 0; v < nv; v++)
+    if (actual.GetDistanceArray()[v] != expected.GetDistanceArray()[v]
+        || actual.GetPredecessorArray()[v] != expected.GetPredecessorArray()[v])
+      return false;
+  return true;
+}
+
+void TestReuse(vtkPolyData *surface)
+{
+  VTKMeshHalfEdgeWrapper graph(surface);
+  unsigned int nv = graph.GetNumberOfVertices();
+  std::vector<float> weights = GetEdgeLengths(surface, graph);
+  GraphVoronoiDiagram<float> search(nv, graph.GetAdjacencyIndex(), graph.GetAdjacency(), weights.data());
+
+  std::mt19937 random(1);
+  std::uniform_int_distribution<unsigned int> vertex(0, nv - 1);
+  size_t nDifferent = 0, nPartial = 0;
+  for (int q = 0; q < 200; q++) {
+    // Now and then, a multi-source search touches every vertex
+    if (q % 50 == 25) {
+      unsigned int sources[] = { vertex(random), vertex(random), vertex(random) };
+      search.ComputePathsFromManySources(3, sources);
+    }
+
+    int kind = q % 4;
+    unsigned int source = vertex(random);
+    std::vector<unsigned int> targets(1 + q % 3);
+    for (size_t k = 0; k < targets.size(); k++)
+      targets[k] = vertex(random);
+
+    RunQuery(search, surface, kind, source, targets);
+    ShortestPath fresh(nv, graph.GetAdjacencyIndex(), graph.GetAdjacency(), weights.data());
+    RunQuery(fresh, surface, kind, source, targets);
+    nDifferent += !IsSameSearch(search, fresh, nv);
+
+    // The limited queries leave some vertices unreached
+    unsigned int nReached = 0;
+    for (unsigned int v = 0; v < nv; v++)
+      nReached += search.GetDistanceArray()[v] != ShortestPath::INFINITE_WEIGHT;
+    nPartial += nReached < nv;
+  }
+
+  CHECK(nPartial > 50);
+  CHECK(nDifferent == 0);
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  vtkNew<vtkSphereSource> sphere;
+  sphere->SetThetaResolution(40);
+  sphere->SetPhiResolution(40);
+  vtkNew<vtkTransform> transform;
+  transform->Scale(30, 20, 10);
+  vtkNew<vtkTransformPolyDataFilter> fTransform;
+  fTransform->SetInputConnection(sphere->GetOutputPort());
+  fTransform->SetTransform(transform);
+  fTransform->Update();
+
+  TestReuse(fTransform->GetOutput());
+
+  return TestResult();
+}
@@ -0,0 +1,150 @@
+#include "SkeletonComponents.h"
+#include "TestingMacros.h"
+
+#include <vtkCellArray.h>
+#include <vtkIdTypeArray.h>
+#include <vtkNew.h>
+#include <vtkPoints.h>
+#include <vtkPolyData.h>
+#include <vtkPolyDataConnectivityFilter.h>
+
+#include <algorithm>
+#include <cstdlib>
+#include <functional>
+#include <iostream>
+#include <random>
+#include <vector>
+
+/**
+ * Tests of the ranking of the connected components of the skeleton by
+ * FlagLargestComponents, on a small mesh whose components are known and on
+ * random meshes against vtkPolyDataConnectivityFilter.
+ */
+
+namespace {
+
+// A polygonal mesh given as offsets into a connectivity array
+struct FaceList
+{
+  std::vector<vtkIdType> Offsets = std::vector<vtkIdType>(1, 0), Conn;
+
+  void AddFace(std::initializer_list<vtkIdType> ids)
+  {
+    Conn.insert(Conn.end(), ids.begin(), ids.end());
+    Offsets.push_back(Conn.size());
+  }
+};
+
+// Faces kept with nComp components
+std::vector<size_t> GetKeptFaces(size_t nPoints, const FaceList &faces, size_t nComp)
+{
+  std::vector<char> isKept;
+  size_t nKept = FlagLargestComponents(nPoints, faces.Offsets, faces.Conn, nComp, isKept);
+  std::vector<size_t> kept;
+  for (size_t f = 0; f < isKept.size(); f++)
+    if (isKept[f])
+      kept.push_back(f);
+  CHECK(nKept == kept.size());
+  return kept;
+}
+
+void TestRanking()
+{
+  FaceList faces;
+  faces.AddFace({0, 1, 2});     // 0: A
+  faces.AddFace({10, 11, 12});  // 1: B
+  faces.AddFace({20, 21, 22});  // 2: C
+  faces.AddFace({12, 13, 14});  // 3: B
+  faces.AddFace({2, 3, 4});     // 4: A
+  faces.AddFace({30, 31, 32});  // 5: D
+  faces.AddFace({22, 23, 24});  // 6: C
+  faces.AddFace({14, 15, 16});  // 7: B
+  faces.AddFace({40, 41, 42});  // 8: E
+  faces.AddFace({24, 25, 0});   // 9: joins C to A
+  faces.AddFace({50, 51, 52});  // 10: F
+  faces.AddFace({52, 53, 54});  // 11: F
+  faces.AddFace({60, 61, 62, 63}); // 12: G
+
+  // A and C form one component of 5 faces, then come B (3), F (2), and D,
+  // E and G (1) in the order of their faces
+  size_t nPoints = 64;
+  std::vector<size_t> expected = {0, 2, 4, 6, 9};
+  CHECK(GetKeptFaces(nPoints, faces, 1) == expected);
+  expected = {0, 1, 2, 3, 4, 6, 7, 9};
+  CHECK(GetKeptFaces(nPoints, faces, 2) == expected);
+  expected = {0, 1, 2, 3, 4, 6, 7, 9, 10, 11};
+  CHECK(GetKeptFaces(nPoints, faces, 3) == expected);
+  expected = {0, 1, 2, 3, 4, 5, 6, 7, 9, 10, 11};
+  CHECK(GetKeptFaces(nPoints, faces, 4) == expected);
+  expected = {0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11};
+  CHECK(GetKeptFaces(nPoints, faces, 5) == expected);
+  CHECK(GetKeptFaces(nPoints, faces, 6).size() == 13);
+  CHECK(GetKeptFaces(nPoints, faces, 100).size() == 13);
+
+  // Vertices used by no face are not components
+  CHECK(GetKeptFaces(1000, faces, 7).size() == 13);
+}
+
+// The sizes of the components of random meshes, and the faces of the
+// largest ones, are those found by vtkPolyDataConnectivityFilter
+void TestAgainstConnectivityFilter()
+{
+  std::mt19937 random(42);
+  for (int trial = 0; trial < 20; trial++) {
+    size_t nPoints = 500, nFaces = 200 + 10 * trial;
+    std::uniform_int_distribution<vtkIdType> vertex(0, nPoints - 1);
+    std::uniform_int_distribution<int> faceSize(3, 5);
+
+    FaceList faces;
+    vtkNew<vtkCellArray> cells;
+    for (size_t f = 0; f < nFaces; f++) {
+      std::vector<vtkIdType> ids(faceSize(random));
+      for (size_t k = 0; k < ids.size(); k++)
+        ids[k] = vertex(random);
+      faces.Conn.insert(faces.Conn.end(), ids.begin(), ids.end());
+      faces.Offsets.push_back(faces.Conn.size());
+      cells->InsertNextCell(ids.size(), ids.data());
+    }
+    vtkNew<vtkPoints> points;
+    points->SetNumberOfPoints(nPoints);
+    for (size_t i = 0; i < nPoints; i++)
+      points->SetPoint(i, i, 0.0, 0.0);
+    vtkNew<vtkPolyData> mesh;
+    mesh->SetPoints(points);
+    mesh->SetPolys(cells);
+
+    vtkNew<vtkPolyDataConnectivityFilter> connectivity;
+    connectivity->SetInputData(mesh);
+    connectivity->SetExtractionModeToAllRegions();
+    connectivity->Update();
+    std::vector<size_t> sizes;
+    for (int r = 0; r < connectivity->GetNumberOfExtractedRegions(); r++)
+      sizes.push_back(connectivity->GetRegionSizes()->GetValue(r));
+    std::sort(sizes.begin(), sizes.end(), std::greater<size_t>());
+
+    size_t nExpected = 0;
+    for (size_t nComp = 1; nComp <= sizes.size(); nComp++) {
+      nExpected += sizes[nComp - 1];
+      CHECK(GetKeptFaces(nPoints, faces, nComp).size() == nExpected);
+    }
+
+    // When the largest component is unique, it is the one the filter keeps
+    if (sizes.size() > 1 && sizes[0] > sizes[1]) {
+      connectivity->SetExtractionModeToLargestRegion();
+      connectivity->ScalarConnectivityOff();
+      connectivity->Update();
+      std::vector<size_t> kept = GetKeptFaces(nPoints, faces, 1);
+      CHECK(kept.size() == static_cast<size_t>(connectivity->GetOutput()->GetNumberOfCells()));
+    }
+  }
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  TestRanking();
+  TestAgainstConnectivityFilter();
+
+  return TestResult();
+}
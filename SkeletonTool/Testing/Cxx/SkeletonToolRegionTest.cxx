@@ -0,0 +1,213 @@
+#include <vtkCellArray.h>
+#include <vtkCellData.h>
+#include <vtkDataArray.h>
+#include <vtkIdList.h>
+#include <vtkNew.h>
+#include <vtkPoints.h>
+#include <vtkPolyData.h>
+#include <vtkPolyDataReader.h>
+#include <vtkPolyDataWriter.h>
+#include <vtkSmartPointer.h>
+#include <vtkSphereSource.h>
+#include <vtkTransform.h>
+#include <vtkTransformPolyDataFilter.h>
+
+#include <vtksys/SystemTools.hxx>
+
+#include <algorithm>
+#include <array>
+#include <cmath>
+#include <cstdlib>
+#include <iostream>
+#include <string>
+#include <vector>
+
+#include "TestingMacros.h"
+
+#if defined(_WIN32) && !defined(MODULE_STATIC)
+#define MODULE_IMPORT __declspec(dllimport)
+#else
+#define MODULE_IMPORT
+#endif
+
+extern "C" MODULE_IMPORT int ModuleEntryPoint(int, char *[]);
+
+/**
+ * Test of the recomputation of the skeleton inside a region of interest.
+ * The surface of an ellipsoid is edited by a bump inside a region. The
+ * skeleton of the region, recomputed on the edited surface and spliced into
+ * the skeleton of the original surface, must have the faces of the skeleton
+ * of the whole edited surface, and inside the region their arrays too. The
+ * faces outside the region keep the arrays of the reference: the edit may
+ * change the geodesic distances of faces nearby, which the splice does not
+ * recompute. Without a reference skeleton, the output must be the faces of
+ * the skeleton of the edited surface inside the region.
+ */
+
+namespace {
+
+// The region, as its center and radii, and the margin around it
+const char REGION[] = "15,5,0,6,6,10";
+const char REGION_MARGIN[] = "9";
+const double REGION_MIN[3] = { 9, -1, -10 }, REGION_MAX[3] = { 21, 11, 10 };
+
+// A face of a skeleton, as the sorted coordinates of its vertices rounded to
+// 1e-3, with its radius and geodesic distance
+struct Face
+{
+  std::vector<std::array<long long, 3> > Vertices;
+  double Radius, Geodesic;
+
+  bool operator<(const Face &other) const
+  {
+    if (Vertices != other.Vertices)
+      return Vertices < other.Vertices;
+    return Radius != other.Radius ? Radius < other.Radius : Geodesic < other.Geodesic;
+  }
+};
+
+int RunSkeletonTool(std::vector<std::string> args)
+{
+  args.insert(args.begin(), "SkeletonTool");
+  std::vector<char *> argv;
+  for (size_t i = 0; i < args.size(); i++)
+    argv.push_back(&args[i][0]);
+  argv.push_back(NULL);
+  return ModuleEntryPoint(static_cast<int>(args.size()), argv.data());
+}
+
+// Surface of an ellipsoid of 12k triangles, with a bump of the given height
+// around a point of the region
+vtkSmartPointer<vtkPolyData> CreateSurface(double bump)
+{
+  vtkNew<vtkSphereSource> sphere;
+  sphere->SetThetaResolution(80);
+  sphere->SetPhiResolution(80);
+  vtkNew<vtkTransform> transform;
+  transform->Scale(30, 20, 10);
+  vtkNew<vtkTransformPolyDataFilter> fTransform;
+  fTransform->SetInputConnection(sphere->GetOutputPort());
+  fTransform->SetTransform(transform);
+  fTransform->Update();
+  vtkSmartPointer<vtkPolyData> surface = fTransform->GetOutput();
+
+  const double center[3] = { 15, 5, 0 }, radii[3] = { 30, 20, 10 };
+  vtkPoints *points = surface->GetPoints();
+  for (vtkIdType i = 0; i < points->GetNumberOfPoints(); i++) {
+    double x[3], n[3], d2 = 0.0, nn = 0.0;
+    points->GetPoint(i, x);
+    for (int d = 0; d < 3; d++) {
+      d2 += (x[d] - center[d]) * (x[d] - center[d]);
+      n[d] = x[d] / (radii[d] * radii[d]);
+      nn += n[d] * n[d];
+    }
+    double h = bump * std::max(0.0, 1.0 - d2 / 16.0) / std::sqrt(nn);
+    for (int d = 0; d < 3; d++)
+      x[d] += h * n[d];
+    points->SetPoint(i, x);
+  }
+  return surface;
+}
+
+void WriteSurface(vtkPolyData *surface, const std::string &filename)
+{
+  vtkNew<vtkPolyDataWriter> writer;
+  writer->SetInputData(surface);
+  writer->SetFileName(filename.c_str());
+  writer->Write();
+}
+
+// The faces of a skeleton, only those inside the region if isInRegion is
+// set, sorted
+std::vector<Face> ReadFaces(const std::string &filename, bool isInRegion = false)
+{
+  vtkNew<vtkPolyDataReader> reader;
+  reader->SetFileName(filename.c_str());
+  reader->Update();
+  vtkPolyData *skeleton = reader->GetOutput();
+  vtkDataArray *radius = skeleton->GetCellData()->GetArray("Radius");
+  vtkDataArray *geodesic = skeleton->GetCellData()->GetArray("Geodesic");
+  std::vector<Face> faces;
+  if (!radius || !geodesic)
+    return faces;
+
+  vtkNew<vtkIdList> ids;
+  for (vtkIdType i = 0; i < skeleton->GetNumberOfCells(); i++) {
+    skeleton->GetCellPoints(i, ids);
+    Face face;
+    bool isInside = true;
+    for (vtkIdType k = 0; k < ids->GetNumberOfIds(); k++) {
+      double x[3];
+      skeleton->GetPoint(ids->GetId(k), x);
+      std::array<long long, 3> vertex;
+      for (int d = 0; d < 3; d++) {
+        isInside &= x[d] >= REGION_MIN[d] && x[d] <= REGION_MAX[d];
+        vertex[d] = std::llround(static_cast<float>(x[d]) * 1000.0);
+      }
+      face.Vertices.push_back(vertex);
+    }
+    if (isInRegion && !isInside)
+      continue;
+    std::sort(face.Vertices.begin(), face.Vertices.end());
+    face.Radius = radius->GetTuple1(i);
+    face.Geodesic = geodesic->GetTuple1(i);
+    faces.push_back(face);
+  }
+  std::sort(faces.begin(), faces.end());
+  return faces;
+}
+
+// Check that the faces have the same vertices and, if isArrayChecked is
+// set, the same radius and geodesic distance
+void CheckSameFaces(const std::vector<Face> &actual, const std::vector<Face> &expected, bool isArrayChecked)
+{
+  CHECK(!expected.empty());
+  CHECK(actual.size() == expected.size());
+  size_t nDifferent = 0;
+  for (size_t i = 0; i < std::min(actual.size(), expected.size()); i++) {
+    nDifferent += actual[i].Vertices != expected[i].Vertices;
+    if (isArrayChecked)
+      nDifferent += actual[i].Radius != expected[i].Radius
+                    || std::abs(actual[i].Geodesic - expected[i].Geodesic) > 1e-6 * expected[i].Geodesic;
+  }
+  CHECK(nDifferent == 0);
+}
+
+} // end of anonymous namespace
+
+int main(int argc, char *argv[])
+{
+  if (argc < 2) {
+    std::cerr << "Usage: " << argv[0] << " <temporary directory>" << std::endl;
+    return EXIT_FAILURE;
+  }
+  std::string dir = std::string(argv[1]) + "/SkeletonToolRegionTest";
+  vtksys::SystemTools::MakeDirectory(dir);
+
+  std::string surface = dir + "/ellipsoid.vtk", edited = dir + "/ellipsoid_edited.vtk";
+  WriteSurface(CreateSurface(0.0), surface);
+  WriteSurface(CreateSurface(0.8), edited);
+
+  // Skeletons of the whole surfaces
+  std::string reference = dir + "/skeleton.vtk", expected = dir + "/skeleton_edited.vtk";
+  CHECK(RunSkeletonTool({ surface, reference }) == EXIT_SUCCESS);
+  CHECK(RunSkeletonTool({ edited, expected }) == EXIT_SUCCESS);
+
+  // Skeleton of the region of the edited surface, spliced into the skeleton
+  // of the original surface
+  std::string spliced = dir + "/skeleton_spliced.vtk";
+  CHECK(RunSkeletonTool({ "--region", REGION, "--regionMargin", REGION_MARGIN, "--referenceSkeleton", reference,
+                          edited, spliced }) == EXIT_SUCCESS);
+  CheckSameFaces(ReadFaces(spliced), ReadFaces(expected), false);
+  CheckSameFaces(ReadFaces(spliced, true), ReadFaces(expected, true), true);
+
+  // Skeleton of the region alone
+  std::string patch = dir + "/skeleton_region.vtk";
+  CHECK(RunSkeletonTool({ "--region", REGION, "--regionMargin", REGION_MARGIN, edited, patch }) == EXIT_SUCCESS);
+  CheckSameFaces(ReadFaces(patch), ReadFaces(expected, true), true);
+
+  // The edit changes the skeleton, so that the splice is not the reference
+  CHECK(ReadFaces(reference).size() != ReadFaces(expected).size());
+
+  return TestResult();
+}
@@ -0,0 +1,589 @@
+#include "VoronoiCache.h"
+#include "VTKMeshHalfEdgeWrapper.h"
+#include "VTKMeshShortestDistance.h"
+#include "TestingMacros.h"
+
+#include <vtkCellData.h>
+#include <vtkCleanPolyData.h>
+#include <vtkDataArray.h>
+#include <vtkIdList.h>
+#include <vtkMath.h>
+#include <vtkNew.h>
+#include <vtkPolyData.h>
+#include <vtkPolyDataReader.h>
+#include <vtkPointData.h>
+#include <vtkPolyDataWriter.h>
+#include <vtkSMPTools.h>
+#include <vtkSmartPointer.h>
+#include <vtkSphereSource.h>
+#include <vtkStaticPointLocator.h>
+#include <vtkTransform.h>
+#include <vtkTransformPolyDataFilter.h>
+#include <vtkTriangle.h>
+#include <vtkTriangleFilter.h>
+
+#include <vtksys/Directory.hxx>
+#include <vtksys/SystemTools.hxx>
+
+#include <algorithm>
+#include <cmath>
+#include <cstdlib>
+#include <fstream>
+#include <iostream>
+#include <limits>
+#include <map>
+#include <sstream>
+#include <string>
+#include <utility>
+#include <vector>
+
+#if defined(_WIN32) && !defined(MODULE_STATIC)
+#define MODULE_IMPORT __declspec(dllimport)
+#else
+#define MODULE_IMPORT
+#endif
+
+extern "C" MODULE_IMPORT int ModuleEntryPoint(int, char *[]);
+
+/**
+ * Tests of the output of SkeletonTool on the surface of an ellipsoid. The
+ * inside flags of the Voronoi vertices, read back from the Voronoi cache,
+ * and the skeleton, down to the order of its faces and their arrays, must
+ * not depend on the number of threads. The faces kept by the pruning, whose
+ * searches are shared by the ridges of a generator, must be those that full
+ * searches from each generator keep, with the same geodesic distances. Each
+ * skeleton of a parameter sweep must be the skeleton computed with its
+ * parameters alone. The thickness statistics, in the table and in the
+ * return parameters, must be those of the triangles of the skeleton. The
+ * generators of each face must be boundary vertices nearest to all the
+ * vertices of the face, and their distance must be the radius of the face.
+ * A run that reads its diagram and inside flags from the Voronoi cache must
+ * give the skeleton of a run without the cache.
+ */
+
+namespace {
+
+int RunSkeletonTool(std::vector<std::string> args)
+{
+  args.insert(args.begin(), "SkeletonTool");
+  std::vector<char *> argv;
+  for (size_t i = 0; i < args.size(); i++)
+    argv.push_back(&args[i][0]);
+  argv.push_back(NULL);
+  return ModuleEntryPoint(static_cast<int>(args.size()), argv.data());
+}
+
+// Surface of an ellipsoid of 3k triangles
+void WriteEllipsoid(const std::string &filename)
+{
+  vtkNew<vtkSphereSource> sphere;
+  sphere->SetThetaResolution(40);
+  sphere->SetPhiResolution(40);
+  vtkNew<vtkTransform> transform;
+  transform->Scale(30, 20, 10);
+  vtkNew<vtkTransformPolyDataFilter> fTransform;
+  fTransform->SetInputConnection(sphere->GetOutputPort());
+  fTransform->SetTransform(transform);
+  vtkNew<vtkPolyDataWriter> writer;
+  writer->SetInputConnection(fTransform->GetOutputPort());
+  writer->SetFileName(filename.c_str());
+  writer->Write();
+}
+
+vtkSmartPointer<vtkPolyData> ReadSkeleton(const std::string &filename)
+{
+  vtkNew<vtkPolyDataReader> reader;
+  reader->SetFileName(filename.c_str());
+  reader->Update();
+  return reader->GetOutput();
+}
+
+// Whether two skeletons have the same points, faces and cell arrays, exactly
+bool IsSameSkeleton(vtkPolyData *actual, vtkPolyData *expected)
+{
+  if (actual->GetNumberOfPoints() != expected->GetNumberOfPoints()
+      || actual->GetNumberOfCells() != expected->GetNumberOfCells()
+      || actual->GetCellData()->GetNumberOfArrays() != expected->GetCellData()->GetNumberOfArrays())
+    return false;
+  for (vtkIdType i = 0; i < expected->GetNumberOfPoints(); i++) {
+    double x[3], y[3];
+    actual->GetPoint(i, x);
+    expected->GetPoint(i, y);
+    if (x[0] != y[0] || x[1] != y[1] || x[2] != y[2])
+      return false;
+  }
+
+  vtkNew<vtkIdList> a, b;
+  for (vtkIdType i = 0; i < expected->GetNumberOfCells(); i++) {
+    actual->GetCellPoints(i, a);
+    expected->GetCellPoints(i, b);
+    if (a->GetNumberOfIds() != b->GetNumberOfIds())
+      return false;
+    for (vtkIdType k = 0; k < b->GetNumberOfIds(); k++)
+      if (a->GetId(k) != b->GetId(k))
+        return false;
+  }
+
+  for (int j = 0; j < expected->GetCellData()->GetNumberOfArrays(); j++) {
+    vtkDataArray *e = expected->GetCellData()->GetArray(j);
+    vtkDataArray *r = e ? actual->GetCellData()->GetArray(e->GetName()) : NULL;
+    if (!e || !r)
+      return false;
+    for (vtkIdType i = 0; i < e->GetNumberOfTuples(); i++)
+      if (r->GetTuple1(i) != e->GetTuple1(i))
+        return false;
+  }
+  return true;
+}
+
+// The boundary as SkeletonTool triangulates and cleans it, whose vertex ids
+// the generator ids of the skeleton refer to
+vtkSmartPointer<vtkPolyData> ReadBoundary(const std::string &filename)
+{
+  vtkNew<vtkPolyDataReader> reader;
+  reader->SetFileName(filename.c_str());
+  vtkNew<vtkTriangleFilter> fTriangle;
+  fTriangle->SetInputConnection(reader->GetOutputPort());
+  vtkNew<vtkCleanPolyData> fClean;
+  fClean->SetInputConnection(fTriangle->GetOutputPort());
+  fClean->SetTolerance(1e-4);
+  fClean->Update();
+  return fClean->GetOutput();
+}
+
+// Number of edges from a vertex to every other one, by a full breadth first
+// search
+std::vector<unsigned int> GetNumberOfEdges(const VTKMeshHalfEdgeWrapper &graph, unsigned int source)
+{
+  std::vector<unsigned int> depth(graph.GetNumberOfVertices(), std::numeric_limits<unsigned int>::max());
+  std::vector<unsigned int> queue(1, source);
+  depth[source] = 0;
+  for (size_t q = 0; q < queue.size(); q++) {
+    unsigned int v = queue[q];
+    for (unsigned int k = graph.GetAdjacencyIndex()[v]; k < graph.GetAdjacencyIndex()[v + 1]; k++) {
+      unsigned int w = graph.GetAdjacency()[k];
+      if (depth[w] > depth[v] + 1) {
+        depth[w] = depth[v] + 1;
+        queue.push_back(w);
+      }
+    }
+  }
+  return depth;
+}
+
+
+bool IsClose(double actual, double expected)
+{
+  return std::abs(actual - expected) <= 1e-5 * std::abs(expected);
+}
+
+// The values of a file of lines "name = value" or "name<tab>value", in the
+// order of the file, the values being comma separated lists of numbers
+typedef std::vector<std::pair<std::string, std::vector<double> > > NamedValues;
+NamedValues ReadValues(const std::string &filename, const std::string &separator)
+{
+  NamedValues values;
+  std::ifstream fin(filename.c_str());
+  std::string line;
+  while (std::getline(fin, line)) {
+    size_t pos = line.find(separator);
+    if (pos == std::string::npos)
+      continue;
+    values.push_back(std::make_pair(line.substr(0, pos), std::vector<double>()));
+    std::istringstream iss(line.substr(pos + separator.size()));
+    for (std::string item; std::getline(iss, item, ',');)
+      values.back().second.push_back(atof(item.c_str()));
+  }
+  return values;
+}
+
+// Whether the named value is a single number close to the expected one
+bool IsCloseValue(const NamedValues &values, const std::string &name, double expected)
+{
+  for (size_t i = 0; i < values.size(); i++)
+    if (values[i].first == name)
+      return values[i].second.size() == 1 && IsClose(values[i].second[0], expected);
+  return false;
+}
+
+// The inside flags of the single entry of a Voronoi cache
+std::vector<char> ReadCachedInsideFlags(const std::string &dir)
+{
+  vtksys::Directory directory;
+  directory.Load(dir);
+  std::vector<char> ptin;
+  for (unsigned long i = 0; i < directory.GetNumberOfFiles(); i++) {
+    std::string name = directory.GetFile(i);
+    if (vtksys::SystemTools::GetFilenameLastExtension(name) != ".skvc")
+      continue;
+    VoronoiCache cache(dir, 1 << 30);
+    QhullVoronoiDiagram vd;
+    CHECK(cache.Load(vtksys::SystemTools::GetFilenameWithoutLastExtension(name), vd, ptin));
+  }
+  return ptin;
+}
+
+void TestThreads(const std::string &dir, const std::string &surface)
+{
+  const char *insideTests[] = { "RayCasting", "VoxelGrid" };
+  for (int t = 0; t < 2; t++) {
+    std::string prefix = dir + "/" + insideTests[t];
+    std::string single = prefix + "_threads1.vtk", multiple = prefix + "_threads4.vtk";
+    std::string cacheSingle = prefix + "_cache1", cacheMultiple = prefix + "_cache4";
+    CHECK(RunSkeletonTool({ "--threads", "1", "--insideTest", insideTests[t], "--cacheDirectory", cacheSingle,
+                            surface, single }) == EXIT_SUCCESS);
+    CHECK(RunSkeletonTool({ "--threads", "4", "--insideTest", insideTests[t], "--cacheDirectory", cacheMultiple,
+                            surface, multiple }) == EXIT_SUCCESS);
+
+    std::vector<char> ptin = ReadCachedInsideFlags(cacheSingle);
+    CHECK(!ptin.empty());
+    CHECK(ReadCachedInsideFlags(cacheMultiple) == ptin);
+
+    vtkSmartPointer<vtkPolyData> expected = ReadSkeleton(single);
+    CHECK(expected->GetNumberOfCells() > 0);
+    CHECK(IsSameSkeleton(ReadSkeleton(multiple), expected));
+  }
+}
+
+void TestPruning(const std::string &dir, const std::string &surface)
+{
+  // Without pruning, the skeleton has all the candidate faces
+  const int nDegrees = 3;
+  const double xPrune = 1.2;
+  std::string candidates = dir + "/candidates.vtk", pruned = dir + "/pruned.vtk";
+  CHECK(RunSkeletonTool({ "--nDegrees", "0", "--xPrune", "0", surface, candidates }) == EXIT_SUCCESS);
+  CHECK(RunSkeletonTool({ "--nDegrees", "3", "--xPrune", "1.2", surface, pruned }) == EXIT_SUCCESS);
+
+  vtkSmartPointer<vtkPolyData> bnd = ReadBoundary(surface);
+  VTKMeshHalfEdgeWrapper graph(bnd);
+  VTKMeshShortestDistance distance;
+  distance.SetInputMesh(&graph);
+  distance.ComputeGraph();
+  DijkstraShortestPath<float> full(
+      graph.GetNumberOfVertices(), graph.GetAdjacencyIndex(), graph.GetAdjacency(), distance.GetEdgeWeights());
+
+  // The faces that the criteria keep, by generators, with their geodesic
+  // distance as recorded by SkeletonTool: up to the search radius. Faces
+  // whose geodesic distance ties with the criterion, up to the rounding of
+  // the guided searches, may go either way
+  typedef std::pair<vtkIdType, vtkIdType> Generators;
+  std::map<Generators, double> expected;
+  std::map<Generators, bool> isTied;
+  vtkSmartPointer<vtkPolyData> all = ReadSkeleton(candidates);
+  vtkDataArray *genA = all->GetCellData()->GetArray("GeneratorA");
+  vtkDataArray *genB = all->GetCellData()->GetArray("GeneratorB");
+  vtkDataArray *radius = all->GetCellData()->GetArray("Radius");
+  CHECK(genA && genB && radius);
+  if (!genA || !genB || !radius)
+    return;
+
+  std::map<vtkIdType, std::vector<vtkIdType> > facesOfGenerator;
+  for (vtkIdType i = 0; i < all->GetNumberOfCells(); i++)
+    facesOfGenerator[static_cast<vtkIdType>(genA->GetTuple1(i))].push_back(i);
+
+  size_t nPrunedEdge = 0, nPrunedGeo = 0;
+  for (std::map<vtkIdType, std::vector<vtkIdType> >::const_iterator it = facesOfGenerator.begin();
+       it != facesOfGenerator.end(); ++it) {
+    full.ComputePathsFromSource(it->first);
+    std::vector<unsigned int> depth = GetNumberOfEdges(graph, it->first);
+    for (size_t k = 0; k < it->second.size(); k++) {
+      vtkIdType i = it->second[k], b = static_cast<vtkIdType>(genB->GetTuple1(i));
+      Generators g(it->first, b);
+      double d = full.GetDistanceArray()[b], r = radius->GetTuple1(i);
+      if (depth[b] < (unsigned int) nDegrees)
+        nPrunedEdge++;
+      else if (std::abs(d - r * xPrune) <= 1e-5 * d)
+        isTied[g] = true;
+      else if (d < r * xPrune)
+        nPrunedGeo++;
+      else
+        expected[g] = std::min(d, r * xPrune + 1);
+    }
+  }
+  CHECK(nPrunedEdge > 0);
+  CHECK(nPrunedGeo > 0);
+  CHECK(expected.size() > 100);
+
+  vtkSmartPointer<vtkPolyData> kept = ReadSkeleton(pruned);
+  genA = kept->GetCellData()->GetArray("GeneratorA");
+  genB = kept->GetCellData()->GetArray("GeneratorB");
+  vtkDataArray *geodesic = kept->GetCellData()->GetArray("Geodesic");
+  CHECK(genA && genB && geodesic);
+  if (!genA || !genB || !geodesic)
+    return;
+
+  size_t nFound = 0, nDifferent = 0;
+  for (vtkIdType i = 0; i < kept->GetNumberOfCells(); i++) {
+    Generators g(static_cast<vtkIdType>(genA->GetTuple1(i)), static_cast<vtkIdType>(genB->GetTuple1(i)));
+    std::map<Generators, double>::const_iterator found = expected.find(g);
+    if (found != expected.end()) {
+      nFound++;
+      nDifferent += std::abs(geodesic->GetTuple1(i) - found->second) > 1e-5 * found->second;
+    } else {
+      nDifferent += !isTied.count(g);
+    }
+  }
+  CHECK(nFound == expected.size());
+  CHECK(nDifferent == 0);
+}
+
+void TestSweep(const std::string &dir, const std::string &surface)
+{
+  const char *xPrune[] = { "1.2", "2" }, *nDegrees[] = { "2", "4" }, *nComp[] = { "0", "1" };
+  std::string output = dir + "/sweep.vtk";
+  CHECK(RunSkeletonTool({ "--xPruneSweep", "1.2,2", "--nDegreesSweep", "2,4", "--nCompSweep", "0,1",
+                          surface, output }) == EXIT_SUCCESS);
+
+  size_t nDifferent = 0, nDistinct = 0;
+  std::vector<vtkIdType> nCells;
+  for (int i = 0; i < 2; i++)
+    for (int j = 0; j < 2; j++)
+      for (int k = 0; k < 2; k++) {
+        std::string suffix = std::string("_xPrune") + xPrune[i] + "_nDegrees" + nDegrees[j] + "_nComp" + nComp[k];
+        std::string alone = dir + "/alone" + suffix + ".vtk";
+        CHECK(RunSkeletonTool({ "--xPrune", xPrune[i], "--nDegrees", nDegrees[j], "--nComp", nComp[k],
+                                surface, alone }) == EXIT_SUCCESS);
+
+        vtkSmartPointer<vtkPolyData> expected = ReadSkeleton(alone);
+        nDifferent += !IsSameSkeleton(ReadSkeleton(dir + "/sweep" + suffix + ".vtk"), expected);
+        nDistinct += std::find(nCells.begin(), nCells.end(), expected->GetNumberOfCells()) == nCells.end();
+        nCells.push_back(expected->GetNumberOfCells());
+
+        // The output surface receives the first combination
+        if (i == 0 && j == 0 && k == 0)
+          nDifferent += !IsSameSkeleton(ReadSkeleton(output), expected);
+      }
+
+  CHECK(nDistinct > 4);
+  CHECK(nDifferent == 0);
+}
+
+void TestThickness(const std::string &dir, const std::string &surface)
+{
+  const int nBins = 5;
+  std::string output = dir + "/thickness.vtk", table = dir + "/thickness.tsv", rpf = dir + "/thickness.txt";
+  CHECK(RunSkeletonTool({ "--thicknessTable", table, "--thicknessBins", "5", "--returnparameterfile", rpf,
+                          surface, output }) == EXIT_SUCCESS);
+
+  // The triangles of the skeleton by thickness, with their area
+  vtkSmartPointer<vtkPolyData> skel = ReadSkeleton(output);
+  vtkDataArray *radius = skel->GetCellData()->GetArray("Radius");
+  CHECK(radius != NULL);
+  if (!radius)
+    return;
+  std::vector<std::pair<double, double> > thickness;
+  double xArea = 0.0, xThickness = 0.0;
+  vtkNew<vtkIdList> ids;
+  for (vtkIdType i = 0; i < skel->GetNumberOfCells(); i++) {
+    skel->GetCellPoints(i, ids);
+    if (ids->GetNumberOfIds() != 3)
+      continue;
+    double p[3][3];
+    for (int k = 0; k < 3; k++)
+      skel->GetPoint(ids->GetId(k), p[k]);
+    double a = vtkTriangle::TriangleArea(p[0], p[1], p[2]);
+    thickness.push_back(std::make_pair(radius->GetTuple1(i), a));
+    xArea += a;
+    xThickness += a * radius->GetTuple1(i);
+  }
+  std::sort(thickness.begin(), thickness.end());
+  CHECK(thickness.size() > 10);
+  if (thickness.size() <= 10)
+    return;
+
+  // The area-weighted percentiles: the thickness of the first triangle at
+  // which the cumulated area reaches the given part of the total
+  std::map<std::string, double> expected;
+  const double percentiles[] = { 5, 25, 50, 75, 95 };
+  for (int k = 0; k < 5; k++) {
+    double xCumulated = 0.0;
+    size_t i = 0;
+    while (i + 1 < thickness.size() && (xCumulated += thickness[i].second) < xArea * percentiles[k] / 100.0)
+      i++;
+    std::ostringstream name;
+    name << "P" << percentiles[k];
+    expected[name.str()] = thickness[i].first;
+  }
+  expected["Area"] = xArea;
+  expected["Mean"] = xThickness / xArea;
+  expected["Median"] = expected["P50"];
+  expected["Min"] = thickness.front().first;
+  expected["Max"] = thickness.back().first;
+
+  std::vector<double> histogram(nBins, 0.0);
+  double width = (thickness.back().first - thickness.front().first) / nBins;
+  for (size_t i = 0; i < thickness.size(); i++)
+    histogram[std::min(nBins - 1, static_cast<int>((thickness[i].first - thickness.front().first) / width))] +=
+        thickness[i].second;
+
+  // The statistics table, its histogram rows last
+  NamedValues rows = ReadValues(table, "\t");
+  size_t nDifferent = 0;
+  for (std::map<std::string, double>::const_iterator it = expected.begin(); it != expected.end(); ++it)
+    nDifferent += !IsCloseValue(rows, it->first, it->second);
+  std::vector<double> tableHistogram;
+  for (size_t i = 0; i < rows.size(); i++)
+    if (rows[i].first.compare(0, 5, "Area ") == 0 && rows[i].second.size() == 1)
+      tableHistogram.push_back(rows[i].second[0]);
+  CHECK(tableHistogram.size() == histogram.size());
+  for (size_t b = 0; b < std::min(tableHistogram.size(), histogram.size()); b++)
+    nDifferent += !IsClose(tableHistogram[b], histogram[b]);
+
+  // The return parameters
+  NamedValues values = ReadValues(rpf, " = ");
+  nDifferent += !IsCloseValue(values, "surfaceArea", expected["Area"]);
+  nDifferent += !IsCloseValue(values, "meanThickness", expected["Mean"]);
+  nDifferent += !IsCloseValue(values, "medianThickness", expected["Median"]);
+  std::vector<double> rpfHistogram;
+  for (size_t i = 0; i < values.size(); i++)
+    if (values[i].first == "thicknessHistogram")
+      rpfHistogram = values[i].second;
+  CHECK(rpfHistogram.size() == histogram.size());
+  for (size_t b = 0; b < std::min(rpfHistogram.size(), histogram.size()); b++)
+    nDifferent += !IsClose(rpfHistogram[b], histogram[b]);
+
+  CHECK(nDifferent == 0);
+}
+
+void TestGenerators(const std::string &dir, const std::string &surface)
+{
+  std::string output = dir + "/generators.vtk";
+  CHECK(RunSkeletonTool({ surface, output }) == EXIT_SUCCESS);
+
+  vtkSmartPointer<vtkPolyData> skel = ReadSkeleton(output);
+  vtkDataArray *genA = skel->GetCellData()->GetArray("GeneratorA");
+  vtkDataArray *genB = skel->GetCellData()->GetArray("GeneratorB");
+  vtkDataArray *radius = skel->GetCellData()->GetArray("Radius");
+  CHECK(genA && genB && radius);
+  if (!genA || !genB || !radius)
+    return;
+
+  // Ids are not averaged over the faces around the points
+  CHECK(!skel->GetPointData()->GetArray("GeneratorA"));
+  CHECK(skel->GetPointData()->GetArray("Radius"));
+
+  vtkSmartPointer<vtkPolyData> bnd = ReadBoundary(surface);
+  vtkNew<vtkStaticPointLocator> locator;
+  locator->SetDataSet(bnd);
+  locator->BuildLocator();
+  const double tol = 1e-4 * bnd->GetLength();
+
+  size_t nDifferent = 0;
+  vtkNew<vtkIdList> ids;
+  for (vtkIdType i = 0; i < skel->GetNumberOfCells(); i++) {
+    vtkIdType a = static_cast<vtkIdType>(genA->GetTuple1(i)), b = static_cast<vtkIdType>(genB->GetTuple1(i));
+    if (a < 0 || b < 0 || a >= bnd->GetNumberOfPoints() || b >= bnd->GetNumberOfPoints() || a == b) {
+      nDifferent++;
+      continue;
+    }
+    double xa[3], xb[3];
+    bnd->GetPoint(a, xa);
+    bnd->GetPoint(b, xb);
+    nDifferent += std::abs(sqrt(vtkMath::Distance2BetweenPoints(xa, xb)) - radius->GetTuple1(i)) > tol;
+
+    skel->GetCellPoints(i, ids);
+    for (vtkIdType k = 0; k < ids->GetNumberOfIds(); k++) {
+      double x[3], y[3];
+      skel->GetPoint(ids->GetId(k), x);
+      bnd->GetPoint(locator->FindClosestPoint(x), y);
+      double dNearest = sqrt(vtkMath::Distance2BetweenPoints(x, y));
+      nDifferent += std::abs(sqrt(vtkMath::Distance2BetweenPoints(x, xa)) - dNearest) > tol
+                    || std::abs(sqrt(vtkMath::Distance2BetweenPoints(x, xb)) - dNearest) > tol;
+    }
+  }
+
+  CHECK(skel->GetNumberOfCells() > 0);
+  CHECK(nDifferent == 0);
+}
+
+// The stage names of a return parameter file, in the order of the file
+std::vector<std::string> ReadStageNames(const std::string &filename)
+{
+  std::vector<std::string> names;
+  std::ifstream fin(filename.c_str());
+  std::string line, prefix = "stageNames = ";
+  while (std::getline(fin, line)) {
+    if (line.compare(0, prefix.size(), prefix) != 0)
+      continue;
+    std::istringstream iss(line.substr(prefix.size()));
+    for (std::string item; std::getline(iss, item, ',');)
+      names.push_back(item);
+  }
+  return names;
+}
+
+// The number of items of a stage of a return parameter file, -1 if the stage
+// did not run
+double GetStageItems(const std::string &filename, const std::string &stage)
+{
+  std::vector<std::string> names = ReadStageNames(filename);
+  NamedValues values = ReadValues(filename, " = ");
+  for (size_t i = 0; i < values.size(); i++) {
+    if (values[i].first != "stageItems" || values[i].second.size() != names.size())
+      continue;
+    for (size_t k = 0; k < names.size(); k++)
+      if (names[k] == stage)
+        return values[i].second[k];
+  }
+  return -1.0;
+}
+
+void TestCache(const std::string &dir, const std::string &surface)
+{
+  std::string cache = dir + "/cache";
+  std::string plain = dir + "/uncached.vtk", miss = dir + "/cache_miss.vtk", hit = dir + "/cache_hit.vtk";
+  std::string rpfMiss = dir + "/cache_miss.txt", rpfHit = dir + "/cache_hit.txt";
+  CHECK(RunSkeletonTool({ surface, plain }) == EXIT_SUCCESS);
+  CHECK(RunSkeletonTool({ "--cacheDirectory", cache, "--returnparameterfile", rpfMiss, surface, miss })
+        == EXIT_SUCCESS);
+  CHECK(RunSkeletonTool({ "--cacheDirectory", cache, "--returnparameterfile", rpfHit, surface, hit })
+        == EXIT_SUCCESS);
+
+  // The first run stores the diagram, which the second one reads instead of
+  // computing the inside flags
+  CHECK(GetStageItems(rpfMiss, "cache") == 0.0);
+  CHECK(GetStageItems(rpfMiss, "inside") > 0.0);
+  CHECK(GetStageItems(rpfHit, "cache") > 0.0);
+  CHECK(GetStageItems(rpfHit, "inside") < 0.0);
+
+  vtksys::Directory directory;
+  directory.Load(cache);
+  size_t nEntries = 0;
+  for (unsigned long i = 0; i < directory.GetNumberOfFiles(); i++)
+    nEntries += vtksys::SystemTools::GetFilenameLastExtension(directory.GetFile(i)) == ".skvc";
+  CHECK(nEntries == 1);
+
+  vtkSmartPointer<vtkPolyData> expected = ReadSkeleton(plain);
+  CHECK(expected->GetNumberOfCells() > 0);
+  CHECK(IsSameSkeleton(ReadSkeleton(miss), expected));
+  CHECK(IsSameSkeleton(ReadSkeleton(hit), expected));
+}
+
+} // end of anonymous namespace
+
+int main(int argc, char *argv[])
+{
+  if (argc < 2) {
+    std::cerr << "Usage: " << argv[0] << " <temporary directory>" << std::endl;
+    return EXIT_FAILURE;
+  }
+  std::string dir = std::string(argv[1]) + "/SkeletonToolTest";
+  vtksys::SystemTools::RemoveADirectory(dir);
+  vtksys::SystemTools::MakeDirectory(dir);
+
+  // Run the parallel stages on threads even if VTK defaults to the
+  // sequential backend
+  vtkSMPTools::SetBackend("STDThread");
+
+  std::string surface = dir + "/ellipsoid.vtk";
+  WriteEllipsoid(surface);
+
+  TestThreads(dir, surface);
+  TestPruning(dir, surface);
+  TestSweep(dir, surface);
+  TestThickness(dir, surface);
+  TestGenerators(dir, surface);
+  TestCache(dir, surface);
+
+  return TestResult();
+}
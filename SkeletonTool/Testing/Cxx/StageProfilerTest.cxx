@@ -0,0 +1,132 @@
+#include "StageProfiler.h"
+#include "TestingMacros.h"
+
+#include <chrono>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <iostream>
+#include <sstream>
+#include <string>
+#include <thread>
+#include <vector>
+
+/**
+ * Tests of StageProfiler: the stages are listed in the order in which they
+ * first ran, a stage that runs again accumulates its time and items, the
+ * time of a stage is the time between its start and its end, and its peak
+ * memory grows with the memory that it allocated. The table and the JSON
+ * report list the stages with their counts.
+ */
+
+namespace {
+
+void Wait(int milliseconds)
+{
+  std::this_thread::sleep_for(std::chrono::milliseconds(milliseconds));
+}
+
+void TestStages()
+{
+  StageProfiler profiler;
+  CHECK(profiler.GetStages().empty());
+
+  // Stopping with no current stage does nothing
+  profiler.Stop(7);
+  CHECK(profiler.GetStages().empty());
+
+  profiler.Start("first");
+  Wait(50);
+  profiler.Stop(4);
+  profiler.Start("second");
+  Wait(20);
+  profiler.Stop(5);
+  profiler.Stop(11);
+
+  // Starting a stage ends the current one
+  profiler.Start("third");
+  profiler.Start("first");
+  Wait(30);
+  profiler.Stop(3);
+
+  const std::vector<StageProfiler::Stage> &stages = profiler.GetStages();
+  CHECK(stages.size() == 3);
+  if (stages.size() != 3)
+    return;
+  CHECK(stages[0].Name == "first");
+  CHECK(stages[0].Runs == 2);
+  CHECK(stages[0].Items == 7);
+  CHECK(stages[0].Time >= 0.075 && stages[0].Time < 0.075 + 1.0);
+  CHECK(stages[1].Name == "second");
+  CHECK(stages[1].Runs == 1);
+  CHECK(stages[1].Items == 5);
+  CHECK(stages[1].Time >= 0.015 && stages[1].Time < stages[0].Time);
+  CHECK(stages[2].Name == "third");
+  CHECK(stages[2].Runs == 1);
+  CHECK(stages[2].Items == 0);
+  CHECK(stages[2].Time < stages[1].Time);
+  CHECK(profiler.GetTotalTime() >= stages[0].Time + stages[1].Time + stages[2].Time);
+}
+
+void TestPeakMemory()
+{
+  StageProfiler profiler;
+  profiler.Start("small");
+  profiler.Stop();
+
+  // Touch every page, so that the memory is resident
+  profiler.Start("large");
+  std::vector<char> block(256 << 20);
+  memset(block.data(), 1, block.size());
+  profiler.Stop(block[block.size() / 2]);
+
+  const std::vector<StageProfiler::Stage> &stages = profiler.GetStages();
+  CHECK(stages[0].PeakMemory > 0.0);
+  CHECK(stages[1].PeakMemory >= stages[0].PeakMemory + 200.0);
+  CHECK(StageProfiler::GetPeakMemory() >= stages[1].PeakMemory);
+}
+
+void TestReports(const std::string &dir)
+{
+  StageProfiler profiler;
+  profiler.Start("qhull");
+  profiler.Stop(42);
+  profiler.Start("pruning");
+  profiler.Stop(17);
+
+  std::ostringstream table;
+  profiler.Print(table);
+  CHECK(table.str().find("qhull") != std::string::npos);
+  CHECK(table.str().find("pruning") != std::string::npos);
+  CHECK(table.str().find("Total") != std::string::npos);
+
+  std::string filename = dir + "/StageProfilerTest.json";
+  CHECK(profiler.WriteJSON(filename));
+  std::ifstream fin(filename.c_str());
+  std::stringstream json;
+  json << fin.rdbuf();
+  CHECK(json.str().find("\"name\": \"qhull\"") != std::string::npos);
+  CHECK(json.str().find("\"items\": 42") != std::string::npos);
+  CHECK(json.str().find("\"name\": \"pruning\"") != std::string::npos);
+  CHECK(json.str().find("\"items\": 17") != std::string::npos);
+  CHECK(json.str().find("\"totalTime\"") != std::string::npos);
+
+  // A report that cannot be written is reported
+  CHECK(!profiler.WriteJSON(dir + "/missing/StageProfilerTest.json"));
+}
+
+} // end of anonymous namespace
+
+int main(int argc, char *argv[])
+{
+  if (argc < 2) {
+    std::cerr << "Usage: " << argv[0] << " <temporary directory>" << std::endl;
+    return EXIT_FAILURE;
+  }
+
+  TestStages();
+  TestPeakMemory();
+  TestReports(argv[1]);
+
+  return TestResult();
+}
@@ -0,0 +1,138 @@
+#include "SurfaceOccupancyGrid.h"
+#include "TestingMacros.h"
+
+#include <vtkDataArray.h>
+#include <vtkNew.h>
+#include <vtkParametricFunctionSource.h>
+#include <vtkParametricTorus.h>
+#include <vtkPointData.h>
+#include <vtkPoints.h>
+#include <vtkPolyData.h>
+#include <vtkSelectEnclosedPoints.h>
+#include <vtkSmartPointer.h>
+#include <vtkSphereSource.h>
+#include <vtkTransform.h>
+#include <vtkTransformPolyDataFilter.h>
+#include <vtkTriangleFilter.h>
+
+#include <cstdlib>
+#include <iostream>
+#include <random>
+
+/**
+ * Test of the occupancy grid of the inside/outside test against
+ * vtkSelectEnclosedPoints. The regions of the grid are classified by
+ * vtkSelectEnclosedPoints at their seeds, as SkeletonTool does. Every point
+ * that the grid classifies on its own, away from the surface, must then be
+ * on the side given by vtkSelectEnclosedPoints. The surfaces are an
+ * ellipsoid and a torus, whose outside region passes through its hole.
+ */
+
+namespace {
+
+const double TOLERANCE = 1e-6;
+
+vtkSmartPointer<vtkPolyData> CreateEllipsoid()
+{
+  vtkNew<vtkSphereSource> sphere;
+  sphere->SetThetaResolution(40);
+  sphere->SetPhiResolution(40);
+  vtkNew<vtkTransform> transform;
+  transform->Scale(30, 20, 10);
+  vtkNew<vtkTransformPolyDataFilter> fTransform;
+  fTransform->SetInputConnection(sphere->GetOutputPort());
+  fTransform->SetTransform(transform);
+  fTransform->Update();
+  return fTransform->GetOutput();
+}
+
+vtkSmartPointer<vtkPolyData> CreateTorus()
+{
+  vtkNew<vtkParametricTorus> torus;
+  torus->SetRingRadius(20);
+  torus->SetCrossSectionRadius(6);
+  vtkNew<vtkParametricFunctionSource> source;
+  source->SetParametricFunction(torus);
+  source->SetUResolution(80);
+  source->SetVResolution(30);
+  vtkNew<vtkTriangleFilter> fTriangle;
+  fTriangle->SetInputConnection(source->GetOutputPort());
+  fTriangle->Update();
+  return fTriangle->GetOutput();
+}
+
+void TestSurface(vtkPolyData *surface)
+{
+  SurfaceOccupancyGrid grid;
+  grid.Build(surface, TOLERANCE);
+  CHECK(grid.GetNumberOfSurfaceVoxels() > 0);
+  CHECK(grid.GetNumberOfRegions() >= 2);
+
+  vtkNew<vtkSelectEnclosedPoints> select;
+  select->SetTolerance(TOLERANCE);
+  select->Initialize(surface);
+  size_t nInsideRegions = 0;
+  for (size_t k = 0; k < grid.GetNumberOfRegions(); k++) {
+    double x[3];
+    grid.GetRegionSeed(k, x);
+    bool isInside = select->IsInsideSurface(x) != 0;
+    grid.SetRegionInside(k, isInside);
+    nInsideRegions += isInside;
+  }
+  select->Complete();
+  CHECK(nInsideRegions > 0);
+
+  // Random points in the bounding box of the surface and a little beyond
+  double bounds[6];
+  surface->GetBounds(bounds);
+  std::mt19937 random(1);
+  vtkNew<vtkPoints> points;
+  for (int i = 0; i < 20000; i++) {
+    double x[3];
+    for (int d = 0; d < 3; d++) {
+      double margin = 0.1 * (bounds[2 * d + 1] - bounds[2 * d]);
+      x[d] = std::uniform_real_distribution<double>(bounds[2 * d] - margin, bounds[2 * d + 1] + margin)(random);
+    }
+    points->InsertNextPoint(x);
+  }
+  vtkNew<vtkPolyData> input;
+  input->SetPoints(points);
+
+  vtkNew<vtkSelectEnclosedPoints> fSelect;
+  fSelect->SetInputData(input);
+  fSelect->SetSurfaceData(surface);
+  fSelect->SetTolerance(TOLERANCE);
+  fSelect->Update();
+  vtkDataArray *expected = fSelect->GetOutput()->GetPointData()->GetArray("SelectedPoints");
+  CHECK(expected != NULL);
+  if (!expected)
+    return;
+
+  size_t nInside = 0, nOutside = 0, nNear = 0, nDifferent = 0;
+  for (vtkIdType i = 0; i < points->GetNumberOfPoints(); i++) {
+    double x[3];
+    points->GetPoint(i, x);
+    bool isInside = expected->GetTuple1(i) != 0;
+    switch (grid.Classify(x)) {
+      case SurfaceOccupancyGrid::INSIDE: nInside++; nDifferent += !isInside; break;
+      case SurfaceOccupancyGrid::OUTSIDE: nOutside++; nDifferent += isInside; break;
+      default: nNear++; break;
+    }
+  }
+
+  // Most points are away from the surface and need no exact test
+  CHECK(nInside > 0);
+  CHECK(nOutside > 0);
+  CHECK(nNear < (nInside + nOutside) / 2);
+  CHECK(nDifferent == 0);
+}
+
+} // end of anonymous namespace
+
+int main(int, char *[])
+{
+  TestSurface(CreateEllipsoid());
+  TestSurface(CreateTorus());
+
+  return TestResult();
+}
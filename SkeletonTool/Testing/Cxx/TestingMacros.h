@@ -0,0 +1,36 @@
+#ifndef __TestingMacros_h_
+#define __TestingMacros_h_
+
+#include <cstdlib>
+#include <iostream>
+
+/**
+ * Checks of the tests of SkeletonTool. A failed CHECK prints the condition
+ * with its location and is counted, so that a test runs all its checks and
+ * then returns TestResult().
+ */
+
+namespace {
+
+int nFailures = 0;
+
+// Exit code of a test, after printing the number of failed checks
+int TestResult()
+{
+  if (nFailures > 0) {
+    std::cerr << nFailures << " checks failed" << std::endl;
+    return EXIT_FAILURE;
+  }
+  return EXIT_SUCCESS;
+}
+
+} // end of anonymous namespace
+
+#define CHECK(condition)                                                      \
+  if (!(condition)) {                                                         \
+    std::cerr << __FILE__ << ":" << __LINE__ << ": check failed: " #condition \
+              << std::endl;                                                   \
+    nFailures++;                                                              \
+  }
+
+#endif
@@ -0,0 +1,153 @@
+#include "VoronoiCache.h"
+#include "TestingMacros.h"
+
+#include <vtkNew.h>
+#include <vtkPolyData.h>
+#include <vtkSphereSource.h>
+
+#include <vtksys/Directory.hxx>
+#include <vtksys/SystemTools.hxx>
+
+#include <chrono>
+#include <cstdlib>
+#include <iostream>
+#include <string>
+#include <thread>
+#include <vector>
+
+/**
+ * Tests of VoronoiCache: the keys change with the surface and with the way
+ * the diagram is computed, an entry reads back as it was stored, and the
+ * cache stays within its size by removing the least recently used entries,
+ * reading an entry counting as a use.
+ */
+
+namespace {
+
+// A diagram with the given number of vertices, each of its own ridge
+QhullVoronoiDiagram CreateDiagram(int nVertices, double offset)
+{
+  QhullVoronoiDiagram vd;
+  for (int i = 0; i < nVertices; i++) {
+    vd.Vertices.push_back(offset + i);
+    vd.Vertices.push_back(offset - i);
+    vd.Vertices.push_back(offset * i);
+    int ridge[] = { 4, i, i + 1, i + 1, 0 };
+    vd.Ridges.insert(vd.Ridges.end(), ridge, ridge + 5);
+  }
+  vd.NumberOfVertices = nVertices;
+  vd.NumberOfRidges = nVertices;
+  return vd;
+}
+
+// Total size of the files of a cache directory, and their number
+size_t GetCacheSize(const std::string &dir, size_t &nEntries)
+{
+  vtksys::Directory directory;
+  directory.Load(dir);
+  size_t nBytes = 0;
+  nEntries = 0;
+  for (unsigned long i = 0; i < directory.GetNumberOfFiles(); i++) {
+    std::string name = dir + "/" + directory.GetFile(i);
+    if (vtksys::SystemTools::FileIsDirectory(name))
+      continue;
+    nBytes += vtksys::SystemTools::FileLength(name);
+    nEntries++;
+  }
+  return nBytes;
+}
+
+void TestKeys()
+{
+  vtkNew<vtkSphereSource> sphere;
+  sphere->Update();
+  vtkPolyData *surface = sphere->GetOutput();
+  std::vector<vtkIdType> all, some(1, 3);
+
+  std::string key = VoronoiCache::ComputeKey(surface, 1e-6, all, false, 0);
+  CHECK(key == VoronoiCache::ComputeKey(surface, 1e-6, all, false, 0));
+  CHECK(key != VoronoiCache::ComputeKey(surface, 1e-5, all, false, 0));
+  CHECK(key != VoronoiCache::ComputeKey(surface, 1e-6, some, false, 0));
+  CHECK(key != VoronoiCache::ComputeKey(surface, 1e-6, all, true, 0));
+  CHECK(key != VoronoiCache::ComputeKey(surface, 1e-6, all, false, 100));
+  CHECK(VoronoiCache::ComputeKey(surface, 1e-6, all, false, 100)
+        != VoronoiCache::ComputeKey(surface, 1e-6, all, false, 200));
+
+  vtkNew<vtkPolyData> moved;
+  moved->DeepCopy(surface);
+  double x[3];
+  moved->GetPoint(0, x);
+  x[0] += 1e-9;
+  moved->GetPoints()->SetPoint(0, x);
+  CHECK(key != VoronoiCache::ComputeKey(moved, 1e-6, all, false, 0));
+}
+
+void TestRoundTrip(const std::string &dir)
+{
+  VoronoiCache cache(dir, 1 << 20);
+  QhullVoronoiDiagram vd = CreateDiagram(10, 0.5), read;
+  bool ptin[10] = { true, false, true, true, false, false, true, false, true, true };
+  std::vector<char> ptinRead;
+
+  CHECK(!cache.Load("entry", read, ptinRead));
+  CHECK(cache.Store("entry", vd, ptin));
+  CHECK(cache.Load("entry", read, ptinRead));
+  CHECK(read.NumberOfVertices == vd.NumberOfVertices);
+  CHECK(read.NumberOfRidges == vd.NumberOfRidges);
+  CHECK(read.Vertices == vd.Vertices);
+  CHECK(read.Ridges == vd.Ridges);
+  CHECK(ptinRead == std::vector<char>(ptin, ptin + 10));
+}
+
+void TestEviction(const std::string &dir)
+{
+  // Room for two entries and a half
+  QhullVoronoiDiagram vd = CreateDiagram(1000, 1.0);
+  std::vector<char> ptinData(1000, 1), ptinRead;
+  const bool *ptin = reinterpret_cast<const bool *>(ptinData.data());
+  VoronoiCache probe(dir + "/probe", 1 << 30);
+  CHECK(probe.Store("probe", vd, ptin));
+  size_t nEntries, nEntryBytes = GetCacheSize(dir + "/probe", nEntries);
+  size_t nMaxBytes = nEntryBytes * 5 / 2;
+  VoronoiCache cache(dir + "/lru", nMaxBytes);
+
+  // The first entry, read after the second was stored, is kept over it. The
+  // times of the entries are compared to the second
+  const std::chrono::milliseconds tick(1100);
+  CHECK(cache.Store("first", vd, ptin));
+  std::this_thread::sleep_for(tick);
+  CHECK(cache.Store("second", vd, ptin));
+  std::this_thread::sleep_for(tick);
+  QhullVoronoiDiagram read;
+  CHECK(cache.Load("first", read, ptinRead));
+  CHECK(cache.Store("third", vd, ptin));
+
+  CHECK(GetCacheSize(dir + "/lru", nEntries) <= nMaxBytes);
+  CHECK(nEntries == 2);
+  CHECK(cache.Load("first", read, ptinRead));
+  CHECK(!cache.Load("second", read, ptinRead));
+  CHECK(cache.Load("third", read, ptinRead));
+
+  // An entry larger than the whole cache is not stored
+  VoronoiCache small(dir + "/small", nEntryBytes - 1);
+  CHECK(!small.Store("entry", vd, ptin));
+}
+
+} // end of anonymous namespace
+
+int main(int argc, char *argv[])
+{
+  if (argc < 2) {
+    std::cerr << "Usage: " << argv[0] << " <temporary directory>" << std::endl;
+    return EXIT_FAILURE;
+  }
+  std::string dir = std::string(argv[1]) + "/VoronoiCacheTest";
+  vtksys::SystemTools::RemoveADirectory(dir);
+  vtksys::SystemTools::MakeDirectory(dir);
+
+  TestKeys();
+  TestRoundTrip(dir + "/roundtrip");
+  TestEviction(dir);
+
+  return TestResult();
+}
@@ -0,0 +1,232 @@
+#include "VoronoiCache.h"
+
+#include <vtkPolyData.h>
+#include <vtkCellArray.h>
+#include <vtkIdList.h>
+#include <vtkNew.h>
+
+#include <vtksys/Directory.hxx>
+#include <vtksys/SystemTools.hxx>
+
+#include <algorithm>
+#include <cstdio>
+#include <cstring>
+#include <fstream>
+#include <stdint.h>
+
+namespace {
+
+// Bump the version when the layout of the entries changes
+const char ENTRY_MAGIC[4] = { 'S', 'K', 'V', 'C' };
+const uint32_t ENTRY_VERSION = 1;
+const char ENTRY_EXTENSION[] = ".skvc";
+
+struct EntryHeader
+{
+  char Magic[4];
+  uint32_t Version;
+  uint64_t NumberOfVertices;
+  uint64_t NumberOfRidges;
+  uint64_t RidgeArraySize;
+};
+
+// 64-bit FNV-1a hash
+class FNV1aHash
+{
+public:
+  FNV1aHash() : m_Hash(14695981039346656037ULL) {}
+
+  void Add(const void *data, size_t n)
+  {
+    const unsigned char *bytes = static_cast<const unsigned char *>(data);
+    for (size_t i = 0; i < n; i++) {
+      m_Hash ^= bytes[i];
+      m_Hash *= 1099511628211ULL;
+    }
+  }
+
+  template <class T> void Add(const T &value) { Add(&value, sizeof(T)); }
+
+  uint64_t GetHash() const { return m_Hash; }
+
+private:
+  uint64_t m_Hash;
+};
+
+struct CacheFile
+{
+  std::string Name;
+  long Time;
+  size_t Size;
+  bool operator < (const CacheFile &other) const { return Time < other.Time; }
+};
+
+} // end of anonymous namespace
+
+VoronoiCache::VoronoiCache(const std::string &directory, size_t nMaxBytes)
+  : m_Directory(directory), m_MaxBytes(nMaxBytes)
+{
+}
+
+std::string VoronoiCache::ComputeKey(vtkPolyData *surface, double xSearchTol,
+                                     const std::vector<vtkIdType> &generators,
+                                     bool isQhullTextFile, int voronoiMemoryBudget)
+{
+  FNV1aHash hash;
+  hash.Add(ENTRY_VERSION);
+  hash.Add(xSearchTol);
+  hash.Add(isQhullTextFile);
+  hash.Add(voronoiMemoryBudget);
+
+  int64_t nPoints = surface->GetNumberOfPoints();
+  hash.Add(nPoints);
+  for (vtkIdType i = 0; i < surface->GetNumberOfPoints(); i++) {
+    double x[3];
+    surface->GetPoint(i, x);
+    hash.Add(x, sizeof(x));
+  }
+
+  vtkNew<vtkIdList> ids;
+  vtkCellArray *polys = surface->GetPolys();
+  int64_t nCells = polys->GetNumberOfCells();
+  hash.Add(nCells);
+  for (polys->InitTraversal(); polys->GetNextCell(ids);) {
+    int64_t n = ids->GetNumberOfIds();
+    hash.Add(n);
+    for (vtkIdType k = 0; k < ids->GetNumberOfIds(); k++) {
+      int64_t id = ids->GetId(k);
+      hash.Add(id);
+    }
+  }
+
+  int64_t nGenerators = generators.size();
+  hash.Add(nGenerators);
+  for (size_t k = 0; k < generators.size(); k++) {
+    int64_t id = generators[k];
+    hash.Add(id);
+  }
+
+  char key[32];
+  snprintf(key, sizeof(key), "%016llx", static_cast<unsigned long long>(hash.GetHash()));
+  return key;
+}
+
+std::string VoronoiCache::GetEntryFileName(const std::string &key) const
+{
+  return m_Directory + "/" + key + ENTRY_EXTENSION;
+}
+
+bool VoronoiCache::Load(const std::string &key, QhullVoronoiDiagram &vd, std::vector<char> &ptin)
+{
+  std::string fn = GetEntryFileName(key);
+  std::ifstream fin(fn.c_str(), std::ios::binary);
+  if (!fin.good())
+    return false;
+
+  // Check the header against the size of the file
+  EntryHeader header;
+  if (!fin.read(reinterpret_cast<char *>(&header), sizeof(header))
+      || memcmp(header.Magic, ENTRY_MAGIC, sizeof(ENTRY_MAGIC)) != 0 || header.Version != ENTRY_VERSION)
+    return false;
+
+  size_t nExpected = sizeof(header) + header.NumberOfVertices * (3 * sizeof(double) + 1)
+      + header.RidgeArraySize * sizeof(int32_t);
+  if (vtksys::SystemTools::FileLength(fn) != nExpected)
+    return false;
+
+  // Read the arrays in bulk
+  std::vector<int32_t> ridges(header.RidgeArraySize);
+  vd.Vertices.resize(3 * header.NumberOfVertices);
+  ptin.resize(header.NumberOfVertices);
+  fin.read(reinterpret_cast<char *>(vd.Vertices.data()), vd.Vertices.size() * sizeof(double));
+  fin.read(reinterpret_cast<char *>(ridges.data()), ridges.size() * sizeof(int32_t));
+  fin.read(ptin.data(), ptin.size());
+  if (!fin)
+    return false;
+
+  vd.Ridges.assign(ridges.begin(), ridges.end());
+  vd.NumberOfVertices = header.NumberOfVertices;
+  vd.NumberOfRidges = header.NumberOfRidges;
+
+  // Mark the entry as recently used
+  fin.close();
+  vtksys::SystemTools::Touch(fn, false);
+  return true;
+}
+
+bool VoronoiCache::Store(const std::string &key, const QhullVoronoiDiagram &vd, const bool *ptin)
+{
+  EntryHeader header;
+  memcpy(header.Magic, ENTRY_MAGIC, sizeof(ENTRY_MAGIC));
+  header.Version = ENTRY_VERSION;
+  header.NumberOfVertices = vd.NumberOfVertices;
+  header.NumberOfRidges = vd.NumberOfRidges;
+  header.RidgeArraySize = vd.Ridges.size();
+
+  // Entries larger than the whole cache are not stored
+  size_t nBytes = sizeof(header) + vd.NumberOfVertices * (3 * sizeof(double) + 1)
+      + vd.Ridges.size() * sizeof(int32_t);
+  if (nBytes > m_MaxBytes)
+    return false;
+
+  if (!vtksys::SystemTools::MakeDirectory(m_Directory))
+    return false;
+
+  // Write to a temporary file and rename it, so that other processes never
+  // see a partial entry
+  std::string fn = GetEntryFileName(key), fnTemp = fn + ".partial";
+  {
+    std::ofstream fout(fnTemp.c_str(), std::ios::binary);
+    std::vector<int32_t> ridges(vd.Ridges.begin(), vd.Ridges.end());
+    std::vector<char> flags(ptin, ptin + vd.NumberOfVertices);
+    fout.write(reinterpret_cast<const char *>(&header), sizeof(header));
+    fout.write(reinterpret_cast<const char *>(vd.Vertices.data()), vd.Vertices.size() * sizeof(double));
+    fout.write(reinterpret_cast<const char *>(ridges.data()), ridges.size() * sizeof(int32_t));
+    fout.write(flags.data(), flags.size());
+    if (!fout) {
+      fout.close();
+      vtksys::SystemTools::RemoveFile(fnTemp);
+      return false;
+    }
+  }
+
+  // On Windows, rename fails when the target exists
+  if (rename(fnTemp.c_str(), fn.c_str()) != 0) {
+    vtksys::SystemTools::RemoveFile(fn);
+    if (rename(fnTemp.c_str(), fn.c_str()) != 0) {
+      vtksys::SystemTools::RemoveFile(fnTemp);
+      return false;
+    }
+  }
+
+  Evict();
+  return true;
+}
+
+void VoronoiCache::Evict()
+{
+  vtksys::Directory dir;
+  if (!dir.Load(m_Directory))
+    return;
+
+  // The entries, from the least to the most recently used
+  std::vector<CacheFile> files;
+  size_t nTotal = 0;
+  for (unsigned long i = 0; i < dir.GetNumberOfFiles(); i++) {
+    std::string name = dir.GetFile(i);
+    if (vtksys::SystemTools::GetFilenameLastExtension(name) != ENTRY_EXTENSION)
+      continue;
+    CacheFile file;
+    file.Name = m_Directory + "/" + name;
+    file.Time = vtksys::SystemTools::ModifiedTime(file.Name);
+    file.Size = vtksys::SystemTools::FileLength(file.Name);
+    files.push_back(file);
+    nTotal += file.Size;
+  }
+  std::stable_sort(files.begin(), files.end());
+
+  for (size_t i = 0; i < files.size() && nTotal > m_MaxBytes; i++) {
+    if (vtksys::SystemTools::RemoveFile(files[i].Name))
+      nTotal -= files[i].Size;
+  }
+}
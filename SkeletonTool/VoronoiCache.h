@@ -0,0 +1,58 @@
+#ifndef __VoronoiCache_h_
+#define __VoronoiCache_h_
+
+#include "QhullVoronoi.h"
+
+#include <vtkType.h>
+
+#include <string>
+#include <vector>
+#include <cstddef>
+
+class vtkPolyData;
+
+/**
+ * An on-disk cache of Voronoi diagrams and of the flags telling which Voronoi
+ * vertices are inside the boundary. The entries are addressed by a hash of
+ * the cleaned boundary geometry, of the inside test tolerance, of the
+ * generators and of the way qhull is run, so a rerun on an unchanged surface
+ * finds its diagram no matter what the pruning parameters are.
+ *
+ * Each entry is a binary file in the cache directory, holding the vertex
+ * coordinates, the ridges and the flags as flat arrays. Reading an entry
+ * marks it as recently used; storing an entry evicts the least recently used
+ * ones until the cache fits in its size limit.
+ */
+class VoronoiCache
+{
+public:
+  /** Create a cache in the given directory, limited to nMaxBytes bytes */
+  VoronoiCache(const std::string &directory, size_t nMaxBytes);
+
+  /**
+   * Compute the key of a boundary surface, inside test tolerance and set of
+   * generators (the ids of the boundary vertices, all of them if empty), for
+   * a diagram computed through qhull's text output or not, and within the
+   * given memory budget in megabytes (0 for a single qhull run)
+   */
+  static std::string ComputeKey(vtkPolyData *surface, double xSearchTol,
+                                const std::vector<vtkIdType> &generators,
+                                bool isQhullTextFile, int voronoiMemoryBudget);
+
+  /** Read an entry, returns false if there is no valid entry for the key */
+  bool Load(const std::string &key, QhullVoronoiDiagram &vd, std::vector<char> &ptin);
+
+  /** Write an entry, returns false if it could not be written */
+  bool Store(const std::string &key, const QhullVoronoiDiagram &vd, const bool *ptin);
+
+private:
+  std::string m_Directory;
+  size_t m_MaxBytes;
+
+  std::string GetEntryFileName(const std::string &key) const;
+
+  // Remove the least recently used entries until the cache fits
+  void Evict();
+};
+
+#endif
@@ -41,6 +41,10 @@ public:
     m_HeapIndex = new int[nWeights];
     m_Heap = new unsigned int[nWeights];
     m_HeapSize = 0;
+
+    // No element is in the heap initially
+    for(int i=0;i<m_ReserveSize;i++)
+      m_HeapIndex[i] = m_ReserveSize;
     }
 
   ~BinaryHeap() 
@@ -66,6 +70,20 @@ public:
       }
     }
 
+  /**
+   * Remove all elements from the heap. The weights are not changed. This
+   * is used by Dijkstra's algorithm when the elements are inserted into the
+   * heap as they are discovered, rather than all at once.
+   *
+   * This operation is O(k), where k is the number of elements in the heap
+   */
+  void Clear()
+    {
+    for(int i=0;i<m_HeapSize;i++)
+      m_HeapIndex[m_Heap[i]] = m_ReserveSize;
+    m_HeapSize = 0;
+    }
+
   /** 
    * Insert an element into the heap. 
    * 
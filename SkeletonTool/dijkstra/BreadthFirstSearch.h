@@ -0,0 +1,111 @@
+#ifndef __BreadthFirstSearch_h_
+#define __BreadthFirstSearch_h_
+
+#include <vector>
+#include <cstddef>
+#include <limits>
+
+/**
+ * This class finds the k-ring of a vertex, i.e., all the vertices that
+ * can be reached from it by following at most k edges, using a breadth
+ * first search that stops at depth k. It answers the same question as
+ * DijkstraShortestPath with unit edge weights and xMaxDistance = k, but
+ * without a heap, and the cost of a query is proportional to the size
+ * of the k-ring rather than to the size of the graph: vertices are marked
+ * as visited by stamping them with the query number, so nothing has to be
+ * reset between queries.
+ *
+ * The graph is given in the same METIS format as for DijkstraShortestPath
+ * (see ShortestPath.h): adjacency index array AI of length |V|+1 and
+ * adjacency array A of length |E|.
+ */
+class DepthLimitedBreadthFirstSearch
+{
+public:
+  /** Constant representing a vertex outside of the k-ring */
+  static const unsigned int NO_PATH = std::numeric_limits<unsigned int>::max();
+
+  DepthLimitedBreadthFirstSearch(
+    unsigned int nVertices, const unsigned int *xAdjacencyIndex,
+    const unsigned int *xAdjacency)
+    {
+    m_NumberOfVertices = nVertices;
+    m_AdjacencyIndex = xAdjacencyIndex;
+    m_Adjacency = xAdjacency;
+
+    // The stamps are initialized once, the depths are only read for
+    // vertices carrying the current stamp
+    m_Stamp = new unsigned int[nVertices];
+    m_Depth = new unsigned int[nVertices];
+    for(unsigned int i = 0; i < nVertices; i++)
+      m_Stamp[i] = 0;
+    m_CurrentStamp = 0;
+    }
+
+  virtual ~DepthLimitedBreadthFirstSearch()
+    {
+    delete[] m_Stamp;
+    delete[] m_Depth;
+    }
+
+  /**
+   * Visit all vertices that are at most nMaxDepth edges away from the
+   * source vertex.
+   */
+  void ComputeRing(unsigned int iSource, unsigned int nMaxDepth)
+    {
+    // Start a new query. When the stamp wraps around, clear the old stamps
+    if(++m_CurrentStamp == 0)
+      {
+      for(unsigned int i = 0; i < m_NumberOfVertices; i++)
+        m_Stamp[i] = 0;
+      m_CurrentStamp = 1;
+      }
+
+    // The ring doubles as the queue of the search
+    m_Ring.clear();
+    Visit(iSource, 0);
+
+    for(size_t q = 0; q < m_Ring.size(); q++)
+      {
+      unsigned int w = m_Ring[q];
+      unsigned int d = m_Depth[w];
+      if(d >= nMaxDepth) break;
+
+      for(unsigned int i = m_AdjacencyIndex[w]; i < m_AdjacencyIndex[w+1]; i++)
+        {
+        unsigned int iNbr = m_Adjacency[i];
+        if(m_Stamp[iNbr] != m_CurrentStamp)
+          Visit(iNbr, d + 1);
+        }
+      }
+    }
+
+  /**
+   * Get the number of edges between the source of the last query and the
+   * given vertex, or NO_PATH if the vertex is not in the k-ring
+   */
+  unsigned int GetDepth(unsigned int iVertex) const
+    { return m_Stamp[iVertex] == m_CurrentStamp ? m_Depth[iVertex] : NO_PATH; }
+
+  /** Get the vertices of the k-ring, in the order of increasing depth */
+  const std::vector<unsigned int> &GetRing() const
+    { return m_Ring; }
+
+protected:
+  const unsigned int *m_AdjacencyIndex, *m_Adjacency;
+  unsigned int m_NumberOfVertices;
+
+  unsigned int *m_Stamp, *m_Depth;
+  unsigned int m_CurrentStamp;
+  std::vector<unsigned int> m_Ring;
+
+  void Visit(unsigned int iVertex, unsigned int depth)
+    {
+    m_Stamp[iVertex] = m_CurrentStamp;
+    m_Depth[iVertex] = depth;
+    m_Ring.push_back(iVertex);
+    }
+};
+
+#endif
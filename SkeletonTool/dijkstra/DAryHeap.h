@@ -0,0 +1,244 @@
+#ifndef __DAryHeap_h_
+#define __DAryHeap_h_
+
+#include <iostream>
+#include <cassert>
+
+/**
+ * A d-ary heap with the same interface as BinaryHeap: the weights live in
+ * an array supplied by the caller, the heap only holds the element indices,
+ * and the weight of an element already in the heap can be changed.
+ *
+ * The children of the element at position i are at positions
+ * VArity * i + 1, ..., VArity * i + VArity, which lie next to each other in
+ * memory. The heap is shallower than a binary heap, so that decreasing the
+ * weight of an element, the most frequent operation of Dijkstra's
+ * algorithm, moves it across fewer levels, and popping the minimum compares
+ * the children of a level within one or two cache lines. The elements are
+ * moved into a hole rather than swapped, and the sifts are iterative.
+ *
+ * With VArity = 2 this is a binary heap.
+ */
+template<class TWeight, unsigned int VArity = 4>
+class DAryHeap {
+public:
+  /**
+   * Allocate the memory for the heap, passing in the array
+   * of weights. The weights can be changed later, but that
+   * should be done using the UpdateWeight method, not directly,
+   * as the heap property would be violated.
+   */
+  DAryHeap(unsigned int nWeights, TWeight *inWeightArray)
+    {
+    m_WeightArray = inWeightArray;
+    m_ReserveSize = nWeights;
+    m_HeapIndex = new unsigned int[nWeights];
+    m_Heap = new unsigned int[nWeights];
+    m_HeapSize = 0;
+
+    // No element is in the heap initially
+    for(unsigned int i=0;i<m_ReserveSize;i++)
+      m_HeapIndex[i] = m_ReserveSize;
+    }
+
+  ~DAryHeap()
+    {
+    delete[] m_Heap;
+    delete[] m_HeapIndex;
+    }
+
+  /**
+   * Reinitialize the heap to full size of the weights array. The weights
+   * are all set to the specified value in order to maintain the heap
+   * property.
+   *
+   * This operation is O(n)
+   */
+  void InsertAllElementsWithEqualWeights(TWeight weight)
+    {
+    m_HeapSize = m_ReserveSize;
+    for(unsigned int i=0;i<m_ReserveSize;i++)
+      {
+      m_WeightArray[i] = weight;
+      Put(i,i);
+      }
+    }
+
+  /**
+   * Remove all elements from the heap. The weights are not changed.
+   *
+   * This operation is O(k), where k is the number of elements in the heap
+   */
+  void Clear()
+    {
+    for(unsigned int i=0;i<m_HeapSize;i++)
+      m_HeapIndex[m_Heap[i]] = m_ReserveSize;
+    m_HeapSize = 0;
+    }
+
+  /**
+   * Insert an element into the heap.
+   *
+   * This operation is O(log_d n)
+   */
+  void InsertElement(unsigned int iElement)
+    { SiftUp(iElement, m_HeapSize++); }
+
+  /**
+   * Extract the smallest element from the heap, removing it
+   *
+   * This operation is O(d log_d n)
+   */
+  unsigned int PopMinimum()
+    {
+    assert(m_HeapSize > 0);
+    unsigned int rtn = m_Heap[0];
+    m_HeapIndex[rtn] = m_ReserveSize;
+
+    // Move the last element into the hole left at the root
+    if(--m_HeapSize > 0)
+      SiftDown(m_Heap[m_HeapSize], 0);
+
+    return rtn;
+    }
+
+  /**
+   * Lower the weight of an element and reorder the heap accordingly.
+   * The parameter to the call is the new weight of the element, not
+   * the difference. The new weight must not exceed the old one, and
+   * the element must be in the heap (use ContainsElement to check)
+   *
+   * This operation is O(log_d n)
+   */
+  void DecreaseElementWeight(unsigned int iElement, TWeight xNewWeight)
+    {
+    assert(m_HeapIndex[iElement] < m_HeapSize
+      && xNewWeight <= m_WeightArray[iElement]);
+
+    m_WeightArray[iElement] = xNewWeight;
+    SiftUp(iElement, m_HeapIndex[iElement]);
+    }
+
+  /**
+   * Increase the weight of an element.
+   * Same usage as DecreaseElementWeight
+   */
+  void IncreaseElementWeight(unsigned int iElement, TWeight xNewWeight)
+    {
+    assert(m_HeapIndex[iElement] < m_HeapSize
+      && xNewWeight >= m_WeightArray[iElement]);
+
+    m_WeightArray[iElement] = xNewWeight;
+    SiftDown(iElement, m_HeapIndex[iElement]);
+    }
+
+  /**
+   * Change the weight of an element and reorder the heap accordingly.
+   */
+  void UpdateElementWeight(unsigned int iElement, TWeight weight)
+    {
+    if(weight < m_WeightArray[iElement])
+      DecreaseElementWeight(iElement, weight);
+    else
+      IncreaseElementWeight(iElement, weight);
+    }
+
+  // Print the heap (prints on one line, not useful for big heaps)
+  void PrintHeap(std::ostream &out)
+    {
+    for(unsigned int j=0;j<m_ReserveSize;j++)
+      out << "[" << j << "," << m_WeightArray[j] << "] ";
+    out << std::endl;
+    for(unsigned int i=0;i<m_HeapSize;i++)
+      out << "[" << i << "," << m_Heap[i] << ","
+        << m_WeightArray[m_Heap[i]] << "] ";
+    out << std::endl;
+    }
+
+  /**
+   * Get the number of elements currenly in the heap. This is
+   * not the same as the capacity of the heap, i.e., number of
+   * weights
+   */
+  unsigned int GetSize()
+    { return m_HeapSize; }
+
+  /**
+   * Check if an element is in the heap or not.
+   *
+   * This operation is O(1)
+   */
+  bool ContainsElement(unsigned int iPos)
+    { return m_HeapIndex[iPos] < m_HeapSize; }
+
+private:
+  // The number of elements allocated
+  unsigned int m_ReserveSize;
+
+  // The number of elements in the heap
+  unsigned int m_HeapSize;
+
+  // The weights associated with the heap
+  TWeight *m_WeightArray;
+
+  // The position in the heap of each element
+  unsigned int *m_HeapIndex;
+
+  // The heap array
+  unsigned int *m_Heap;
+
+  // Put an element in the heap at position x
+  inline void Put(unsigned int iPos, unsigned int iElt)
+    {
+    m_Heap[iPos] = iElt;
+    m_HeapIndex[iElt] = iPos;
+    }
+
+  /** Move the hole at iPos up until iElement fits in it */
+  void SiftUp(unsigned int iElement, unsigned int iPos)
+    {
+    TWeight w = m_WeightArray[iElement];
+    while(iPos > 0)
+      {
+      unsigned int iParent = (iPos - 1) / VArity;
+      if(!(m_WeightArray[m_Heap[iParent]] > w))
+        break;
+      Put(iPos, m_Heap[iParent]);
+      iPos = iParent;
+      }
+    Put(iPos, iElement);
+    }
+
+  /** Move the hole at iPos down until iElement fits in it */
+  void SiftDown(unsigned int iElement, unsigned int iPos)
+    {
+    TWeight w = m_WeightArray[iElement];
+    for(;;)
+      {
+      // Find the smallest child, the first one winning ties
+      unsigned int iFirst = iPos * VArity + 1;
+      if(iFirst >= m_HeapSize)
+        break;
+      unsigned int iLast = iFirst + VArity < m_HeapSize ? iFirst + VArity : m_HeapSize;
+      unsigned int iMin = iFirst;
+      TWeight wMin = m_WeightArray[m_Heap[iFirst]];
+      for(unsigned int c = iFirst + 1; c < iLast; c++)
+        {
+        TWeight wc = m_WeightArray[m_Heap[c]];
+        if(wc < wMin)
+          {
+          iMin = c;
+          wMin = wc;
+          }
+        }
+
+      if(!(wMin < w))
+        break;
+      Put(iPos, m_Heap[iMin]);
+      iPos = iMin;
+      }
+    Put(iPos, iElement);
+    }
+};
+
+#endif
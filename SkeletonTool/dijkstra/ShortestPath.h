@@ -1,12 +1,20 @@
 #ifndef __ShortestPath_h_
 #define __ShortestPath_h_
 
-#include "BinaryHeap.h"
+#include "DAryHeap.h"
 #include <limits>
+#include <vector>
+
+// Number of children of the nodes of the priority queues of the searches.
+// A 4-ary heap is faster than a binary heap (arity 2) on mesh graphs. The
+// build sets it with the DIJKSTRA_HEAP_ARITY CMake option
+#ifndef DIJKSTRA_HEAP_ARITY
+#define DIJKSTRA_HEAP_ARITY 4
+#endif
 
 /**
  * This class implements the classic shortest path algorithm by the
- * legendary Dijkstra. It uses the binary heap implementation of
+ * legendary Dijkstra. It uses a d-ary heap implementation of
  * the priority queue that is more flexible than the implementation 
  * in STL
  *
@@ -40,8 +48,8 @@ public:
    * specified in METIS format. In addition pass in the weights
    * associated with the edges. */
   DijkstraShortestPath(
-    unsigned int nVertices, unsigned int *xAdjacencyIndex,
-    unsigned int *xAdjacency, TWeight *xEdgeLen)
+    unsigned int nVertices, const unsigned int *xAdjacencyIndex,
+    const unsigned int *xAdjacency, const TWeight *xEdgeLen)
     {
     // Store the sizes
     m_NumberOfVertices = nVertices;
@@ -56,16 +64,26 @@ public:
     m_Distance = new TWeight[nVertices];
     m_Predecessor = new unsigned int[nVertices];
 
-    // Create the Binary heap (priority que)
-    m_Heap = new BinaryHeap<TWeight>(m_NumberOfVertices, m_Distance);
+    // Create the heap (priority queue)
+    m_Heap = new HeapType(m_NumberOfVertices, m_Distance);
+
+    // The heap for point-to-point queries is created when first needed
+    m_Key = NULL;
+    m_KeyHeap = NULL;
+
+    // Initialize the distances once, later calls only reset the vertices
+    // that they have touched
+    ResetAllVertices();
     }
 
   /** Destructor, cleans up pointers */
   virtual ~DijkstraShortestPath()
     {
     delete m_Heap;
-    delete m_Distance;
-    delete m_Predecessor;
+    delete[] m_Distance;
+    delete[] m_Predecessor;
+    delete m_KeyHeap;
+    delete[] m_Key;
     }
 
   /** 
@@ -75,23 +93,26 @@ public:
    * xMaxDistance is 10 then only those distances that are less or equal to 10
    * will be computed, and the rest will be set to infinity. This way, we can 
    * compute the distances a lot faster in certain applications
+   *
+   * Vertices enter the heap when they are first reached, and only the
+   * vertices touched by the previous call are reset, so the cost of a call
+   * is proportional to the explored region, not to the size of the graph.
+   *
+   * Optionally, a list of target vertices can be passed in. The search then
+   * stops as soon as all the targets have been reached. The distances of the
+   * vertices reached up to that point are the same as without targets.
    */
-  void ComputePathsFromSource(unsigned int iSource, double xMaxDistance = INFINITE_WEIGHT)
+  void ComputePathsFromSource(unsigned int iSource, double xMaxDistance = INFINITE_WEIGHT,
+    unsigned int nTargets = 0, const unsigned int *lTargets = NULL)
     {
     unsigned int i;
+    unsigned int nTargetsLeft = nTargets;
 
-    // Initialize the predecessor array (necessary?)
-    for(i = 0; i < m_NumberOfVertices; i++)
-      { m_Predecessor[i] = NO_PATH; } 
-
-    // Reset the binary heap and weights
-    m_Heap->InsertAllElementsWithEqualWeights(INFINITE_WEIGHT);
+    // Reset the distances and predecessors left over by the previous call
+    ResetTouchedVertices();
 
     // Change the distance for the first weight to 0
-    m_Heap->DecreaseElementWeight(iSource, 0);
-
-    // Set the predecessor of iSource to itself
-    m_Predecessor[iSource] = iSource;
+    Reach(iSource, 0, iSource);
 
     // Change the distance to the adjacent vertices of the source
     for(i = m_AdjacencyIndex[iSource]; i < m_AdjacencyIndex[iSource+1]; i++)
@@ -100,10 +121,8 @@ public:
       unsigned int iNbr = m_Adjacency[i];
 
       // Get the edge weight associated with it and update it in the queue
-      m_Heap->DecreaseElementWeight(iNbr, m_EdgeWeight[i]);
-
-      // Update the predecessor as well 
-      m_Predecessor[iNbr] = iSource;
+      if(m_EdgeWeight[i] <= m_Distance[iNbr])
+        Reach(iNbr, m_EdgeWeight[i], iSource);
       }
 
     // Continue while the heap is not empty
@@ -116,29 +135,110 @@ public:
       // will also be above the threshold)
       if(m_Distance[w] > xMaxDistance) break;
 
-      // Relax the vertices remaining in the heap
+      // Check if all the targets have been reached
+      if(nTargets)
+        {
+        for(unsigned int k = 0; k < nTargets; k++)
+          if(lTargets[k] == w) nTargetsLeft--;
+        if(nTargetsLeft == 0) break;
+        }
+
+      // Relax the vertices that have not been popped yet
       for(i = m_AdjacencyIndex[w]; i < m_AdjacencyIndex[w+1]; i++)
         {
         // Get the neighbor of i
         unsigned int iNbr = m_Adjacency[i];
 
-        // Get the edge weight associated with it and update it in the queue
-        if(m_Heap->ContainsElement(iNbr))
+        // A vertex that is not in the heap but has a finite distance has
+        // already been popped
+        if(m_Heap->ContainsElement(iNbr) || m_Distance[iNbr] == INFINITE_WEIGHT)
           {
           // If the distance to iNbr more than distance thru w, update it
           TWeight dTest = m_Distance[w] + m_EdgeWeight[i];
 
           if(dTest < m_Distance[iNbr])
-            {
-            // Update the weight
-            m_Heap->DecreaseElementWeight(iNbr, dTest);
+            Reach(iNbr, dTest, w);
+          }
+        }
+      } // while heap not empty
+    }
 
-            // Set the predecessor
+  /**
+   * Compute the shortest path from the source to a single target vertex
+   * with the A* algorithm. The heuristic is a function object that, called
+   * with a vertex, returns a lower bound on the distance from that vertex
+   * to the target. The heuristic must be consistent, i.e., the difference of
+   * its values at the two ends of an edge must not exceed the edge weight.
+   *
+   * The search stops as soon as the target is reached, or as soon as it is
+   * certain that the target is further than xMaxDistance away. Returns true
+   * if the target has been reached. The distances of the reached vertices
+   * are the same as the ones computed by ComputePathsFromSource.
+   */
+  template <class THeuristic>
+  bool ComputePathToTarget(unsigned int iSource, unsigned int iTarget,
+    const THeuristic &heuristic, double xMaxDistance = INFINITE_WEIGHT)
+    {
+    // Create the heap ordered by distance plus heuristic
+    if(!m_KeyHeap)
+      {
+      m_Key = new double[m_NumberOfVertices];
+      m_KeyHeap = new KeyHeapType(m_NumberOfVertices, m_Key);
+      }
+
+    // Reset the distances and predecessors left over by the previous call
+    ResetTouchedVertices();
+
+    // Start with the source
+    m_Distance[iSource] = 0;
+    m_Predecessor[iSource] = iSource;
+    m_Key[iSource] = heuristic(iSource);
+    m_KeyHeap->InsertElement(iSource);
+    m_Touched.push_back(iSource);
+
+    // Continue while the heap is not empty
+    while(m_KeyHeap->GetSize())
+      {
+      // Pop off the vertex with the smallest distance plus heuristic
+      unsigned int w = m_KeyHeap->PopMinimum();
+      if(w == iTarget) return true;
+
+      // Every path to the target through the remaining vertices is longer
+      // than the key of w
+      if(m_Key[w] > xMaxDistance) break;
+
+      // Relax the vertices that have not been popped yet
+      for(unsigned int i = m_AdjacencyIndex[w]; i < m_AdjacencyIndex[w+1]; i++)
+        {
+        unsigned int iNbr = m_Adjacency[i];
+        bool inHeap = m_KeyHeap->ContainsElement(iNbr);
+        if(inHeap || m_Distance[iNbr] == INFINITE_WEIGHT)
+          {
+          // If the distance to iNbr more than distance thru w, update it
+          TWeight dTest = m_Distance[w] + m_EdgeWeight[i];
+          if(dTest < m_Distance[iNbr])
+            {
+            // The heuristic part of the key does not change
+            double xHeuristic = inHeap
+              ? m_Key[iNbr] - m_Distance[iNbr] : heuristic(iNbr);
+            m_Distance[iNbr] = dTest;
             m_Predecessor[iNbr] = w;
+            if(inHeap)
+              {
+              m_KeyHeap->DecreaseElementWeight(iNbr, dTest + xHeuristic);
+              }
+            else
+              {
+              m_Key[iNbr] = dTest + xHeuristic;
+              m_KeyHeap->InsertElement(iNbr);
+              m_Touched.push_back(iNbr);
+              }
             }
           }
         }
-      } // while heap not empty
+      }
+
+    return false;
     }
 
   /** Get the predecessor array */
@@ -150,12 +250,78 @@ public:
     { return m_Distance; }
 
 protected:
-  BinaryHeap<TWeight> *m_Heap;
+  typedef DAryHeap<TWeight, DIJKSTRA_HEAP_ARITY> HeapType;
+  typedef DAryHeap<double, DIJKSTRA_HEAP_ARITY> KeyHeapType;
+
+  HeapType *m_Heap;
   TWeight *m_Distance;
-  TWeight *m_EdgeWeight;
+  const TWeight *m_EdgeWeight;
   unsigned int *m_Predecessor;
-  unsigned int *m_AdjacencyIndex, *m_Adjacency;
+  const unsigned int *m_AdjacencyIndex, *m_Adjacency;
   unsigned int m_NumberOfVertices, m_NumberOfEdges;
+
+  // Vertices whose distance was changed since the last reset
+  std::vector<unsigned int> m_Touched;
+
+  // Set when all vertices may have been changed, e.g., by a computation
+  // that does not keep track of the touched vertices
+  bool m_AllTouched;
+
+  // Keys (distance plus heuristic) and heap used by point-to-point queries
+  double *m_Key;
+  KeyHeapType *m_KeyHeap;
+
+  /** Set the distance and the predecessor of a vertex, adding the vertex
+   * to the heap when it is reached for the first time */
+  void Reach(unsigned int iVertex, TWeight xDistance, unsigned int iPredecessor)
+    {
+    if(m_Heap->ContainsElement(iVertex))
+      {
+      m_Heap->DecreaseElementWeight(iVertex, xDistance);
+      }
+    else
+      {
+      m_Distance[iVertex] = xDistance;
+      m_Heap->InsertElement(iVertex);
+      m_Touched.push_back(iVertex);
+      }
+    m_Predecessor[iVertex] = iPredecessor;
+    }
+
+  /** Reset the vertices touched since the last reset */
+  void ResetTouchedVertices()
+    {
+    if(m_AllTouched)
+      {
+      ResetAllVertices();
+      return;
+      }
+
+    m_Heap->Clear();
+    if(m_KeyHeap)
+      m_KeyHeap->Clear();
+    for(size_t k = 0; k < m_Touched.size(); k++)
+      {
+      m_Distance[m_Touched[k]] = INFINITE_WEIGHT;
+      m_Predecessor[m_Touched[k]] = NO_PATH;
+      }
+    m_Touched.clear();
+    }
+
+  /** Reset all the vertices */
+  void ResetAllVertices()
+    {
+    m_Heap->Clear();
+    if(m_KeyHeap)
+      m_KeyHeap->Clear();
+    for(unsigned int i = 0; i < m_NumberOfVertices; i++)
+      {
+      m_Distance[i] = INFINITE_WEIGHT;
+      m_Predecessor[i] = NO_PATH;
+      }
+    m_Touched.clear();
+    m_AllTouched = false;
+    }
 };
 
 template<class TWeight>
@@ -165,8 +331,8 @@ public:
   typedef DijkstraShortestPath<TWeight> Superclass;
   
   GraphVoronoiDiagram(
-    unsigned int nVertices, unsigned int *xAdjacencyIndex,
-    unsigned int *xAdjacency, TWeight *xEdgeLen) : 
+    unsigned int nVertices, const unsigned int *xAdjacencyIndex,
+    const unsigned int *xAdjacency, const TWeight *xEdgeLen) : 
     Superclass(nVertices, xAdjacencyIndex, xAdjacency, xEdgeLen)
     {
       m_Source = new unsigned int[nVertices];
@@ -174,7 +340,7 @@ public:
     }
 
   virtual ~GraphVoronoiDiagram()
-    { delete m_Source; }
+    { delete[] m_Source; }
 
   /** Compute paths from multiple sources. Use this method to construct a
    * sort of a Voronoi diagram of the graph */ 
@@ -196,6 +362,9 @@ public:
     // Reset the binary heap and weights
     this->m_Heap->InsertAllElementsWithEqualWeights(Superclass::INFINITE_WEIGHT);
 
+    // The computation below touches every vertex
+    this->m_AllTouched = true;
+
     // Initialize the heap with the sources
     for(unsigned int iSource = 0; iSource < nSources; iSource++)
       {
@@ -3,43 +3,51 @@
 
 #include <vtkPolyData.h>
 
+#include <cstring>
+
 class VTKMeshHalfEdgeWrapper
 {
 public:
   VTKMeshHalfEdgeWrapper(vtkPolyData *mesh)
     {
-    // Prepare the mesh
+    // Prepare the mesh. The half-edges are counted from the cells, so the
+    // cell links of the mesh are not needed
     xMesh = mesh;
     xMesh->BuildCells();
-    xMesh->BuildLinks();
     
     // Initialize the index data structure
     nVertices = mesh->GetNumberOfPoints();
     nFaces = mesh->GetNumberOfCells();
     xAdjacencyIndex = new unsigned int[nVertices+1];
-    xAdjacencyIndex[0] = 0;
+    memset(xAdjacencyIndex, 0, sizeof(unsigned int) * (nVertices+1));
 
-    // Count the number of edges leaving each vertex
-    for(unsigned int iVtx=0; iVtx < nVertices; iVtx++)
+    // Count the number of edges leaving each vertex, one for each cell
+    // around the vertex
+    for(unsigned int iCell = 0; iCell < nFaces; iCell++)
       {
-      // Get the number of cells for this point
-      vtkIdType nCells;
-      vtkIdType *xDummy = NULL;
-      xMesh->GetPointCells(iVtx, nCells, xDummy);
-
-      // Add to the adjacency index
-      xAdjacencyIndex[iVtx+1] = xAdjacencyIndex[iVtx] + nCells;
+      vtkIdType nPoints;
+      #if VTK_MAJOR_VERSION >= 9 || (VTK_MAJOR_VERSION >= 8 && VTK_MINOR_VERSION >= 90)
+            const vtkIdType *xPoints;
+      #else
+            vtkIdType *xPoints;
+      #endif
+      xMesh->GetCellPoints(iCell, nPoints, xPoints);
+      for(unsigned int j = 0; j < (unsigned int) nPoints; j++)
+        xAdjacencyIndex[xPoints[j]+1]++;
       }
+    for(unsigned int iVtx=0; iVtx < nVertices; iVtx++)
+      xAdjacencyIndex[iVtx+1] += xAdjacencyIndex[iVtx];
 
     // Set the number of half-edges
     nHalfEdges = xAdjacencyIndex[nVertices];
 
-    // Allocate the edge-related structures
+    // Allocate the adjacency array. The topology of the faces is only built
+    // on request, see BuildTopology()
     xAdjacency = new unsigned int[nHalfEdges];
-    xFace = new unsigned int[nHalfEdges];
-    xFlipEdge = new unsigned int[nHalfEdges];
-    xNextEdge = new unsigned int[nHalfEdges];
-    xFaceEdges = new unsigned int[nFaces];
+    xFace = NULL;
+    xFlipEdge = NULL;
+    xNextEdge = NULL;
+    xFaceEdges = NULL;
 
     // Allocate an additional array that keeps track of how many half-edges
     // have been added for each vertex
@@ -48,7 +56,7 @@ public:
 
     // Traverse all the cells in the VTK mesh. The assumption here is that each cell
     // is traversed in the consistant, counter-clockwise order.
-    for(unsigned int iCell = 0; iCell < (unsigned int) xMesh->GetNumberOfCells(); iCell++)
+    for(unsigned int iCell = 0; iCell < nFaces; iCell++)
       {
       // Get the points for this cell
       vtkIdType nPoints;
@@ -61,6 +69,57 @@ public:
 
       xMesh->GetCellPoints(iCell, nPoints, xPoints);
 
+      // Set the head of each half-edge of the cell
+      for(unsigned int j = 0; j < (unsigned int) nPoints; j++)
+        {
+        unsigned int iTail = xPoints[j], iHead = xPoints[(j+1) % nPoints];
+        xAdjacency[xAdjacencyIndex[iTail] + xTemp[iTail]++] = iHead;
+        }
+      }
+
+    // Check the consistency of the temp array
+    for(unsigned int iTest=0; iTest < nVertices; iTest++)
+      if(xTemp[iTest] != xAdjacencyIndex[iTest+1] - xAdjacencyIndex[iTest])
+        throw "Consistency check failed in VTKMeshHalfEdgeWrapper::VTKMeshHalfEdgeWrapper";
+
+    // Clean up the temp array
+    delete[] xTemp;
+    }
+
+  /**
+   * Build the faces, next and opposite half-edges, which the accessors
+   * GetHalfEdgeTailVertex(), GetHalfEdgeOpposite(), GetHalfEdgeNext(),
+   * GetHalfEdgeFace() and GetFaceHalfEdge() read. The graph alone (adjacency
+   * index and adjacency arrays) does not need them, so they are only built
+   * by this call.
+   */
+  void BuildTopology()
+    {
+    if(xFace)
+      return;
+
+    // Allocate the edge-related structures
+    xFace = new unsigned int[nHalfEdges];
+    xFlipEdge = new unsigned int[nHalfEdges];
+    xNextEdge = new unsigned int[nHalfEdges];
+    xFaceEdges = new unsigned int[nFaces];
+
+    // Walk the cells in the same order as the constructor, so that the
+    // half-edges land at the same positions
+    unsigned int *xTemp = new unsigned int[nVertices];
+    memset(xTemp, 0, sizeof(unsigned int) * nVertices);
+    for(unsigned int iCell = 0; iCell < nFaces; iCell++)
+      {
+      vtkIdType nPoints;
+
+      #if VTK_MAJOR_VERSION >= 9 || (VTK_MAJOR_VERSION >= 8 && VTK_MINOR_VERSION >= 90)
+            const vtkIdType *xPoints;
+      #else
+            vtkIdType *xPoints;
+      #endif
+
+      xMesh->GetCellPoints(iCell, nPoints, xPoints);
+
       // Walk around the list of points
       for(unsigned int j = 0; j < (unsigned int) nPoints; j++)
         {
@@ -70,9 +129,6 @@ public:
         // Get the index of the current half-edge
         unsigned int index = xAdjacencyIndex[iTail] + xTemp[iTail];
 
-        // Set the head of the current half-edge
-        xAdjacency[index] = iHead;
-
         // Set the face corresponding to the current half-edge
         xFace[index] = iCell;
         xFaceEdges[iCell] = index;
@@ -85,17 +141,9 @@ public:
       for(unsigned int k = 0;  k < (unsigned int) nPoints; k++)
         xTemp[xPoints[k]]++;
       }
-
-    // Check the consistency of the temp array
-    for(unsigned int iTest=0; iTest < nVertices; iTest++)
-      if(xTemp[iTest] != xAdjacencyIndex[iTest+1] - xAdjacencyIndex[iTest])
-        throw "Consistency check failed in VTKMeshHalfEdgeWrapper::VTKMeshHalfEdgeWrapper";
-
-    // Clean up the temp array
     delete[] xTemp;
 
-    // Now we should have created all the half-edges. What's left is to establish
-    // the symmetry links between them
+    // Establish the symmetry links between the half-edges
     unsigned int iTail, iHead, iEdge, jEdge;
     for(iTail = 0; iTail < nVertices; iTail++)
       {
@@ -113,12 +161,12 @@ public:
 
   ~VTKMeshHalfEdgeWrapper()
     {
-    delete xAdjacency;
-    delete xAdjacencyIndex;
-    delete xFlipEdge;
-    delete xFace;
-    delete xNextEdge;
-    delete xFaceEdges;
+    delete[] xAdjacency;
+    delete[] xAdjacencyIndex;
+    delete[] xFlipEdge;
+    delete[] xFace;
+    delete[] xNextEdge;
+    delete[] xFaceEdges;
     }
 
   vtkPolyData *GetPolyData() const
@@ -177,11 +225,11 @@ public:
     }
 
   /** Get the adjacency index (for METIS, etc) */
-  unsigned int *GetAdjacencyIndex() const
+  const unsigned int *GetAdjacencyIndex() const
     { return xAdjacencyIndex; }
 
   /** Get the adjacency array (for METIS, etc) */
-  unsigned int *GetAdjacency() const
+  const unsigned int *GetAdjacency() const
     { return xAdjacency; }
 
 protected:
@@ -197,7 +245,8 @@ protected:
   // List of vertices pointed at by each half-edge
   unsigned int *xAdjacency;
 
-  // List of faces to the left of each half-edge
+  // List of faces to the left of each half-edge. This and the arrays below
+  // are NULL until BuildTopology() is called
   unsigned int *xFace;
 
   // List of complement half-edges
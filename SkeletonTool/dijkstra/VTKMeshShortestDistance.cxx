@@ -7,9 +7,9 @@ VTKMeshShortestDistance
   // Set the distance function
   m_WeightFunctionPtr = &m_DefaultWeightFunction;
 
-  // Initialize the filters
-  fltLocator = vtkPointLocator::New();
-  fltCellLocator = vtkCellLocator::New();
+  // The locators are built when first needed
+  fltLocator = NULL;
+  fltCellLocator = NULL;
 
   // Initialize the graph to NULL
   m_ShortestPath = NULL;
@@ -18,19 +18,14 @@ VTKMeshShortestDistance
 
 void
 VTKMeshShortestDistance
-::SetInputMesh(VTKMeshHalfEdgeWrapper *wrapper)
+::SetInputMesh(const VTKMeshHalfEdgeWrapper *wrapper)
 {
   // Store the input mesh
   m_HalfEdge = wrapper;
   m_SourceMesh = wrapper->GetPolyData();
 
-  // Construct a locator
-  fltLocator->SetDataSet(m_SourceMesh);
-  fltLocator->BuildLocator();
-
-  // Construct the cell locator
-  fltCellLocator->SetDataSet(m_SourceMesh);
-  fltCellLocator->BuildLocator();
+  // Locators of the previous mesh are out of date
+  DeleteLocators();
 
   // Set the number of vertices
   m_NumberOfVertices = m_SourceMesh->GetNumberOfPoints();
@@ -47,31 +42,83 @@ VTKMeshShortestDistance
   // Allocate the graph data
   m_EdgeWeights = new float[m_NumberOfEdges];
 
-  // Compute the length of each half-edge in the graph
-  for(unsigned int i=0;i<m_NumberOfEdges;i++)
+  // Compute the length of each half-edge in the graph, walking the
+  // half-edges in the order of the adjacency array
+  const unsigned int *xAdjacencyIndex = m_HalfEdge->GetAdjacencyIndex();
+  for(unsigned int iTail=0;iTail<m_NumberOfVertices;iTail++)
     {
-    vtkIdType iHead = m_HalfEdge->GetHalfEdgeVertex(i);
-    vtkIdType iTail = m_HalfEdge->GetHalfEdgeTailVertex(i);
-
-    // Compute the edge weight
-    m_EdgeWeights[i] = 
-      (float) m_WeightFunctionPtr->GetEdgeWeight(m_SourceMesh, iHead, iTail);
+    for(unsigned int i=xAdjacencyIndex[iTail];i<xAdjacencyIndex[iTail+1];i++)
+      {
+      vtkIdType iHead = m_HalfEdge->GetHalfEdgeVertex(i);
+
+      // Compute the edge weight
+      m_EdgeWeights[i] = 
+        (float) m_WeightFunctionPtr->GetEdgeWeight(m_SourceMesh, iHead, iTail);
+      }
     }
 
-  // Create the shortest path object
-  m_ShortestPath = new DijkstraAlgorithm( 
-    m_NumberOfVertices, 
-    m_HalfEdge->GetAdjacencyIndex(), 
-    m_HalfEdge->GetAdjacency(), 
-    m_EdgeWeights);
+  // The shortest path object is created by the first query, the edge
+  // weights may also be shared with other searches on the same graph
+}
+
+VTKMeshShortestDistance::DijkstraAlgorithm *
+VTKMeshShortestDistance
+::GetShortestPath() const
+{
+  if(!m_ShortestPath)
+    {
+    m_ShortestPath = new DijkstraAlgorithm( 
+      m_NumberOfVertices, 
+      m_HalfEdge->GetAdjacencyIndex(), 
+      m_HalfEdge->GetAdjacency(), 
+      m_EdgeWeights);
+    }
+  return m_ShortestPath;
 }
 
 VTKMeshShortestDistance
 ::~VTKMeshShortestDistance()
 {
   DeleteGraphData();
-  fltLocator->Delete();
-  fltCellLocator->Delete();
+  DeleteLocators();
+}
+
+void
+VTKMeshShortestDistance
+::BuildPointLocator() const
+{
+  if(!fltLocator)
+    {
+    fltLocator = vtkPointLocator::New();
+    fltLocator->SetDataSet(m_SourceMesh);
+    fltLocator->BuildLocator();
+    }
+}
+
+void
+VTKMeshShortestDistance
+::BuildCellLocator() const
+{
+  if(!fltCellLocator)
+    {
+    fltCellLocator = vtkCellLocator::New();
+    fltCellLocator->SetDataSet(m_SourceMesh);
+    fltCellLocator->BuildLocator();
+    }
+}
+
+void
+VTKMeshShortestDistance
+::DeleteLocators()
+{
+  if(fltLocator)
+    {
+    fltLocator->Delete(); fltLocator = NULL;
+    }
+  if(fltCellLocator)
+    {
+    fltCellLocator->Delete(); fltCellLocator = NULL;
+    }
 }
 
 bool
@@ -89,6 +136,7 @@ VTKMeshShortestDistance
   v2[0] = xEnd[0]; v2[1] = xEnd[1]; v2[2] = xEnd[2];
 
   // Compute the intersection with the line
+  BuildCellLocator();
   fltCellLocator->IntersectWithLine( 
     v1,v2, 0.001, t, ptLine, pCoords, subId, cellid);
 
@@ -106,6 +154,8 @@ VTKMeshShortestDistance
   v1[0] = xStart[0]; v1[1] = xStart[1]; v1[2] = xStart[2];
   v2[0] = xEnd[0]; v2[1] = xEnd[1]; v2[2] = xEnd[2];
 
+  BuildCellLocator();
+  BuildPointLocator();
   do
     {
     // cout << "Searching ray " << xStart << "  to  " << xEnd << endl;
@@ -145,7 +195,7 @@ VTKMeshShortestDistance
   while(it != lSources.end())
     lSourceArray[iSource++] = *it++;
 
-  m_ShortestPath->ComputePathsFromManySources(iSource, lSourceArray);
+  GetShortestPath()->ComputePathsFromManySources(iSource, lSourceArray);
   
   delete[] lSourceArray;
 }
@@ -154,7 +204,7 @@ void
 VTKMeshShortestDistance
 ::ComputeDistances(vtkIdType iStartNode, double xMaxDistance)
 {
-  m_ShortestPath->ComputePathsFromSource(iStartNode, xMaxDistance);
+  GetShortestPath()->ComputePathsFromSource(iStartNode, xMaxDistance);
 }
 
 void 
@@ -164,6 +214,9 @@ VTKMeshShortestDistance
   if(m_ShortestPath)
     {
     delete m_ShortestPath; m_ShortestPath = NULL;
-    delete m_EdgeWeights;
+    }
+  if(m_EdgeWeights)
+    {
+    delete[] m_EdgeWeights; m_EdgeWeights = NULL;
     }
 }
@@ -16,6 +16,7 @@
 #include <vector>
 #include <list>
 #include <utility>
+#include <cmath>
 
 #include "ShortestPath.h"
 
@@ -109,6 +110,33 @@ private:
   double m_PitchFactor;
 };
   
+/**
+ * Heuristic for point-to-point shortest path queries (A*): the Euclidean
+ * distance from a vertex to the target vertex, which is a lower bound on
+ * the length of any path between them when the edge weights are Euclidean
+ * lengths. It is scaled down slightly so that it stays consistent despite
+ * the rounding of the edge weights to single precision.
+ */
+class EuclideanDistanceHeuristic
+{
+public:
+  EuclideanDistanceHeuristic(vtkPolyData *mesh, vtkIdType iTarget)
+    : m_Mesh(mesh)
+    { mesh->GetPoint(iTarget, m_Target); }
+
+  double operator()(unsigned int iVertex) const
+    {
+    double x[3];
+    m_Mesh->GetPoint(iVertex, x);
+    double dx = x[0] - m_Target[0], dy = x[1] - m_Target[1], dz = x[2] - m_Target[2];
+    return 0.999 * sqrt(dx * dx + dy * dy + dz * dz);
+    }
+
+private:
+  vtkPolyData *m_Mesh;
+  double m_Target[3];
+};
+
 /***************************************************************************
  * This class takes as an input a mesh and computes a graph that can
  * be used to calculate Dijkstra's shortest path on the surface. 
@@ -139,7 +167,7 @@ public:
   ~VTKMeshShortestDistance();
 
   /** Specify the mesh to use for computing distances */
-  void SetInputMesh(VTKMeshHalfEdgeWrapper *mesh);
+  void SetInputMesh(const VTKMeshHalfEdgeWrapper *mesh);
 
   /** Specify the edge weight function object to use in order to 
    * compute the costs of edge traversal */
@@ -157,26 +185,29 @@ public:
   /** Compute the shortest distance from a list of start nodes */
   void ComputeDistances(const list<vtkIdType> &iStartNodes);
 
-  /** Get the distance between start node and given node */
+  /** Get the distance between start node and given node. Before the
+   * first query, all the vertices are at an infinite distance */
   float GetVertexDistance(vtkIdType iNode) const 
-    { return m_ShortestPath->GetDistanceArray()[iNode]; }
+    { return GetShortestPath()->GetDistanceArray()[iNode]; }
 
   /** Use this to get the path between start node and given node */
   vtkIdType GetVertexPredecessor(vtkIdType iNode) const 
-    { return m_ShortestPath->GetPredecessorArray()[iNode]; }
+    { return GetShortestPath()->GetPredecessorArray()[iNode]; }
 
   /** Check if the given node is connected to the source node */
   bool IsVertexConnected(vtkIdType iNode) const
     { 
-    return (m_ShortestPath->GetPredecessorArray()[iNode] 
+    return (GetShortestPath()->GetPredecessorArray()[iNode] 
       != DijkstraAlgorithm::NO_PATH);
     }
     
   /** This is a helper method: find vertex whose Euclidean distance to a
     given point is minimal */
   vtkIdType FindClosestVertexInSpace(Vec vec)
-    // { return fltLocator->FindClosestPoint(vec[0], vec[1], vec[2]); }
-    { return fltLocator->FindClosestPoint(vec.data_block()); }
+    {
+    BuildPointLocator();
+    return fltLocator->FindClosestPoint(vec.data_block());
+    }
 
   /** Find the cell closest to the specified point */
   vtkIdType FindClosestCellInSpace(Vec vec)
@@ -191,6 +222,7 @@ public:
       xClosestPoint[0], xClosestPoint[1], xClosestPoint[2]);
     double dist2;
     
+    BuildCellLocator();
     fltCellLocator->FindClosestPoint(
       v1.data_block(), v2.data_block(),iCell,subid,dist2);
     return iCell;
@@ -217,11 +249,26 @@ public:
   float GetEdgeWeight(unsigned int iEdge) const
     { return m_EdgeWeights[iEdge]; }
 
+  /** Get the array of edge weights, indexed like the adjacency array of the
+   * half-edge wrapper. Can be used to run additional shortest path computers
+   * on the same graph, e.g., one per thread */
+  const float *GetEdgeWeights() const
+    { return m_EdgeWeights; }
+
 private:
 
   // Clean up graph structures
   void DeleteGraphData();
 
+  // Create the shortest path object on first use, queries included
+  typedef GraphVoronoiDiagram<float> DijkstraAlgorithm;
+  DijkstraAlgorithm *GetShortestPath() const;
+
+  // Build the locators on first use, the shortest paths do not need them
+  void BuildPointLocator() const;
+  void BuildCellLocator() const;
+  void DeleteLocators();
+
   // Mesh dimensions
   unsigned int m_NumberOfEdges, m_NumberOfVertices;
 
@@ -229,16 +276,15 @@ private:
   float *m_EdgeWeights;
 
   // The structure used to compute the shortest paths on the mesh
-  typedef GraphVoronoiDiagram<float> DijkstraAlgorithm;
-  DijkstraAlgorithm *m_ShortestPath;
+  mutable DijkstraAlgorithm *m_ShortestPath;
 
   // VTK filters
-  vtkPointLocator *fltLocator;
-  vtkCellLocator *fltCellLocator;
+  mutable vtkPointLocator *fltLocator;
+  mutable vtkCellLocator *fltCellLocator;
 
   // VTK source poly-data
   vtkPolyData *m_SourceMesh;
-  VTKMeshHalfEdgeWrapper *m_HalfEdge;
+  const VTKMeshHalfEdgeWrapper *m_HalfEdge;
 
   // Function object used to compute edge distances
   MeshEdgeWeightFunction *m_WeightFunctionPtr;
@@ -2,6 +2,7 @@ import vtk, qt, slicer
 
 from SyntheticSkeletonLib.Constants import *
 from SyntheticSkeletonLib.Utils import *
+from SyntheticSkeletonLib.SharedLibraryCLI import runModelCLI
 from slicer.ScriptedLoadableModule import *
 from slicer.util import VTKObservationMixin
 from pathlib import Path
@@ -75,6 +76,7 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     Called when the user opens the module the first time and the widget is initialized.
     """
     self._skeletonToolWidget = None
+    self._progressiveSkeletonButton = None
     ScriptedLoadableModuleWidget.__init__(self, parent)
     VTKObservationMixin.__init__(self)  # needed for parameter node observation
     self._updatingGUIFromParameterNode = False
@@ -83,13 +85,15 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
   def onReload(self):
     self.cleanup()
     logging.debug(f"Reloading {self. moduleName}")
-    reload(packageName='SyntheticSkeletonLib', submoduleNames=['SkeletonModel', 'Constants', 'Utils', 'CustomData'])
+    reload(packageName='SyntheticSkeletonLib', submoduleNames=['SkeletonModel', 'Constants', 'Utils', 'CustomData',
+                                                                    'VoronoiSkeleton', 'SharedLibraryCLI'])
     ScriptedLoadableModuleWidget.onReload(self)
 
   def cleanup(self):
     """
     Called when the application closes and the module widget is destroyed.
     """
+    self.logic.cancelProgressiveSkeleton()
     self.removeObservers()
     self.deactivateModes()
     self.removeShortcutKeys()
@@ -160,6 +164,11 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
       self._skeletonToolWidget = slicer.modules.skeletontool.createNewWidgetRepresentation()
       tabWidget.widget(0).layout().addWidget(self._skeletonToolWidget)
       self._skeletonToolWidget.setSizePolicy(qt.QSizePolicy.MinimumExpanding, qt.QSizePolicy.Maximum)
+      self._progressiveSkeletonButton = qt.QPushButton("Preview and Refine")
+      self._progressiveSkeletonButton.toolTip = \
+        "Show the skeleton of a decimated copy of the input model within seconds, then compute the skeleton of " \
+        "the full model with the CLI in the background and replace the preview when it is done."
+      tabWidget.widget(0).layout().addWidget(self._progressiveSkeletonButton)
       tabWidget.widget(0).layout().addStretch(1)
     else:
       logging.warning("slicer.modules.skeletontool could not be found. The CLI widget will be hidden.")
@@ -218,6 +227,8 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
       lambda v: self.onDecimationReductionSliderValueChanged())
 
     self.ui.previewButton.toggled.connect(self.updatePreview)
+    if self._skeletonToolWidget is not None:
+      self._progressiveSkeletonButton.clicked.connect(self.onProgressiveSkeletonButtonClicked)
     self.ui.saveButton.clicked.connect(self.logic.save)
 
     self.ui.activeScalarCombobox.connect("currentArrayChanged(vtkAbstractArray*)", self.onActiveScalarChanged)
@@ -342,6 +353,9 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     Called just before the scene is closed.
     """
     # Parameter node will be reset, do not use it anymore
+    self.logic.cancelProgressiveSkeleton()
+    if self._progressiveSkeletonButton is not None:
+      self._progressiveSkeletonButton.enabled = True
     self.deactivateModes()
     self.parameterNode = None
 
@@ -469,6 +483,49 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
       ui = slicer.util.childWidgetVariables(self._skeletonToolWidget)
       ui.inputSurface.setCurrentNode(node)
 
+  def onProgressiveSkeletonButtonClicked(self):
+    inputModel, outputModel, parameters = self._getSkeletonToolParameters()
+    if inputModel is None or outputModel is None:
+      slicer.util.errorDisplay("Select the input and output models of the skeleton.")
+      return
+
+    # The button stays disabled until the full resolution skeleton is done
+    self._progressiveSkeletonButton.enabled = False
+    isRefining = False
+    with slicer.util.tryWithErrorDisplay("Failed to compute the skeleton preview.", waitCursor=True):
+      self.logic.computeProgressiveSkeleton(inputModel, outputModel, parameters,
+                                            onRefined=self.onProgressiveSkeletonRefined,
+                                            onProgress=self.onProgressiveSkeletonProgress)
+      isRefining = True
+      slicer.util.showStatusMessage("Computing the full resolution skeleton in the background...")
+    if not isRefining:
+      self._progressiveSkeletonButton.enabled = True
+
+  def onProgressiveSkeletonProgress(self, progress, message):
+    slicer.util.showStatusMessage(f"Computing the full resolution skeleton in the background: {message} "
+                                  f"({progress:.0%})")
+
+  def onProgressiveSkeletonRefined(self, succeeded):
+    self._progressiveSkeletonButton.enabled = True
+    if succeeded:
+      slicer.util.showStatusMessage("Full resolution skeleton done", 3000)
+    else:
+      slicer.util.errorDisplay("Failed to compute the full resolution skeleton, the preview is kept.")
+
+  def _getSkeletonToolParameters(self):
+    """ Input model, output model and pruning parameters set in the SkeletonTool widget """
+    cliNode = self._skeletonToolWidget.currentCommandLineModuleNode()
+    inputModel = slicer.mrmlScene.GetNodeByID(cliNode.GetParameterAsString("inputSurface"))
+    outputModel = slicer.mrmlScene.GetNodeByID(cliNode.GetParameterAsString("outputSurface"))
+    parameters = {
+      "nDegrees": int(cliNode.GetParameterAsString("nDegrees")),
+      "xPrune": float(cliNode.GetParameterAsString("xPrune")),
+      "nComp": int(cliNode.GetParameterAsString("nComp")),
+      "xSearchTol": float(cliNode.GetParameterAsString("xSearchTol")),
+      "nBins": int(cliNode.GetParameterAsString("nBins"))
+    }
+    return inputModel, outputModel, parameters
+
   def onDecimationReductionSliderValueChanged(self):
     self._updateModelDecimationPolygonInfo()
     self._updateDecimateButtonEnabled()
@@ -943,6 +1000,7 @@ class SyntheticSkeletonLogic(ScriptedLoadableModuleLogic):
     ScriptedLoadableModuleLogic.__init__(self)
 
     self._syntheticSkeletonModel = None
+    self._refineRun = None
 
   def createParameterNode(self):
     parameterNode = ScriptedLoadableModuleLogic.createParameterNode(self)
@@ -1026,6 +1084,80 @@ class SyntheticSkeletonLogic(ScriptedLoadableModuleLogic):
       for key, value in attrs.items():
         f.write(f"{key} = {value}\n")
 
+  def computeProgressiveSkeleton(self, inputModel, outputModel, parameters, onRefined=None, onProgress=None,
+                                 previewTriangles=SKELETON_PREVIEW_NUMBER_OF_TRIANGLES):
+    """ Compute the skeleton of a copy of inputModel decimated to about previewTriangles triangles into outputModel
+    with the SkeletonTool CLI, waiting for it, then start the CLI on inputModel in the background. The full resolution
+    skeleton replaces the preview in outputModel when the CLI is done, and onRefined is then called with whether it
+    succeeded. onProgress is called with the progress of the CLI and its message while it runs. A model that is not
+    much larger than the preview gets no preview.
+
+    A full resolution skeleton still computed by a previous call is cancelled, so that it cannot replace the newer
+    preview. The full resolution skeleton is dropped if outputModel is removed from the scene in the meantime.
+    """
+    self.cancelProgressiveSkeleton()
+    if not outputModel.GetDisplayNode():
+      outputModel.CreateDefaultDisplayNodes()
+
+    numPolys = inputModel.GetPolyData().GetNumberOfPolys()
+    if numPolys > 2 * previewTriangles:
+      decimatedModel = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", f"{inputModel.GetName()}_preview")
+      try:
+        decimation = {"inputModel": inputModel.GetID(),
+                      "outputModel": decimatedModel.GetID(),
+                      "reductionFactor": 1.0 - previewTriangles / numPolys,
+                      "boundaryDeletion": True}
+        self._runCLISync(slicer.modules.decimation, decimation)
+        runModelCLI(slicer.modules.skeletontool, dict(parameters, inputSurface=decimatedModel,
+                                                      outputSurface=outputModel))
+      finally:
+        slicer.mrmlScene.RemoveNode(decimatedModel)
+
+    # The full resolution skeleton goes to a hidden model, so that the preview stays until it is done
+    refinedModel = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", f"{outputModel.GetName()}_refined")
+    refinedModel.SetHideFromEditors(True)
+
+    def onDone(succeeded):
+      if self._refineRun is not run:
+        # Cancelled, the preview stays
+        slicer.mrmlScene.RemoveNode(refinedModel)
+        return
+      self._refineRun = None
+      if succeeded and outputModel.GetScene() is None:
+        logging.warning("The output model was removed, the full resolution skeleton is dropped")
+        succeeded = False
+      elif succeeded:
+        skeleton = vtk.vtkPolyData()
+        skeleton.DeepCopy(refinedModel.GetPolyData())
+        outputModel.SetAndObservePolyData(skeleton)
+      else:
+        logging.error("Full resolution skeleton failed")
+      slicer.mrmlScene.RemoveNode(refinedModel)
+      if onRefined is not None:
+        onRefined(succeeded)
+
+    run = runModelCLI(slicer.modules.skeletontool,
+                      dict(parameters, inputSurface=inputModel, outputSurface=refinedModel),
+                      onDone=onDone, onProgress=onProgress)
+    self._refineRun = run
+
+  def cancelProgressiveSkeleton(self):
+    """ Stop the computation of the full resolution skeleton started by computeProgressiveSkeleton, keeping the
+    preview. onRefined is not called.
+    """
+    if self._refineRun is not None:
+      self._refineRun.cancel()
+      self._refineRun = None
+
+  @staticmethod
+  def _runCLISync(module, parameters):
+    cliNode = slicer.cli.run(module, None, parameters, wait_for_completion=True, update_display=False)
+    try:
+      if cliNode.GetStatus() & cliNode.ErrorsMask:
+        raise RuntimeError(f"{module.name} failed: {cliNode.GetErrorText()}")
+    finally:
+      slicer.mrmlScene.RemoveNode(cliNode)
+
   def createInflatedModel(self):
     try:
       outputModel = self.parameterNode.GetNodeReference(PARAM_INFLATED_MODEL)
@@ -1034,11 +1166,11 @@ class SyntheticSkeletonLogic(ScriptedLoadableModuleLogic):
         self.parameterNode.SetNodeReferenceID(PARAM_INFLATED_MODEL, outputModel.GetID())
       outputModel.SetName(f"{self.inputModel.GetName()}_Inflated")
       params = {
-        'inputSurface': self.outputModel.GetID(),
-        'outputSurface': outputModel.GetID(),
+        'inputSurface': self.outputModel,
+        'outputSurface': outputModel,
         'rad': float(self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE_RADIUS))
       }
-      slicer.cli.run(slicer.modules.inflatemedialmodel, None, params, wait_for_completion=True)
+      runModelCLI(slicer.modules.inflatemedialmodel, params)
       return outputModel
     except Exception as exc:
       logging.debug(exc)
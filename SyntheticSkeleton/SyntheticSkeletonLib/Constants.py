@@ -11,6 +11,10 @@ OTHER_POINT = "Other"
 TAG_TYPES = [UNASSIGNED_POINT, BRANCH_POINT, EDGE_POINT, INTERIOR_POINT, OTHER_POINT]
 
 SCALAR_RADIUS_NAME = "Radius"
+SCALAR_GEODESIC_NAME = "Geodesic"
+SCALAR_PRUNING_RATIO_NAME = "Pruning Ratio"
+SCALAR_GENERATOR_A_NAME = "GeneratorA"
+SCALAR_GENERATOR_B_NAME = "GeneratorB"
 SCALAR_POINT_ANATOMICAL_INDEX_NAME = "Label"
 SCALAR_TRIANGLE_ANATOMICAL_INDEX_NAME = "Label"
 SCALAR_TRIANGLE_COLOR_NAME = "Colors"
@@ -46,6 +50,10 @@ PARAM_OUTPUT_MODEL_SCALAR_NAME = "OutputModelScalar"
 PARAM_OUTPUT_MODEL_COORDINATE_SYSTEM = "CoordinateSystem"
 
 
+# Number of triangles of the decimated copy of the input model whose skeleton is shown as a preview
+SKELETON_PREVIEW_NUMBER_OF_TRIANGLES = 5000
+
+
 ATTR_TO_SURFACE = "SnapPointsToSurface"
 ATTR_COLOR = "Color"
 ATTR_ANATOMICAL_INDEX = "AnatomicalIndex"
@@ -0,0 +1,237 @@
+import ctypes
+import logging
+import os
+import sys
+import threading
+
+import qt
+import slicer
+import vtk
+
+
+# Time between two checks of a CLI running in the background, in milliseconds
+POLL_INTERVAL = 100
+
+
+def getCLILibraryPath(module):
+  """ Path of the shared library that SEMMacroBuildCLI builds next to the executable of a CLI module, which exports
+  its ModuleEntryPoint, or None if there is none
+  """
+  if sys.platform == "win32":
+    fileName = f"{module.name}Lib.dll"
+  elif sys.platform == "darwin":
+    fileName = f"lib{module.name}Lib.dylib"
+  else:
+    fileName = f"lib{module.name}Lib.so"
+  path = os.path.join(os.path.dirname(module.path), fileName)
+  return path if os.path.isfile(path) else None
+
+
+def isSharedLibraryCLIAvailable(module):
+  """ Whether the CLI module can run in process through its shared library """
+  return getCLILibraryPath(module) is not None
+
+
+def runModelCLI(module, parameters, positional=("inputSurface", "outputSurface"), outputs=("outputSurface",),
+                onDone=None, onProgress=None):
+  """ Run a CLI module of this extension whose parameters include model nodes. When the shared library of the CLI
+  is available, its entry point is called in process and the models are passed in memory. Otherwise the CLI runs
+  with slicer.cli.run, through temporary files.
+
+  :param parameters: values of the parameters by name, the models being given as model nodes
+  :param positional: names of the parameters passed by index, in order
+  :param outputs: names of the models written by the CLI
+  :param onDone: when given, the CLI runs in the background and onDone is called with whether it succeeded.
+    Otherwise the CLI runs to completion and a RuntimeError is raised if it fails.
+  :param onProgress: when given with onDone, called with the overall progress of the CLI (0 to 1) and the message
+    of its current stage while it runs
+  :return: when the CLI runs in the background, an object whose cancel() stops it. onDone is then called with False.
+  """
+  if isSharedLibraryCLIAvailable(module):
+    return SharedLibraryCLI(module).run(parameters, positional, outputs, onDone, onProgress)
+
+  cliParameters = {name: value.GetID() if isinstance(value, slicer.vtkMRMLNode) else value
+                   for name, value in parameters.items()}
+  cliNode = slicer.cli.run(module, None, cliParameters, wait_for_completion=onDone is None, update_display=False)
+
+  def onFinished():
+    succeeded = cliNode.GetStatus() == cliNode.Completed
+    if not succeeded:
+      logging.error(f"{module.name} failed: {cliNode.GetErrorText()}")
+    slicer.mrmlScene.RemoveNode(cliNode)
+    return succeeded
+
+  if onDone is None:
+    if not onFinished():
+      raise RuntimeError(f"{module.name} failed")
+    return None
+
+  def onStatusModified(caller, event):
+    if cliNode.IsBusy():
+      if onProgress is not None:
+        onProgress(cliNode.GetProgress() / 100.0, cliNode.GetProgressMessage() or "")
+      return
+    cliNode.RemoveObserver(observerTag)
+    onDone(onFinished())
+
+  observerTag = cliNode.AddObserver(vtk.vtkCommand.ModifiedEvent, onStatusModified)
+  return CLINodeRun(cliNode)
+
+
+class CLINodeRun:
+  """ A CLI module started with slicer.cli.run in the background """
+
+  def __init__(self, cliNode):
+    self._cliNode = cliNode
+
+  def cancel(self):
+    self._cliNode.Cancel()
+
+
+class ModuleProcessInformation(ctypes.Structure):
+  """ The ModuleProcessInformation of SlicerExecutionModel, through which the application asks a CLI running in
+  process to abort and the CLI reports its progress. Its address is passed to the CLI with --processinformationaddress
+  """
+  _fields_ = [
+    ("Abort", ctypes.c_ubyte),
+    ("Progress", ctypes.c_float),
+    ("StageProgress", ctypes.c_float),
+    ("ProgressMessage", ctypes.c_char * 1024),
+    ("ProgressCallbackFunction", ctypes.c_void_p),
+    ("ProgressCallbackClientData", ctypes.c_void_p),
+    ("ElapsedTime", ctypes.c_double),
+  ]
+
+
+class SharedLibraryCLI:
+  """ A CLI module run in the process of Slicer by calling the entry point of its shared library.
+
+  The model nodes among the parameters are copied, shallowly, to nodes of a scene of their own, and passed to the
+  CLI as references "slicer:<scene address>#<node ID>" rather than as files, so that no model is written, read or
+  parsed on the way in or out. The CLI only touches that scene, which lets it run on a thread while the models of
+  the application scene stay free to change. The polydata of the output nodes is moved to the given output models
+  when the CLI is done.
+
+  The CLI gets a ModuleProcessInformation, like the CLIs that Slicer runs in process, so that cancel() makes it stop
+  at its next progress report. The CLIs still running when the application quits are cancelled and waited for, so
+  that none is left in the middle of its computation.
+  """
+
+  # The instances whose CLI runs in the background
+  _running = set()
+  _isCancelledOnQuit = False
+
+  def __init__(self, module):
+    path = getCLILibraryPath(module)
+    if path is None:
+      raise RuntimeError(f"{module.name} has no shared library")
+    self.name = module.name
+    self._entryPoint = ctypes.CDLL(path).ModuleEntryPoint
+    self._entryPoint.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_char_p)]
+    self._entryPoint.restype = ctypes.c_int
+    self._processInformation = ModuleProcessInformation()
+    self._thread = None
+
+  @property
+  def progress(self):
+    return self._processInformation.Progress
+
+  @property
+  def progressMessage(self):
+    return self._processInformation.ProgressMessage.decode(errors="replace")
+
+  def run(self, parameters, positional, outputs, onDone=None, onProgress=None):
+    """ Same parameters as runModelCLI """
+    scene = slicer.vtkMRMLScene()
+    sceneAddress = int(scene.GetAddressAsString("vtkMRMLScene")[len("Addr="):], 16)
+    sceneNodes = {}
+    arguments = {"processinformationaddress": f"{ctypes.addressof(self._processInformation):#x}"}
+    for name, value in parameters.items():
+      if isinstance(value, slicer.vtkMRMLModelNode):
+        node = scene.AddNewNodeByClass("vtkMRMLModelNode")
+        if name not in outputs and value.GetPolyData() is not None:
+          polyData = vtk.vtkPolyData()
+          polyData.ShallowCopy(value.GetPolyData())
+          node.SetAndObservePolyData(polyData)
+        sceneNodes[name] = node
+        value = f"slicer:{sceneAddress:#x}#{node.GetID()}"
+      arguments[name] = value
+    args = self._getCommandLine(arguments, positional)
+
+    def onFinished(returnCode):
+      succeeded = returnCode == 0 and not self._processInformation.Abort
+      if succeeded:
+        for name in outputs:
+          parameters[name].SetAndObservePolyData(sceneNodes[name].GetPolyData())
+      elif self._processInformation.Abort:
+        logging.info(f"{self.name} cancelled")
+      else:
+        logging.error(f"{self.name} failed with exit code {returnCode}")
+      # The scene is only released once the CLI is done with it
+      scene.Clear(True)
+      return succeeded
+
+    if onDone is None:
+      if not onFinished(self._execute(args)):
+        raise RuntimeError(f"{self.name} failed")
+      return None
+
+    # ctypes releases the GIL during the call, so the application keeps running while the CLI computes
+    result = {}
+    self._thread = threading.Thread(target=lambda: result.update(returnCode=self._execute(args)))
+    self._thread.start()
+    SharedLibraryCLI._startRunning(self)
+
+    def poll():
+      if self._thread.is_alive():
+        if onProgress is not None:
+          onProgress(self.progress, self.progressMessage)
+        qt.QTimer.singleShot(POLL_INTERVAL, poll)
+        return
+      SharedLibraryCLI._running.discard(self)
+      onDone(onFinished(result.get("returnCode", -1)))
+
+    qt.QTimer.singleShot(POLL_INTERVAL, poll)
+    return self
+
+  def cancel(self):
+    """ Ask the CLI to stop at its next progress report """
+    self._processInformation.Abort = 1
+
+  def wait(self):
+    """ Wait for the CLI running in the background to return """
+    if self._thread is not None:
+      self._thread.join()
+
+  @classmethod
+  def _startRunning(cls, cli):
+    if not cls._isCancelledOnQuit:
+      slicer.app.aboutToQuit.connect(cls.cancelAll)
+      cls._isCancelledOnQuit = True
+    cls._running.add(cli)
+
+  @classmethod
+  def cancelAll(cls):
+    """ Cancel the CLIs running in the background and wait for them to return """
+    for cli in list(cls._running):
+      cli.cancel()
+    for cli in list(cls._running):
+      cli.wait()
+    cls._running.clear()
+
+  def _getCommandLine(self, arguments, positional):
+    args = [self.name]
+    for name, value in arguments.items():
+      if name in positional or value is False:
+        continue
+      args.append(f"--{name}")
+      if isinstance(value, (list, tuple)):
+        args.append(",".join(str(v) for v in value))
+      elif value is not True:
+        args.append(str(value))
+    args += [str(arguments[name]) for name in positional]
+    return args
+
+  def _execute(self, args):
+    argv = (ctypes.c_char_p * (len(args) + 1))(*[arg.encode() for arg in args], None)
+    return self._entryPoint(len(args), argv)
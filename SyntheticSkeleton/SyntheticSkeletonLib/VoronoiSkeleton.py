@@ -0,0 +1,247 @@
+import itertools
+import logging
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+from SyntheticSkeletonLib.Constants import SCALAR_RADIUS_NAME, SCALAR_GEODESIC_NAME, SCALAR_PRUNING_RATIO_NAME, \
+  SCALAR_GENERATOR_A_NAME, SCALAR_GENERATOR_B_NAME
+
+
+# Largest number of distances held at once by the geodesic searches
+MAX_DISTANCE_BLOCK_SIZE = 20000000
+
+
+def isVoronoiSkeletonAvailable():
+  """ Whether SciPy, which computes the Voronoi diagram and the geodesic distances, can be imported """
+  try:
+    import scipy.spatial
+    import scipy.sparse.csgraph
+  except ImportError:
+    return False
+  return True
+
+
+def computeVoronoiSkeleton(surface, nDegrees=3, xPrune=1.2, nComp=0, xSearchTol=1e-6, nBins=0):
+  """ Compute the Voronoi skeleton of a closed surface in process, with the same pruning rules as the
+  SkeletonTool CLI. The faces of the Voronoi diagram that are finite and inside the surface are kept unless
+  their generators are fewer than nDegrees mesh edges apart (edge criterion) or the geodesic distance between
+  them is less than xPrune times their Euclidean distance (geodesic criterion).
+
+  The Voronoi diagram is computed by SciPy (qhull) and the geodesic distances by Dijkstra searches from all the
+  generators at once, limited to the largest distance that the pruning needs. A distance beyond that limit is
+  reported as the limit.
+
+  :param surface: vtkPolyData of the boundary
+  :return: vtkPolyData of the skeleton, with the Radius, Geodesic and Pruning Ratio arrays in the cell and the
+    point data, and the ids of the two boundary vertices generating each face (GeneratorA and GeneratorB) in the
+    cell data, as written by the CLI. The ids index the points of the triangulated and cleaned surface
+  """
+  from scipy.spatial import Voronoi
+
+  # The raw boundary must be triangulated and cleaned
+  fTriangle = vtk.vtkTriangleFilter()
+  fTriangle.SetInputData(surface)
+  fClean = vtk.vtkCleanPolyData()
+  fClean.SetInputConnection(fTriangle.GetOutputPort())
+  fClean.SetTolerance(1e-4)
+  fClean.Update()
+  bnd = fClean.GetOutput()
+  points = numpy_support.vtk_to_numpy(bnd.GetPoints().GetData()).astype(np.float64)
+  triangles = numpy_support.vtk_to_numpy(bnd.GetPolys().GetConnectivityArray()).reshape(-1, 3)
+
+  vd = Voronoi(points)
+  ridgeSizes = np.fromiter(map(len, vd.ridge_vertices), dtype=np.int64, count=len(vd.ridge_vertices))
+  ridgeOffsets = np.concatenate(([0], np.cumsum(ridgeSizes)))
+  ridgeIds = np.fromiter(itertools.chain.from_iterable(vd.ridge_vertices), dtype=np.int64, count=ridgeOffsets[-1])
+
+  # The candidate faces are finite and have all their vertices inside the boundary
+  ptin = _getInsideFlags(bnd, vd.vertices, xSearchTol)
+  isFinite = np.minimum.reduceat(ridgeIds, ridgeOffsets[:-1]) >= 0
+  isInside = np.logical_and.reduceat(ptin[np.maximum(ridgeIds, 0)], ridgeOffsets[:-1])
+  candidates = np.flatnonzero(isFinite & isInside)
+  ip1 = vd.ridge_points[candidates].min(axis=1)
+  ip2 = vd.ridge_points[candidates].max(axis=1)
+
+  # The Euclidean distance between the generators, in single precision like the CLI
+  radius = np.linalg.norm(points[ip1].astype(np.float32) - points[ip2].astype(np.float32), axis=1).astype(np.float64)
+
+  adjacency, weights = _getMeshGraph(points, triangles)
+  accepted = np.ones(len(candidates), dtype=bool)
+  if nDegrees > 0:
+    accepted &= ~_isWithinRing(adjacency, ip1, ip2, nDegrees - 1)
+  geodesic = np.zeros(len(candidates))
+  geodesic[accepted] = _getGeodesicDistances(weights, ip1[accepted], ip2[accepted], radius[accepted] * xPrune + 1)
+  nPrunedEdge = len(candidates) - np.count_nonzero(accepted)
+  accepted &= geodesic >= radius * xPrune
+  nPrunedGeo = len(candidates) - nPrunedEdge - np.count_nonzero(accepted)
+  logging.info(f"Edge constraint pruned {nPrunedEdge} faces, geodesic to Euclidean distance ratio constraint "
+               f"({xPrune}) pruned {nPrunedGeo} faces")
+
+  skeleton = _assembleSkeleton(vd.vertices, ridgeIds, ridgeOffsets, candidates[accepted],
+                               radius[accepted], geodesic[accepted], vd.ridge_points[candidates[accepted]])
+  return _postProcessSkeleton(skeleton, nComp, nBins)
+
+
+def _getInsideFlags(bnd, x, xSearchTol):
+  """ Flag the points inside the bounding box and, unless the tolerance is zero, inside the surface """
+  bounds = np.array(bnd.GetBounds())
+  ptin = np.all((x >= bounds[0::2]) & (x <= bounds[1::2]), axis=1)
+  if xSearchTol <= 0 or not np.any(ptin):
+    return ptin
+
+  testPoints = vtk.vtkPoints()
+  testPoints.SetData(numpy_support.numpy_to_vtk(np.ascontiguousarray(x[ptin]), deep=True))
+  testData = vtk.vtkPolyData()
+  testData.SetPoints(testPoints)
+  fSelect = vtk.vtkSelectEnclosedPoints()
+  fSelect.SetInputData(testData)
+  fSelect.SetSurfaceData(bnd)
+  fSelect.SetTolerance(xSearchTol)
+  fSelect.Update()
+  selected = numpy_support.vtk_to_numpy(fSelect.GetOutput().GetPointData().GetArray("SelectedPoints"))
+  ptin[ptin] = selected != 0
+  return ptin
+
+
+def _getMeshGraph(points, triangles):
+  """ Vertex adjacency and Euclidean edge length matrices of a triangle mesh """
+  from scipy.sparse import csr_matrix
+
+  edges = np.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]))
+  edges = np.unique(np.sort(edges, axis=1), axis=0)
+  edges = np.concatenate((edges, edges[:, ::-1]))
+  lengths = np.linalg.norm(points[edges[:, 0]] - points[edges[:, 1]], axis=1)
+  n = len(points)
+  adjacency = csr_matrix((np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])), shape=(n, n))
+  weights = csr_matrix((lengths, (edges[:, 0], edges[:, 1])), shape=(n, n))
+  return adjacency, weights
+
+
+def _isWithinRing(adjacency, ip1, ip2, nEdges):
+  """ Whether ip2 is at most nEdges mesh edges away from ip1, for each pair """
+  from scipy.sparse import identity
+
+  sources, inverse = np.unique(ip1, return_inverse=True)
+  ring = identity(adjacency.shape[0], dtype=np.int8, format="csr")[sources]
+  for _ in range(nEdges):
+    ring = ring + ring @ adjacency
+    ring.data[:] = 1
+  return np.asarray(ring[inverse, ip2]).ravel() != 0
+
+
+def _getGeodesicDistances(weights, ip1, ip2, xMaxDistance):
+  """ Geodesic distance between each pair of vertices, or xMaxDistance if it is further. The searches start from
+  the distinct ip1, in blocks of sources with similar search radii
+  """
+  from scipy.sparse.csgraph import dijkstra
+
+  geodesic = np.zeros(len(ip1))
+  if len(ip1) == 0:
+    return geodesic
+
+  # The search radius of a source is the largest one among its pairs
+  sources, inverse = np.unique(ip1, return_inverse=True)
+  sourceRadius = np.zeros(len(sources))
+  np.maximum.at(sourceRadius, inverse, xMaxDistance)
+  order = np.argsort(sourceRadius)
+
+  blockSize = max(1, MAX_DISTANCE_BLOCK_SIZE // weights.shape[0])
+  for begin in range(0, len(sources), blockSize):
+    block = order[begin:begin + blockSize]
+    limit = sourceRadius[block].max()
+    distances = dijkstra(weights, directed=False, indices=sources[block], limit=limit)
+
+    # Row of each pair in the block
+    row = np.full(len(sources), -1)
+    row[block] = np.arange(len(block))
+    pairs = np.flatnonzero(row[inverse] >= 0)
+    geodesic[pairs] = np.minimum(distances[row[inverse[pairs]], ip2[pairs]], xMaxDistance[pairs])
+  return geodesic
+
+
+def _assembleSkeleton(vertices, ridgeIds, ridgeOffsets, faces, radius, geodesic, generators):
+  """ Polygons of the accepted Voronoi faces, in the order of the faces, with their cell arrays """
+  sizes = ridgeOffsets[faces + 1] - ridgeOffsets[faces]
+  cellOffsets = np.concatenate(([0], np.cumsum(sizes)))
+  connectivity = ridgeIds[np.repeat(ridgeOffsets[faces] - cellOffsets[:-1], sizes) + np.arange(cellOffsets[-1])]
+
+  cells = vtk.vtkCellArray()
+  cells.SetData(numpy_support.numpy_to_vtkIdTypeArray(cellOffsets.astype(np.int64), deep=True),
+                numpy_support.numpy_to_vtkIdTypeArray(connectivity.astype(np.int64), deep=True))
+
+  pts = vtk.vtkPoints()
+  pts.SetData(numpy_support.numpy_to_vtk(np.ascontiguousarray(vertices), deep=True))
+
+  skel = vtk.vtkPolyData()
+  skel.SetPoints(pts)
+  skel.SetPolys(cells)
+  for name, values in [(SCALAR_RADIUS_NAME, radius), (SCALAR_GEODESIC_NAME, geodesic),
+                       (SCALAR_PRUNING_RATIO_NAME, geodesic / radius)]:
+    array = numpy_support.numpy_to_vtk(np.ascontiguousarray(values, dtype=np.float64), deep=True)
+    array.SetName(name)
+    skel.GetCellData().AddArray(array)
+  for name, ids in [(SCALAR_GENERATOR_A_NAME, generators[:, 0]), (SCALAR_GENERATOR_B_NAME, generators[:, 1])]:
+    array = numpy_support.numpy_to_vtkIdTypeArray(np.ascontiguousarray(ids, dtype=np.int64), deep=True)
+    array.SetName(name)
+    skel.GetCellData().AddArray(array)
+  return skel
+
+
+def _postProcessSkeleton(skel, nComp, nBins):
+  """ Drop the unused vertices, keep the nComp largest components, convert the cell data to point data and,
+  if nBins > 0, apply the quadric clustering
+  """
+  fClean = vtk.vtkCleanPolyData()
+  fClean.SetInputData(skel)
+  fClean.Update()
+  result = fClean.GetOutput()
+
+  if nComp > 0:
+    fConnect = vtk.vtkPolyDataConnectivityFilter()
+    fConnect.SetInputData(result)
+    fConnect.ScalarConnectivityOff()
+    fConnect.SetExtractionModeToAllRegions()
+    fConnect.Update()
+
+    # Like the CLI, keep the largest regions by number of faces, the first region winning ties
+    regionSizes = numpy_support.vtk_to_numpy(fConnect.GetRegionSizes())
+    fConnect.SetExtractionModeToSpecifiedRegions()
+    fConnect.InitializeSpecifiedRegionList()
+    for region in np.argsort(-regionSizes, kind="stable")[:nComp]:
+      fConnect.AddSpecifiedRegion(int(region))
+
+    # The connectivity filter keeps all the points
+    fCleanComponents = vtk.vtkCleanPolyData()
+    fCleanComponents.SetInputConnection(fConnect.GetOutputPort())
+    fCleanComponents.Update()
+    result = fCleanComponents.GetOutput()
+
+  fCellToPoint = vtk.vtkCellDataToPointData()
+  fCellToPoint.SetInputData(result)
+  fCellToPoint.PassCellDataOn()
+  fCellToPoint.Update()
+  result = fCellToPoint.GetPolyDataOutput()
+
+  if nBins > 0:
+    bounds = np.array(result.GetBounds())
+    extent = bounds[1::2] - bounds[0::2]
+    binSize = extent.max() / nBins
+    fCluster = vtk.vtkQuadricClustering()
+    fCluster.SetNumberOfDivisions(*[int(np.ceil(e / binSize)) for e in extent])
+    fCluster.SetInputData(result)
+    fCluster.SetCopyCellData(1)
+    fClusterToPoint = vtk.vtkCellDataToPointData()
+    fClusterToPoint.SetInputConnection(fCluster.GetOutputPort())
+    fClusterToPoint.PassCellDataOn()
+    fClusterToPoint.Update()
+    result = fClusterToPoint.GetPolyDataOutput()
+
+  output = vtk.vtkPolyData()
+  output.DeepCopy(result)
+
+  # The averages of the generator ids over the faces around a vertex mean nothing
+  for name in [SCALAR_GENERATOR_A_NAME, SCALAR_GENERATOR_B_NAME]:
+    output.GetPointData().RemoveArray(name)
+  return output
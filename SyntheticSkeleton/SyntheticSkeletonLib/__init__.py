@@ -2,3 +2,4 @@ from .Constants import *
 from .SkeletonModel import *
 from .CustomData import *
 from .Utils import *
+from .VoronoiSkeleton import *
@@ -0,0 +1,115 @@
+import time
+import unittest
+
+import numpy as np
+import slicer
+from vtk.util.numpy_support import vtk_to_numpy
+
+from SyntheticSkeleton import SyntheticSkeletonLogic
+from SyntheticSkeletonLib.SharedLibraryCLI import runModelCLI
+from SyntheticSkeletonTestFixtures import createEllipsoidModel
+
+
+# Longest wait for a full resolution skeleton, in seconds
+REFINE_TIMEOUT = 120
+
+PARAMETERS = {"nDegrees": 3, "xPrune": 1.2, "nComp": 0, "xSearchTol": 1e-6, "nBins": 0}
+
+
+class SyntheticSkeletonProgressiveSkeletonTest(unittest.TestCase):
+  """ The preview and refine of the skeleton with SyntheticSkeletonLogic.computeProgressiveSkeleton, on models small
+  enough for the CLI to take a few seconds, and a preview of 1000 triangles
+  """
+
+  def setUp(self):
+    slicer.mrmlScene.Clear()
+    self.logic = SyntheticSkeletonLogic()
+    self.refined = []
+
+  def tearDown(self):
+    self.logic.cancelProgressiveSkeleton()
+    self._waitForRefinedModelsRemoved()
+
+  def onRefined(self, succeeded):
+    self.refined.append(succeeded)
+
+  def computeSkeleton(self, inputModel):
+    """ Full resolution skeleton computed by the CLI, waiting for it """
+    outputModel = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", f"{inputModel.GetName()}_expected")
+    runModelCLI(slicer.modules.skeletontool, dict(PARAMETERS, inputSurface=inputModel, outputSurface=outputModel))
+    return outputModel.GetPolyData()
+
+  def assertSameSkeleton(self, actual, expected):
+    self.assertEqual(actual.GetNumberOfPoints(), expected.GetNumberOfPoints())
+    self.assertEqual(actual.GetNumberOfPolys(), expected.GetNumberOfPolys())
+    np.testing.assert_array_equal(vtk_to_numpy(actual.GetPoints().GetData()),
+                                  vtk_to_numpy(expected.GetPoints().GetData()))
+
+  def _waitFor(self, condition):
+    start = time.time()
+    while not condition():
+      self.assertLess(time.time() - start, REFINE_TIMEOUT, "Timed out waiting for the full resolution skeleton")
+      slicer.app.processEvents()
+      time.sleep(0.01)
+
+  def _waitForRefinedModelsRemoved(self):
+    self._waitFor(lambda: not slicer.util.getNodes("*_refined", useLists=True))
+
+  def test_RefineReplacesPreview(self):
+    inputModel = createEllipsoidModel("Ellipsoid", (30, 20, 10), resolution=80)
+    outputModel = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", "Skeleton")
+
+    self.logic.computeProgressiveSkeleton(inputModel, outputModel, PARAMETERS, onRefined=self.onRefined,
+                                          previewTriangles=1000)
+    preview = outputModel.GetPolyData()
+    self.assertIsNotNone(preview)
+    self.assertGreater(preview.GetNumberOfPolys(), 0)
+    self.assertEqual(self.refined, [])
+
+    self._waitFor(lambda: self.refined)
+    self.assertEqual(self.refined, [True])
+    self._waitForRefinedModelsRemoved()
+    self.assertSameSkeleton(outputModel.GetPolyData(), self.computeSkeleton(inputModel))
+
+  def test_StaleRefineKeepsNewerPreview(self):
+    firstModel = createEllipsoidModel("Ellipsoid", (30, 20, 10), resolution=80)
+    secondModel = createEllipsoidModel("Cigar", (40, 10, 10), resolution=80)
+    outputModel = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", "Skeleton")
+
+    firstRefined = []
+    self.logic.computeProgressiveSkeleton(firstModel, outputModel, PARAMETERS, onRefined=firstRefined.append,
+                                          previewTriangles=1000)
+    self.logic.computeProgressiveSkeleton(secondModel, outputModel, PARAMETERS, onRefined=self.onRefined,
+                                          previewTriangles=1000)
+
+    # The first refine, cancelled, neither replaces the output nor reports
+    self._waitFor(lambda: self.refined)
+    self._waitForRefinedModelsRemoved()
+    self.assertEqual(firstRefined, [])
+    self.assertEqual(self.refined, [True])
+    self.assertSameSkeleton(outputModel.GetPolyData(), self.computeSkeleton(secondModel))
+
+  def test_CancelKeepsPreview(self):
+    inputModel = createEllipsoidModel("Ellipsoid", (30, 20, 10), resolution=80)
+    outputModel = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", "Skeleton")
+
+    self.logic.computeProgressiveSkeleton(inputModel, outputModel, PARAMETERS, onRefined=self.onRefined,
+                                          previewTriangles=1000)
+    preview = outputModel.GetPolyData()
+    self.logic.cancelProgressiveSkeleton()
+
+    self._waitForRefinedModelsRemoved()
+    self.assertEqual(self.refined, [])
+    self.assertIs(outputModel.GetPolyData(), preview)
+
+  def test_OutputRemovedDuringRefine(self):
+    inputModel = createEllipsoidModel("Ellipsoid", (30, 20, 10), resolution=80)
+    outputModel = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", "Skeleton")
+
+    self.logic.computeProgressiveSkeleton(inputModel, outputModel, PARAMETERS, onRefined=self.onRefined,
+                                          previewTriangles=1000)
+    slicer.mrmlScene.RemoveNode(outputModel)
+
+    self._waitFor(lambda: self.refined)
+    self._waitForRefinedModelsRemoved()
+    self.assertEqual(self.refined, [False])
@@ -0,0 +1,25 @@
+""" Surfaces shared by the tests of SyntheticSkeleton """
+
+import slicer
+import vtk
+
+
+def createEllipsoid(radii, resolution=40):
+  """ Surface of an ellipsoid of about 2 * resolution**2 triangles """
+  sphere = vtk.vtkSphereSource()
+  sphere.SetThetaResolution(resolution)
+  sphere.SetPhiResolution(resolution)
+  transform = vtk.vtkTransform()
+  transform.Scale(*radii)
+  transformFilter = vtk.vtkTransformPolyDataFilter()
+  transformFilter.SetInputConnection(sphere.GetOutputPort())
+  transformFilter.SetTransform(transform)
+  transformFilter.Update()
+  return transformFilter.GetOutput()
+
+
+def createEllipsoidModel(name, radii, resolution=40):
+  """ Model node of the surface of an ellipsoid, see createEllipsoid """
+  model = slicer.modules.models.logic().AddModel(createEllipsoid(radii, resolution))
+  model.SetName(name)
+  return model
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+import slicer
+from vtk.util.numpy_support import vtk_to_numpy
+
+from SyntheticSkeletonLib.Constants import SCALAR_RADIUS_NAME, SCALAR_GEODESIC_NAME
+from SyntheticSkeletonLib.SharedLibraryCLI import runModelCLI
+from SyntheticSkeletonLib.VoronoiSkeleton import computeVoronoiSkeleton, isVoronoiSkeletonAvailable
+from SyntheticSkeletonTestFixtures import createEllipsoid
+
+
+def getFaces(skeleton):
+  """ Faces of the skeleton, each as the sorted coordinates of its vertices rounded to 1e-3 in single precision,
+  with its radius and geodesic distance, sorted
+  """
+  points = vtk_to_numpy(skeleton.GetPoints().GetData()).astype(np.float32).astype(np.float64)
+  offsets = vtk_to_numpy(skeleton.GetPolys().GetOffsetsArray())
+  connectivity = vtk_to_numpy(skeleton.GetPolys().GetConnectivityArray())
+  radius = vtk_to_numpy(skeleton.GetCellData().GetArray(SCALAR_RADIUS_NAME))
+  geodesic = vtk_to_numpy(skeleton.GetCellData().GetArray(SCALAR_GEODESIC_NAME))
+  faces = []
+  for i in range(len(offsets) - 1):
+    vertices = np.round(points[connectivity[offsets[i]:offsets[i + 1]]], 3)
+    faces.append((tuple(sorted(map(tuple, vertices))), float(radius[i]), float(geodesic[i])))
+  return sorted(faces)
+
+
+@unittest.skipUnless(isVoronoiSkeletonAvailable(), "SciPy is not installed")
+class SyntheticSkeletonVoronoiSkeletonTest(unittest.TestCase):
+  """ The in-process Voronoi skeleton computed with SciPy against the SkeletonTool CLI, on an ellipsoid of 3k
+  triangles
+  """
+
+  def setUp(self):
+    slicer.mrmlScene.Clear()
+    self.surface = createEllipsoid((30, 20, 10))
+
+  def assertSameSkeletonAsCLI(self, **parameters):
+    inputModel = slicer.modules.models.logic().AddModel(self.surface)
+    outputModel = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode")
+    runModelCLI(slicer.modules.skeletontool, dict(parameters, inputSurface=inputModel, outputSurface=outputModel))
+    expected = getFaces(outputModel.GetPolyData())
+    actual = getFaces(computeVoronoiSkeleton(self.surface, **parameters))
+
+    self.assertGreater(len(expected), 0)
+    self.assertEqual([face for face, _, _ in actual], [face for face, _, _ in expected])
+    np.testing.assert_array_equal([r for _, r, _ in actual], [r for _, r, _ in expected])
+    np.testing.assert_allclose([g for _, _, g in actual], [g for _, _, g in expected], rtol=1e-5)
+
+  def test_DefaultParameters(self):
+    self.assertSameSkeletonAsCLI(nDegrees=3, xPrune=1.2)
+
+  def test_PruningParameters(self):
+    self.assertSameSkeletonAsCLI(nDegrees=2, xPrune=1.5)